@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from uuid import UUID
+from fastapi import APIRouter, Depends, UploadFile
+from fastapi.exceptions import HTTPException
+from pydantic import TypeAdapter, ValidationError
+
+from core import dependencies
+from db.storage import storage
+from schemas.request import AdminRequest
+from schemas.response import AdminResponse
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+CenterRows = TypeAdapter(list[AdminRequest.CenterImportRowModel])
+
+def parse_centers_file(filename: str, content: bytes) -> list[AdminRequest.CenterImportRowModel]:
+    """
+    Accept either
+    - JSON: [{"name", "latitude", "longitude", "sports": [...]}, ...]
+    - CSV with header name,latitude,longitude,sports (sports separated by "|")
+    """
+    text = content.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        data = json.loads(text)
+    else:
+        data = [
+            {**row, "sports": [s.strip() for s in (row.get("sports") or "").split("|") if s.strip()]}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    return CenterRows.validate_python(data)
+
+@router.post("/centers/import")
+async def import_centers(
+        file: UploadFile,
+        admin: UUID = Depends(dependencies.admin),
+    ) -> AdminResponse.ImportCentersResponseModel:
+
+    try:
+        rows = parse_centers_file(file.filename or "", await file.read())
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid centers file: {e}") from e
+
+    if not rows:
+        raise HTTPException(status_code=400, detail="Centers file is empty")
+
+    try:
+        result = await storage.import_centers(
+            [(row.name, row.latitude, row.longitude, row.sports) for row in rows]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return AdminResponse.ImportCentersResponseModel(**result)
@@ -1,5 +1,6 @@
 import uvicorn
-from fastapi import APIRouter, FastAPI, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, status
 from msg.msg_log_server import  get_message_history
 from uuid import UUID
 
@@ -10,9 +11,10 @@ router = APIRouter(
 
 @router.get("/")
 async def read_message_history(
-    channel_id: UUID
+    channel_id: UUID,
+    limit: Optional[int] = Query(None, ge=1),
 ):
-    history = await get_message_history(channel_id)
+    history = await get_message_history(channel_id, limit)
     
     if not history:
         raise HTTPException(
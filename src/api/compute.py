@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from fastapi.exceptions import HTTPException
 
-from db import db_utils
+from db.storage import storage
 from schemas.base import Place
 from schemas.request import ComputeRequest
 from schemas.response import ComputeResponse
@@ -16,10 +16,10 @@ async def compute_closest_place(
         body: ComputeRequest.ClosestPlaceRequestModel,
     ) -> ComputeResponse.ClosestPlaceResponseModel:
 
-    if body.sport and body.sport not in await db_utils.get_sports():
+    if body.sport and body.sport not in await storage.get_sports():
         raise HTTPException(status_code=400, detail="Invalid sport type")
 
-    allowed_pairs = await db_utils.get_allowed_pairs_grouped()
+    allowed_pairs = await storage.get_allowed_pairs_grouped()
 
     def check_place_allowed(place: dict, sport: str) -> bool:
         if sport is None:
@@ -31,7 +31,7 @@ async def compute_closest_place(
 
         return False
 
-    place_list = await db_utils.get_centers()
+    place_list = await storage.get_centers()
     distance_list = [
         (
             place,
@@ -0,0 +1,49 @@
+from typing import Literal, Optional
+from uuid import UUID
+from datetime import datetime
+from fastapi import APIRouter, Depends
+from fastapi.exceptions import HTTPException
+from fastapi.responses import StreamingResponse
+
+from core import dependencies
+from db.storage import storage
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+@router.get("/{dataset}")
+async def export_dataset(
+        dataset: Literal["events", "participants", "messages"],
+        format: Literal["csv", "ndjson"] = "csv",
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        place_id: Optional[UUID] = None,
+        sport: Optional[str] = None,
+        admin: UUID = Depends(dependencies.admin),
+    ) -> StreamingResponse:
+
+    if sport and sport not in await storage.get_sports():
+        raise HTTPException(status_code=400, detail="Invalid sport type")
+
+    if start_time and end_time and start_time >= end_time:
+        raise HTTPException(status_code=400, detail="End time must be later than start time")
+
+    return StreamingResponse(
+        storage.stream_export(
+            dataset,
+            fmt=format,
+            start=start_time,
+            end=end_time,
+            center_id=place_id,
+            sport=sport,
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'},
+    )
@@ -0,0 +1,27 @@
+from typing import Any, Dict
+from fastapi import APIRouter, Response, status
+
+from core.readiness import readiness
+
+# Mounted at the root (not under /api) so probes don't depend on the API prefix.
+router = APIRouter(
+    tags=["health"],
+)
+
+@router.get("/healthz")
+async def healthz(response: Response) -> Dict[str, Any]:
+    """Liveness: the event loop is serving requests and startup has not failed."""
+
+    if readiness.error is not None:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "failed", "error": readiness.error}
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readyz(response: Response) -> Dict[str, Any]:
+    """Readiness: 503 until the schema, connection pools and caches are warm."""
+
+    snapshot = readiness.snapshot()
+    if not snapshot["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return snapshot
@@ -1,7 +1,7 @@
 from typing import Optional
 from fastapi import APIRouter
 
-from db import db_utils
+from db.storage import storage
 from schemas.base import Place
 from schemas.response import ListResponse
 
@@ -15,7 +15,7 @@ async def get_sports_list_by_place(
         place: Optional[str] = None,
     ) -> ListResponse.SportsListResponseModel:
 
-    sport_list = await db_utils.get_sports()
+    sport_list = await storage.get_sports()
     return ListResponse.SportsListResponseModel(sports=sport_list)
 
 @router.get("/places")
@@ -23,8 +23,8 @@ async def get_places_list_by_sport(
         sport: Optional[str] = None,
     ) -> ListResponse.PlacesListResponseModel:
 
-    places_data_list = await db_utils.get_centers()
-    allowed_pairs = await db_utils.get_allowed_pairs_grouped()
+    places_data_list = await storage.get_centers()
+    allowed_pairs = await storage.get_allowed_pairs_grouped()
 
     place_set = set()
     for pair in allowed_pairs:
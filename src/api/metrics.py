@@ -0,0 +1,17 @@
+from typing import Any, Dict
+from uuid import UUID
+from fastapi import APIRouter, Depends
+
+from core import dependencies, metrics
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+@router.get("/")
+async def get_metrics(
+        admin: UUID = Depends(dependencies.admin),
+    ) -> Dict[str, Any]:
+
+    return metrics.snapshot()
@@ -0,0 +1,30 @@
+from typing import Any, Dict, List
+from uuid import UUID
+from fastapi import APIRouter, Depends, Query
+
+from core import dependencies
+from core.config import settings
+from core.profiler import profiler
+
+router = APIRouter(
+    prefix="/profile",
+    tags=["profile"],
+)
+
+@router.post("/start")
+async def start_profile(
+        seconds: float = Query(30.0, gt=0, le=settings.PROFILE_MAX_SECONDS),
+        label: str = Query("window", max_length=60),
+        admin: UUID = Depends(dependencies.admin),
+    ) -> Dict[str, Any]:
+    """Sample the whole event loop (HTTP handlers and the MQTT listener) for a time window."""
+
+    session = profiler.start(label, seconds=seconds)
+    return {"file": session.filename, "seconds": seconds}
+
+@router.get("/")
+async def list_profiles(
+        admin: UUID = Depends(dependencies.admin),
+    ) -> Dict[str, List[Any]]:
+
+    return {"active": profiler.active(), "files": profiler.files()}
@@ -2,8 +2,8 @@ from uuid import UUID
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
 
-from core import dependencies
-from db import db_utils
+from core import admission, dependencies
+from db.storage import storage
 from schemas.base import Record, Place
 from schemas.request import RecordRequest
 from schemas.response import RecordResponse
@@ -16,10 +16,11 @@ router = APIRouter(
 @router.get("/get/{user_id}")
 async def get_user_records(
         user_id: UUID,
-        token: str = Depends(dependencies.auth),
+        subject: UUID = Depends(dependencies.auth),
     ) -> RecordResponse.GetUserRecordsResponseModel:
 
-    user_records = await db_utils.get_user_active_events(user_uid=user_id)
+    dependencies.ensure_subject(subject, user_id)
+    user_records = await storage.get_user_active_events(user_uid=user_id)
     records_list = [
         Record(
             record_id=record.get("uid"),
@@ -40,32 +41,26 @@ async def get_user_records(
 @router.post("/")
 async def create_record(
         record_data: RecordRequest.CreateRecordRequestModel,
-        token: str = Depends(dependencies.auth),
+        subject: UUID = Depends(admission.admit("record:create")),
     ) -> RecordResponse.CreateRecordResponseModel:
 
-    # Validate place ID
-    find = False
-    for center in await db_utils.get_centers():
-        if center.get("id") == record_data.place_id:
-            find = True
-            break
-    if not find:
-        raise HTTPException(status_code=400, detail="Invalid place ID")
+    dependencies.ensure_subject(subject, record_data.user_id)
 
-    # Validate sport type
-    if record_data.sport not in await db_utils.get_sports():
-        raise HTTPException(status_code=400, detail="Invalid sport type")
+    # Place, sport and the (sport, place) pair are checked by the database
+    # constraints inside create_event, so creating a record is a single round trip.
 
     # Validate time
     if record_data.start_time >= record_data.end_time:
         raise HTTPException(status_code=400, detail="End time must be later than start time")
 
-    # Validate capacity
+    # Validate capacity (also keeps out-of-range integers away from the int4 column)
     if record_data.capacity < 2:
         raise HTTPException(status_code=400, detail="Capacity must be at least 2")
+    if record_data.capacity > 100:
+        raise HTTPException(status_code=400, detail="Capacity must be between 2 and 100")
 
     try:
-        result = await db_utils.create_event(
+        result = await storage.create_event(
             user_uid=record_data.user_id,
             sport=record_data.sport,
             center_id=record_data.place_id,
@@ -84,10 +79,11 @@ async def create_record(
 async def join_records(
         record_id: UUID,
         user_id: UUID,
-        token: str = Depends(dependencies.auth),
+        subject: UUID = Depends(admission.admit("record:join")),
     ) -> None:
 
-    result = await db_utils.join_event(
+    dependencies.ensure_subject(subject, user_id)
+    result = await storage.join_event(
         user_uid=user_id,
         event_uid=record_id,
     )
@@ -97,6 +93,8 @@ async def join_records(
             raise HTTPException(status_code=400, detail="User has already joined the event")
         case "full":
             raise HTTPException(status_code=400, detail="Event is full")
+        case "closed":
+            raise HTTPException(status_code=400, detail="Event is closed")
         case "not_found":
             raise HTTPException(status_code=404, detail="Event not found")
 
@@ -104,10 +102,11 @@ async def join_records(
 async def leave_record(
         record_id: UUID,
         user_id: UUID,
-        token: str = Depends(dependencies.auth),
+        subject: UUID = Depends(admission.admit("record:leave")),
     ) -> None:
 
-    result = await db_utils.leave_event(
+    dependencies.ensure_subject(subject, user_id)
+    result = await storage.leave_event(
         user_uid=user_id,
         event_uid=record_id,
     )
@@ -117,9 +116,51 @@ async def leave_record(
 @router.delete("/delete/{record_id}")
 async def delete_record(
         record_id: UUID,
-        token: str = Depends(dependencies.auth),
+        subject: UUID = Depends(dependencies.auth),
     ) -> None:
 
-    await db_utils.cancel_event(
+    deleted = await storage.cancel_event(
         event_uid=record_id,
+        organizer_uid=subject,
     )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+@router.post("/waitlist/{record_id}")
+async def join_record_waitlist(
+        record_id: UUID,
+        user_id: UUID,
+        subject: UUID = Depends(admission.admit("record:waitlist")),
+    ) -> RecordResponse.JoinWaitlistResponseModel:
+
+    dependencies.ensure_subject(subject, user_id)
+    result = await storage.join_waitlist(
+        user_uid=user_id,
+        event_uid=record_id,
+    )
+    match result.get("status"):
+        case "already_joined":
+            raise HTTPException(status_code=400, detail="User has already joined the event")
+        case "not_full":
+            raise HTTPException(status_code=400, detail="Event is not full, join it directly")
+        case "closed":
+            raise HTTPException(status_code=400, detail="Event is closed")
+        case "not_found":
+            raise HTTPException(status_code=404, detail="Event not found")
+
+    return RecordResponse.JoinWaitlistResponseModel(position=result.get("position"))
+
+@router.delete("/waitlist/{record_id}")
+async def leave_record_waitlist(
+        record_id: UUID,
+        user_id: UUID,
+        subject: UUID = Depends(dependencies.auth),
+    ) -> None:
+
+    dependencies.ensure_subject(subject, user_id)
+    left = await storage.leave_waitlist(
+        user_uid=user_id,
+        event_uid=record_id,
+    )
+    if not left:
+        raise HTTPException(status_code=400, detail="User is not on the waitlist")
@@ -3,7 +3,7 @@ from datetime import datetime
 from fastapi import APIRouter
 from fastapi.exceptions import HTTPException
 
-from db import db_utils
+from db.storage import storage
 from schemas.base import Record, Place
 from schemas.response import RecordResponse
 
@@ -21,17 +21,21 @@ async def get_all_records(
 
     if place:
         find = False
-        for center in await db_utils.get_centers():
+        for center in await storage.get_centers():
             if center.get("name") == place:
                 find = True
                 break
         if not find:
             raise HTTPException(status_code=400, detail="Invalid place ID")
 
-    if sport and sport not in await db_utils.get_sports():
+    if sport and sport not in await storage.get_sports():
             raise HTTPException(status_code=400, detail="Invalid sport type")
 
-    all_records = await db_utils.get_all_active_events()
+    all_records = await storage.get_all_active_events(
+        sport=sport,
+        center_name=place,
+        start_time=start_time,
+    )
     records_list = [
         Record(
             record_id=record.get("uid"),
@@ -45,10 +49,6 @@ async def get_all_records(
             capacity=record.get("capacity"),
             status=record.get("status"),
             organizer_id=record.get("organizer_uid"),
-        ) for record in all_records if (
-            (place is None or record.get("center_name") == place) and
-            (sport is None or record.get("sport") == sport) and
-            (start_time is None or record.get("start_time") >= start_time)
-        )
+        ) for record in all_records
     ]
     return RecordResponse.GetAllRecordsResponseModel(records=records_list)
@@ -1,16 +1,33 @@
 from fastapi import APIRouter
 
+from core.encoding import NegotiatedResponse
+
 from api.record_public import router as record_public_router
 from api.record import router as record_router
 from api.list import router as list_router
 from api.compute import router as compute_router
 from api.call_history_msg import router as history_msg_router
+from api.search_msg import router as search_msg_router
+from api.unread_msg import router as unread_msg_router
+from api.export import router as export_router
+from api.admin import router as admin_router
+from api.stats import router as stats_router
+from api.metrics import router as metrics_router
+from api.profile import router as profile_router
 
-api_router = APIRouter()
+# JSON by default, MessagePack for clients that ask for it in Accept
+api_router = APIRouter(default_response_class=NegotiatedResponse)
 
 api_router.include_router(record_public_router)
 api_router.include_router(record_router)
 api_router.include_router(list_router)
 api_router.include_router(compute_router)
 api_router.include_router(history_msg_router)
+api_router.include_router(search_msg_router)
+api_router.include_router(unread_msg_router)
+api_router.include_router(export_router)
+api_router.include_router(admin_router)
+api_router.include_router(stats_router)
+api_router.include_router(metrics_router)
+api_router.include_router(profile_router)
 
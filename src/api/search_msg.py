@@ -0,0 +1,34 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from msg.msg_log_server import search_messages
+from uuid import UUID
+
+router = APIRouter(
+    prefix="/message/search",
+    tags=["message"],
+)
+
+@router.get("/")
+async def search_message_history(
+    q: str = Query(min_length=1, max_length=100),
+    channel_id: Optional[UUID] = None,
+    user_id: Optional[UUID] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+):
+    if channel_id is None and user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="必須指定 channel_id 或 user_id",
+        )
+
+    try:
+        return await search_messages(
+            q.strip(),
+            channel_id=channel_id,
+            user_id=user_id,
+            limit=limit,
+            offset=offset,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
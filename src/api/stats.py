@@ -0,0 +1,52 @@
+from typing import Optional
+from uuid import UUID
+from datetime import datetime
+from fastapi import APIRouter, Depends
+from fastapi.exceptions import HTTPException
+
+from core import dependencies
+from db.storage import storage
+from schemas.base import Occupancy, Place
+from schemas.response import StatsResponse
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+)
+
+@router.get("/occupancy")
+async def get_occupancy(
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        place_id: Optional[UUID] = None,
+        sport: Optional[str] = None,
+        admin: UUID = Depends(dependencies.admin),
+    ) -> StatsResponse.OccupancyResponseModel:
+
+    if sport and sport not in await storage.get_sports():
+        raise HTTPException(status_code=400, detail="Invalid sport type")
+
+    if start_time and end_time and start_time >= end_time:
+        raise HTTPException(status_code=400, detail="End time must be later than start time")
+
+    rows = await storage.get_occupancy(
+        start=start_time,
+        end=end_time,
+        center_id=place_id,
+        sport=sport,
+    )
+    occupancy = [
+        Occupancy(
+            place=Place(place_id=row["center_id"], name=row["center_name"]),
+            sport=row["sport"],
+            hour_start=row["hour_start"],
+            events=row["events"],
+            open_events=row["open_events"],
+            full_events=row["full_events"],
+            capacity=row["capacity"],
+            participants=row["participants"],
+            fill_ratio=row["participants"] / row["capacity"] if row["capacity"] else 0.0,
+        )
+        for row in rows
+    ]
+    return StatsResponse.OccupancyResponseModel(occupancy=occupancy)
@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from core import dependencies
+from core.config import settings
+from db.storage import storage
+from schemas.base import UnreadCount
+from schemas.response import MessageResponse
+
+router = APIRouter(
+    prefix="/message",
+    tags=["message"],
+)
+
+@router.put("/read/{channel_id}")
+async def mark_channel_read(
+        channel_id: UUID,
+        user_id: UUID,
+        timestamp: Optional[datetime] = None,
+        subject: UUID = Depends(dependencies.auth),
+    ) -> MessageResponse.MarkReadResponseModel:
+
+    # Without a timestamp the cursor moves to the newest message in the channel.
+    # Cursors never move backwards, so a late request from another device is harmless.
+    dependencies.ensure_subject(subject, user_id)
+    last_read_at = await storage.mark_read(
+        user_uid=user_id,
+        channel_id=channel_id,
+        read_at=timestamp,
+    )
+    if last_read_at is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Channel not found")
+    return MessageResponse.MarkReadResponseModel(last_read_at=last_read_at)
+
+@router.get("/unread/{user_id}")
+async def get_unread_counts(
+        user_id: UUID,
+        subject: UUID = Depends(dependencies.auth),
+    ) -> MessageResponse.UnreadCountsResponseModel:
+
+    dependencies.ensure_subject(subject, user_id)
+    cap = settings.UNREAD_COUNT_CAP
+    counts = await storage.get_unread_counts(user_uid=user_id, cap=cap)
+    return MessageResponse.UnreadCountsResponseModel(
+        channels=[
+            UnreadCount(
+                channel_id=row["channel_id"],
+                last_read_at=row["last_read_at"],
+                unread=row["unread"],
+                capped=row["unread"] >= cap,
+            ) for row in counts
+        ]
+    )
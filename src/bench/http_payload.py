@@ -0,0 +1,165 @@
+"""
+大型 JSON 回應的編碼壓測：對同一組 API 分別以
+  JSON / JSON+gzip / JSON+br / MessagePack / MessagePack+br
+各發 N 次請求，量測實際傳輸的位元組數與 time-to-last-byte，並確認解碼後內容一致。
+
+需要：
+- 正在執行的 API（main.py）
+- 資料庫裡有足夠的活動 / 訊息，結果才有代表性
+
+用法（在 src/ 底下）：
+    python -m bench.http_payload --base-url http://localhost:8000 --requests 50 \\
+        --channel <uuid>                      # 額外量 /api/message/history/
+    python -m bench.http_payload --path /api/record/all --path "/api/stats/occupancy" --token <jwt>
+
+壓縮前的數字可用 --variants json 單獨量（等同沒有壓縮 / MessagePack 的舊行為）。
+在 localhost 量時傳輸幾乎不花時間，壓縮只會顯得變慢；--mbps 另外估算行動網路頻寬下的
+time-to-last-byte（伺服器端 ttlb + 位元組數 / 頻寬），比較接近手機實際看到的差距。
+"""
+import argparse
+import asyncio
+import json
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import brotli
+import httpx
+import msgpack
+
+# 名稱 -> (Accept, Accept-Encoding)
+VARIANTS: Dict[str, Tuple[str, str]] = {
+    "json": ("application/json", "identity"),
+    "json+gzip": ("application/json", "gzip"),
+    "json+br": ("application/json", "br"),
+    "msgpack": ("application/msgpack", "identity"),
+    "msgpack+br": ("application/msgpack", "br"),
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def decode(raw: bytes, content_encoding: Optional[str], content_type: str) -> Any:
+    if content_encoding == "br":
+        raw = brotli.decompress(raw)
+    elif content_encoding == "gzip":
+        raw = zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+    if content_type.startswith("application/msgpack"):
+        return msgpack.unpackb(raw)
+    return json.loads(raw)
+
+
+async def fetch(client: httpx.AsyncClient, path: str, accept: str, accept_encoding: str) -> Dict[str, Any]:
+    """回傳傳輸位元組數、time-to-first-byte / time-to-last-byte 與解碼後內容。"""
+    headers = {"Accept": accept, "Accept-Encoding": accept_encoding}
+    started = time.perf_counter()
+    async with client.stream("GET", path, headers=headers) as response:
+        first_byte = None
+        chunks = []
+        # aiter_raw：不讓 httpx 自動解壓，量到的就是線上的位元組
+        async for chunk in response.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            chunks.append(chunk)
+        finished = time.perf_counter()
+    response.raise_for_status()
+    raw = b"".join(chunks)
+    return {
+        "wire_bytes": len(raw),
+        "ttfb": (first_byte or finished) - started,
+        "ttlb": finished - started,
+        "encoding": response.headers.get("content-encoding"),
+        "content_type": response.headers.get("content-type", ""),
+        "body": decode(raw, response.headers.get("content-encoding"), response.headers.get("content-type", "")),
+    }
+
+
+async def bench_path(client: httpx.AsyncClient, path: str, variants: List[str], requests: int) -> List[Dict[str, Any]]:
+    baseline = None
+    rows = []
+    for name in variants:
+        accept, accept_encoding = VARIANTS[name]
+        # 第一次當作暖身（快取 / 連線），不計入
+        warmup = await fetch(client, path, accept, accept_encoding)
+        if baseline is None:
+            baseline = warmup["body"]
+        elif warmup["body"] != baseline:
+            print(f"  !! {name} 解碼後內容與 {variants[0]} 不一致")
+
+        samples = [await fetch(client, path, accept, accept_encoding) for _ in range(requests)]
+        ttlb = [sample["ttlb"] * 1000 for sample in samples]
+        ttfb = [sample["ttfb"] * 1000 for sample in samples]
+        rows.append({
+            "variant": name,
+            "served_as": f"{warmup['content_type'].split(';')[0]} {warmup['encoding'] or 'identity'}",
+            "wire_bytes": samples[-1]["wire_bytes"],
+            "ttfb_p50": percentile(ttfb, 50),
+            "ttlb_p50": percentile(ttlb, 50),
+            "ttlb_p95": percentile(ttlb, 95),
+        })
+    return rows
+
+
+def print_report(path: str, rows: List[Dict[str, Any]], mbps: float):
+    base_bytes = rows[0]["wire_bytes"] or 1
+    base_ttlb = rows[0]["ttlb_p50"] or 1
+
+    def on_link(row) -> float:
+        return row["ttlb_p50"] + row["wire_bytes"] * 8 / (mbps * 1000)
+
+    print(f"\n=== {path}")
+    print(f"{'variant':<12} {'served as':<28} {'bytes':>10} {'vs base':>8} "
+          f"{'ttfb p50':>9} {'ttlb p50':>9} {'ttlb p95':>9} {'vs base':>8} {f'@{mbps:g}Mbps':>10}")
+    for row in rows:
+        print(
+            f"{row['variant']:<12} {row['served_as']:<28} {row['wire_bytes']:>10} "
+            f"{row['wire_bytes'] / base_bytes:>7.1%} "
+            f"{row['ttfb_p50']:>8.1f}ms {row['ttlb_p50']:>8.1f}ms {row['ttlb_p95']:>8.1f}ms "
+            f"{row['ttlb_p50'] / base_ttlb:>7.1%} {on_link(row):>8.0f}ms"
+        )
+
+
+async def run(args: argparse.Namespace):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=args.timeout) as client:
+        for path in args.paths:
+            rows = await bench_path(client, path, args.variants, args.requests)
+            print_report(path, rows, args.mbps)
+        metrics = await client.get("/api/metrics/", headers={"Accept-Encoding": "identity"})
+        if metrics.status_code == 200:
+            print("\nserver compression:", json.dumps(metrics.json().get("compression"), ensure_ascii=False))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="API 回應編碼（壓縮 / MessagePack）壓測")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", dest="paths", action="append", default=None,
+                        help="要量測的路徑，可重複；預設 /api/record/all")
+    parser.add_argument("--channel", default=None,
+                        help="額外量測這個頻道的 /api/message/history/")
+    parser.add_argument("--variants", default=",".join(VARIANTS),
+                        help=f"逗號分隔，第一個作為比較基準（{', '.join(VARIANTS)}）")
+    parser.add_argument("--requests", type=int, default=30, help="每個組合的請求數（不含暖身）")
+    parser.add_argument("--token", default=None, help="需要驗證的路徑用的 Bearer token")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--mbps", type=float, default=10.0,
+                        help="估算 time-to-last-byte 用的下行頻寬（Mbit/s）")
+    args = parser.parse_args(argv)
+    args.paths = args.paths or ["/api/record/all"]
+    if args.channel:
+        args.paths.append(f"/api/message/history/?channel_id={args.channel}")
+    args.variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in args.variants if v not in VARIANTS]
+    if unknown:
+        parser.error(f"未知的 variant: {', '.join(unknown)}")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
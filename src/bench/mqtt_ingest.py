@@ -0,0 +1,295 @@
+"""
+MQTT 聊天訊息寫入壓測：對 TownPass/{channel_id} 以固定速率發佈訊息，
+量測從 publish 到 messages 表查得到該列的端到端延遲，並逐步提高速率，
+找出 msg_log_server 的持續吞吐量與 backlog 開始累積的點。
+
+需要：
+- 正在執行的 msg_log_server（main.py 啟動的 mqtt_listener）
+- 同一個 broker / 資料庫（讀 .env 的 Settings）
+- 資料庫裡至少有一個 channel（messages.channel_id 有外鍵）
+
+用法（在 src/ 底下）：
+    python -m bench.mqtt_ingest --rates 100,200,500,1000 --step-seconds 20 --channels 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+from aiomqtt import Client, MqttError
+
+from core.config import settings
+
+# 輪詢 messages 時往回多看幾秒，容納 timestamp（交易開始時間）比 commit 早的列
+POLL_SLACK = timedelta(seconds=5)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def slope(samples: List[Tuple[float, int]]) -> float:
+    """最小平方法斜率（每秒變化量）。"""
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var == 0:
+        return 0.0
+    return sum((t - mean_t) * (v - mean_v) for t, v in samples) / var
+
+
+class IngestBench:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:12]
+        self.rng = random.Random(args.seed)
+        self.channels: List[uuid.UUID] = []
+        self.senders: List[str] = [
+            str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+            for _ in range(args.senders)
+        ]
+        # seq -> 發佈時間；查到對應的列後移除
+        self.pending: Dict[int, float] = {}
+        self.observed: List[Tuple[float, float]] = []  # (看到的時間, 延遲)
+        self.publish_errors = 0
+        self._seq = 0
+        self._stop_polling = asyncio.Event()
+
+    def _payload(self, seq: int) -> str:
+        text = f"{self.run_id}:{seq}:"
+        text += "x" * max(0, self.args.payload_bytes - len(text))
+        return json.dumps({"sender": self.rng.choice(self.senders), "text": text})
+
+    # -----------------------------------------------------
+    # 資料庫端：取 channel、輪詢寫入結果、清理
+    # -----------------------------------------------------
+
+    async def load_channels(self, conn: asyncpg.Connection):
+        rows = await conn.fetch(
+            "SELECT channel_id FROM channels ORDER BY channel_id LIMIT $1;",
+            self.args.channels,
+        )
+        self.channels = [row["channel_id"] for row in rows]
+        if not self.channels:
+            raise SystemExit("資料庫沒有任何 channel，請先建立活動（或用 db.gen_data 產生資料）")
+
+    async def poll(self, conn: asyncpg.Connection):
+        since = await conn.fetchval("SELECT NOW();")
+        prefix = f"{self.run_id}:%"
+        while not (self._stop_polling.is_set() and not self.pending):
+            rows = await conn.fetch(
+                """
+                SELECT payload #>> '{}' AS text, timestamp
+                FROM messages
+                WHERE channel_id = ANY($1::uuid[])
+                  AND timestamp > $2
+                  AND (payload #>> '{}') LIKE $3;
+                """,
+                self.channels,
+                since,
+                prefix,
+            )
+            now = time.time()
+            for row in rows:
+                seq = int(row["text"].split(":", 2)[1])
+                sent_at = self.pending.pop(seq, None)
+                if sent_at is not None:
+                    self.observed.append((now, now - sent_at))
+                # 只往回看 slack 秒，避免每輪都重掃整個壓測期間的資料
+                since = max(since, row["timestamp"] - POLL_SLACK)
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def cleanup(self, conn: asyncpg.Connection):
+        result = await conn.execute(
+            """
+            DELETE FROM messages
+            WHERE channel_id = ANY($1::uuid[]) AND (payload #>> '{}') LIKE $2;
+            """,
+            self.channels,
+            f"{self.run_id}:%",
+        )
+        print(f"已清除壓測訊息：{result}")
+
+    # -----------------------------------------------------
+    # MQTT 端：依速率發佈
+    # -----------------------------------------------------
+
+    async def _publish_one(self, client: Client, slots: asyncio.Semaphore):
+        seq = self._seq
+        self._seq += 1
+        topic = f"TownPass/{self.channels[seq % len(self.channels)]}"
+        payload = self._payload(seq)
+        self.pending[seq] = time.time()
+        try:
+            await client.publish(topic, payload, qos=self.args.qos)
+        except MqttError as e:
+            self.pending.pop(seq, None)
+            self.publish_errors += 1
+            if self.publish_errors <= 5:
+                print(f"發佈失敗: {e}")
+        finally:
+            slots.release()
+
+    async def run_step(self, client: Client, rate: float) -> Dict[str, float]:
+        """以 rate msg/s 發佈 step_seconds 秒，每秒記錄一次 backlog。"""
+        duration = self.args.step_seconds
+        slots = asyncio.Semaphore(self.args.max_inflight)
+        tasks = set()
+        backlog: List[Tuple[float, int]] = []
+        start = time.time()
+        observed_before = len(self.observed)
+        sent_before = self._seq
+        next_sample = start + 1
+        i = 0
+        while True:
+            due = start + i / rate
+            if due >= start + duration:
+                break
+            delay = due - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.create_task(self._publish_one(client, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            i += 1
+            if time.time() >= next_sample:
+                backlog.append((time.time() - start, len(self.pending)))
+                next_sample += 1
+        await asyncio.gather(*tasks)
+        elapsed = time.time() - start
+
+        persisted = self.observed[observed_before:]
+        latencies = [lat for _, lat in persisted]
+        # 後半段的 backlog 斜率：前半段有暖機與首批寫入延遲
+        growth = slope(backlog[len(backlog) // 2:])
+        return {
+            "rate": rate,
+            "sent_rate": (self._seq - sent_before) / elapsed,
+            "throughput": len(persisted) / elapsed,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "backlog": len(self.pending),
+            "backlog_growth": growth,
+        }
+
+    # -----------------------------------------------------
+    # 主流程
+    # -----------------------------------------------------
+
+    async def run(self):
+        args = self.args
+        conn = await asyncpg.connect(settings.database_url)
+        poll_conn = await asyncpg.connect(settings.database_url)
+        poller = None
+        try:
+            await self.load_channels(conn)
+            print(
+                f"run_id={self.run_id} channels={len(self.channels)} "
+                f"payload={args.payload_bytes}B qos={args.qos}"
+            )
+            poller = asyncio.create_task(self.poll(poll_conn))
+            results = []
+            async with Client(
+                args.broker or settings.MQTT_BROKER,
+                port=args.port,
+                username=settings.MQTT_USR_NAME,
+                password=settings.MQTT_USR_PWD,
+                max_inflight_messages=args.max_inflight,
+            ) as client:
+                for rate in args.rates:
+                    result = await self.run_step(client, rate)
+                    results.append(result)
+                    print_step(result)
+
+            # 等剩下的訊息寫入（或逾時）
+            self._stop_polling.set()
+            try:
+                await asyncio.wait_for(poller, args.drain_seconds)
+            except asyncio.TimeoutError:
+                pass
+            print_summary(results, len(self.pending), self.publish_errors)
+        finally:
+            if poller is not None and not poller.done():
+                poller.cancel()
+            try:
+                if args.cleanup and self.channels:
+                    await self.cleanup(conn)
+            finally:
+                await conn.close()
+                await poll_conn.close()
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}ms"
+
+
+def print_step(result: Dict[str, float]):
+    print(
+        f"目標 {result['rate']:.0f}/s | 實際發佈 {result['sent_rate']:.0f}/s | "
+        f"寫入 {result['throughput']:.0f}/s | "
+        f"p50 {_ms(result['p50'])} p95 {_ms(result['p95'])} p99 {_ms(result['p99'])} | "
+        f"backlog {result['backlog']}（{result['backlog_growth']:+.1f}/s）"
+    )
+
+
+def saturated(result: Dict[str, float]) -> bool:
+    """backlog 持續成長（超過目標速率的 5%/s）就視為寫入跟不上。"""
+    return result["backlog_growth"] > 0.05 * result["rate"]
+
+
+def print_summary(results: List[Dict[str, float]], lost: int, errors: int):
+    if not results:
+        return
+    sustained = [r for r in results if not saturated(r)]
+    first_saturated = next((r for r in results if saturated(r)), None)
+    print("-" * 60)
+    if sustained:
+        best = max(sustained, key=lambda r: r["throughput"])
+        print(f"持續吞吐量：{best['throughput']:.0f} msg/s（目標 {best['rate']:.0f}/s，p99 {_ms(best['p99'])}）")
+    else:
+        print("持續吞吐量：所有速率都出現 backlog 成長")
+    if first_saturated is not None:
+        print(f"backlog 開始成長：目標 {first_saturated['rate']:.0f}/s")
+    else:
+        print("backlog 開始成長：測試範圍內未出現")
+    print(f"逾時仍未寫入：{lost} 則，發佈失敗：{errors} 則")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="MQTT 聊天訊息寫入壓測")
+    parser.add_argument("--rates", default="50,100,200,500,1000",
+                        help="逐步測試的發佈速率（msg/s，逗號分隔）")
+    parser.add_argument("--step-seconds", type=float, default=20.0)
+    parser.add_argument("--channels", type=int, default=20, help="使用幾個既有 channel")
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--payload-bytes", type=int, default=100)
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--max-inflight", type=int, default=1000)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--drain-seconds", type=float, default=30.0)
+    parser.add_argument("--broker", default=None, help="預設為 Settings.MQTT_BROKER")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cleanup", dest="cleanup", action="store_false",
+                        help="保留壓測寫入的訊息")
+    args = parser.parse_args(argv)
+    args.rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(IngestBench(parse_args()).run())
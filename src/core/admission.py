@@ -0,0 +1,156 @@
+import math
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict
+from uuid import UUID
+
+from fastapi import Depends, HTTPException, status
+
+from core import dependencies, metrics
+from core.config import settings
+from db.db_utils import pool_wait
+
+
+# =========================================================
+# 寫入端點的流量控制 / 過載卸載
+# =========================================================
+#
+# 每個寫入請求都會在交易期間佔住一條連線，單一失控的 client 就能把池子吃光。
+# 依序檢查：
+#   1. 每條路由的同時執行上限                       -> 503
+#   2. 連線池借用等待時間超過門檻                   -> 503
+#   3. 每位使用者 token bucket、全域 token bucket   -> 429
+# 不消耗 token 的檢查放前面，被 503 擋下的請求不會白白用掉 token；
+# 使用者自己的 bucket 先扣，單一 client 洗請求時只會耗盡自己的額度，不會拖累其他使用者。
+# 全部擋下的請求都帶 Retry-After，讓 p99 在過載時仍然有上限。
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """拿一個 token；成功回傳 0，否則回傳還要等幾秒才有 token。"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """退回 take 成功拿走的 token（後面的檢查沒過時）。"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class UserBuckets:
+    """每位使用者一個 bucket，以 LRU 限制總數，避免被大量 user id 撐爆記憶體。"""
+
+    def __init__(self, rate: float, burst: float, max_users: int):
+        self._rate = rate
+        self._burst = burst
+        self._max_users = max_users
+        self._buckets: "OrderedDict[UUID, TokenBucket]" = OrderedDict()
+
+    def take(self, user_uid: UUID, now: float) -> float:
+        bucket = self._buckets.get(user_uid)
+        if bucket is None:
+            bucket = self._buckets[user_uid] = TokenBucket(self._rate, self._burst)
+            while len(self._buckets) > self._max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_uid)
+        return bucket.take(now)
+
+    def refund(self, user_uid: UUID):
+        bucket = self._buckets.get(user_uid)
+        if bucket is not None:
+            bucket.refund()
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        global_rate: float,
+        global_burst: float,
+        user_rate: float,
+        user_burst: float,
+        max_users: int,
+        route_concurrency: int,
+        pool_wait_threshold: float,
+    ):
+        self._global = TokenBucket(global_rate, global_burst)
+        self._users = UserBuckets(user_rate, user_burst, max_users)
+        self._route_concurrency = route_concurrency
+        self._pool_wait_threshold = pool_wait_threshold
+        self._in_flight: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {"rate_limited": 0, "concurrency": 0, "pool_wait": 0}
+
+    def _reject(self, reason: str, status_code: int, detail: str, retry_after: float):
+        self.rejected[reason] += 1
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def enter(self, route: str, user_uid: UUID):
+        if self._in_flight.get(route, 0) >= self._route_concurrency:
+            self._reject("concurrency", status.HTTP_503_SERVICE_UNAVAILABLE, "Server busy", 1)
+
+        pool_wait_seconds = pool_wait.current_wait()
+        if pool_wait_seconds > self._pool_wait_threshold:
+            self._reject("pool_wait", status.HTTP_503_SERVICE_UNAVAILABLE, "Server busy", pool_wait_seconds)
+
+        now = time.monotonic()
+        wait = self._users.take(user_uid, now)
+        if wait > 0:
+            self._reject("rate_limited", status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests", wait)
+        wait = self._global.take(now)
+        if wait > 0:
+            self._users.refund(user_uid)
+            self._reject("rate_limited", status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests", wait)
+
+        self._in_flight[route] = self._in_flight.get(route, 0) + 1
+
+    def leave(self, route: str):
+        self._in_flight[route] -= 1
+
+
+controller = AdmissionController(
+    global_rate=settings.ADMISSION_GLOBAL_RATE,
+    global_burst=settings.ADMISSION_GLOBAL_BURST,
+    user_rate=settings.ADMISSION_USER_RATE,
+    user_burst=settings.ADMISSION_USER_BURST,
+    max_users=settings.ADMISSION_MAX_TRACKED_USERS,
+    route_concurrency=settings.ADMISSION_ROUTE_CONCURRENCY,
+    pool_wait_threshold=settings.ADMISSION_POOL_WAIT_THRESHOLD,
+)
+metrics.register("admission", lambda: {
+    "rejected": dict(controller.rejected),
+    "in_flight": dict(controller._in_flight),
+})
+
+
+def admit(route: str) -> Callable[..., AsyncIterator[UUID]]:
+    """
+    FastAPI dependency：
+        subject: UUID = Depends(admission.admit("record:join"))
+    通過檢查後回傳 token subject，並在請求結束時釋放該路由的名額。
+    """
+
+    async def dependency(
+        subject: UUID = Depends(dependencies.auth),
+    ) -> AsyncIterator[UUID]:
+        controller.enter(route, subject)
+        try:
+            yield subject
+        finally:
+            controller.leave(route)
+
+    return dependency
@@ -1,3 +1,5 @@
+from uuid import UUID
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,9 +16,85 @@ class Settings(BaseSettings):
     def database_url(self):
         return f"postgresql://{self.POSTGRES_USERNAME}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
     
+    # 各工作類型的連線池上限（HTTP API / MQTT 訊息寫入 / 背景維護與匯入匯出）
+    DB_POOL_API_SIZE: int = 10
+    DB_POOL_INGEST_SIZE: int = 4
+    DB_POOL_MAINTENANCE_SIZE: int = 2
+
     MQTT_USR_NAME: str
     MQTT_USR_PWD: str
     MQTT_BROKER: str
+    # 系統通知：佇列上限 / 同時等待 PUBACK 的上限
+    MQTT_NOTICE_QUEUE_SIZE: int = 10000
+    MQTT_MAX_INFLIGHT: int = 20
+    # 聊天紀錄快取：每個頻道保留最近幾則 / 全部頻道合計的估計位元組上限
+    HISTORY_CACHE_PER_CHANNEL: int = 50
+    HISTORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Bearer token 驗證（HS256）；JWT_KEYS_FILE 為 {"kid": "secret"} 的 JSON，會熱重載
+    JWT_SECRET: str = ""
+    JWT_KEYS_FILE: str = ""
+    JWT_KEYS_RELOAD_INTERVAL: float = 5.0
+    JWT_LEEWAY: float = 30.0
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: float = 300.0
+    # 以逗號分隔的管理者 user UUID（匯出 / 匯入等管理端點）
+    ADMIN_UIDS: str = ""
+
+    @property
+    def admin_uids(self) -> set[UUID]:
+        return {UUID(uid.strip()) for uid in self.ADMIN_UIDS.split(",") if uid.strip()}
+
+    # 寫入端點的流量控制（每秒 token 數 / 桶子容量 / 每路由同時執行上限 / 連線池等待門檻秒數）
+    ADMISSION_GLOBAL_RATE: float = 200.0
+    ADMISSION_GLOBAL_BURST: float = 400.0
+    ADMISSION_USER_RATE: float = 2.0
+    ADMISSION_USER_BURST: float = 10.0
+    ADMISSION_MAX_TRACKED_USERS: int = 100000
+    ADMISSION_ROUTE_CONCURRENCY: int = 6
+    ADMISSION_POOL_WAIT_THRESHOLD: float = 0.25
+
+    # 記住已存在的使用者，報名 / 開團時略過 users upsert
+    KNOWN_USERS_CACHE_SIZE: int = 200000
+
+    # log：預設等級 / 個別模組等級（"msg=WARNING,db=DEBUG"）/ 佇列上限 / 同一訊息每 interval 秒最多幾則
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_RATE_LIMIT: int = 20
+    LOG_RATE_INTERVAL: float = 10.0
+
+    # 儲存引擎："postgres"（預設）或 "memory"（不需要資料庫，壓測 / 本機開發用，重啟即清空）
+    STORAGE_BACKEND: str = "postgres"
+
+    # 取樣式 profiler：輸出目錄 / 取樣間隔（秒）/ 單次 session 最長秒數
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL: float = 0.005
+    PROFILE_MAX_SECONDS: float = 300.0
+
+    # event loop 延遲監測：量測間隔 / 超過多久視為阻塞並抓 stack（秒）/ 百分位數的樣本數 / 保留幾筆阻塞紀錄 / stack 深度
+    LOOP_LAG_INTERVAL: float = 0.1
+    LOOP_LAG_THRESHOLD: float = 0.1
+    LOOP_LAG_WINDOW: int = 600
+    LOOP_LAG_REPORTS: int = 20
+    LOOP_LAG_STACK_DEPTH: int = 30
+
+    # 活動開始前幾分鐘透過 MQTT 提醒參加者
+    EVENT_REMINDER_LEAD_MINUTES: int = 30
+
+    # /api/stats 的結果在幾秒內共用（儀表板同時刷新時只查一次）
+    STATS_CACHE_TTL: float = 1.0
+
+    # /api 回應壓縮：超過幾 bytes 才壓縮 / gzip 等級 / brotli 品質（動態內容用中低等級，壓縮時間才不會吃掉省下的傳輸時間）
+    COMPRESS_MIN_BYTES: int = 1024
+    COMPRESS_GZIP_LEVEL: int = 6
+    COMPRESS_BROTLI_QUALITY: int = 5
+
+    # 未讀數最多數到幾則（超過只回報已達上限，數未讀不必掃完整段歷史）
+    UNREAD_COUNT_CAP: int = 100
+
+    # 匯出串流時，記憶體中最多暫存幾個 COPY chunk
+    EXPORT_QUEUE_CHUNKS: int = 64
 
 
 settings = Settings()
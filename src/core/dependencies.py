@@ -1,10 +1,44 @@
-from fastapi import Depends
+from uuid import UUID
+
+from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from core.config import settings
+from core.security import InvalidToken, token_verifier
+
 security = HTTPBearer()
 
 async def auth(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-) -> str:
+) -> UUID:
+    """Verify the bearer token locally and return its subject (user UUID)."""
     token = credentials.credentials
-    return token
+    try:
+        return token_verifier.verify(token)
+    except InvalidToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        ) from e
+
+
+def ensure_subject(subject: UUID, user_id: UUID) -> None:
+    """Reject requests acting on behalf of a user other than the token subject."""
+    if subject != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token subject does not match user ID",
+        )
+
+
+async def admin(
+    subject: UUID = Depends(auth),
+) -> UUID:
+    """Allow only the users listed in ADMIN_UIDS."""
+    if subject not in settings.admin_uids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return subject
@@ -0,0 +1,222 @@
+import asyncio
+import zlib
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import brotli
+import msgpack
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from core import metrics
+from core.config import settings
+
+
+# =========================================================
+# 回應編碼協商（/api 底下）
+# =========================================================
+#
+# - 內容格式：Accept 偏好 application/msgpack 時回 MessagePack，否則照舊回 JSON
+#   （NegotiatedResponse，掛在 api_router 的 default_response_class）
+# - 傳輸壓縮：Accept-Encoding 支援 br / gzip 且回應超過 COMPRESS_MIN_BYTES 時壓縮
+#   （CompressionMiddleware；串流回應逐 chunk 壓縮並 flush，匯出不會等到結尾才送出）
+# 列表與聊天紀錄重複的場館名稱 / ISO 時間很多，壓縮後通常只剩原本的一到兩成。
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# 值得壓縮的內容；圖片、已壓縮的檔案等直接放行
+_COMPRESSIBLE_PREFIXES = ("text/", "application/json", "application/x-ndjson") + MSGPACK_MEDIA_TYPES
+
+# 超過這個大小的 body 改到 thread 壓縮（zlib / brotli 會釋放 GIL），避免卡住 event loop
+_OFFLOAD_BYTES = 256 * 1024
+
+_stats: Counter = Counter()
+
+
+def _parse_qvalues(header: str) -> Dict[str, float]:
+    """"br;q=1.0, gzip;q=0.5" -> {"br": 1.0, "gzip": 0.5}；其他參數忽略。"""
+    values = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        values[name] = q
+    return values
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """依 Accept-Encoding 選 "br" 或 "gzip"；q 相同時優先 br，都不接受回傳 None。"""
+    qvalues = _parse_qvalues(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in ("br", "gzip"):
+        q = qvalues.get(encoding, qvalues.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def wants_msgpack(accept: str) -> bool:
+    """Accept 明確列出 MessagePack 且不比 JSON 低時才回 MessagePack（*/* 仍回 JSON）。"""
+    qvalues = _parse_qvalues(accept)
+    msgpack_q = max(qvalues.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    return msgpack_q > 0 and msgpack_q >= qvalues.get("application/json", 0.0)
+
+
+# =========================================================
+# MessagePack / JSON
+# =========================================================
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    FastAPI 已經把回傳值轉成 JSON 相容的型別，這裡只決定序列化成哪種格式。
+    需要看 request 的 Accept，所以延到 __call__（拿得到 scope）才 render。
+    """
+
+    def __init__(self, content: Any, *args, **kwargs):
+        self._content = content
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        # __init__ 時還不知道格式，先不序列化
+        return b""
+
+    async def __call__(self, scope, receive, send):
+        if self.status_code < 200 or self.status_code in (204, 304):
+            return await super().__call__(scope, receive, send)
+        if wants_msgpack(Headers(scope=scope).get("accept", "")):
+            self.body = msgpack.packb(self._content)
+            self.media_type = MSGPACK_MEDIA_TYPES[0]
+            _stats["msgpack"] += 1
+        else:
+            self.body = super().render(self._content)
+        self.headers["content-length"] = str(len(self.body))
+        self.headers["content-type"] = self.media_type
+        self.headers.add_vary_header("Accept")
+        await super().__call__(scope, receive, send)
+
+
+# =========================================================
+# gzip / brotli
+# =========================================================
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.COMPRESS_BROTLI_QUALITY)
+        else:
+            # wbits 16 + MAX_WBITS：輸出 gzip 格式（含 header / CRC）
+            self._zlib = zlib.compressobj(settings.COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """final=False 時 flush 到位元組邊界，client 收到就能解出目前為止的內容。"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + (self._zlib.flush() if final else self._zlib.flush(zlib.Z_SYNC_FLUSH))
+
+
+async def _compress(compressor: _Compressor, data: bytes, final: bool) -> bytes:
+    if len(data) >= _OFFLOAD_BYTES:
+        out = await asyncio.to_thread(compressor.compress, data, final)
+    else:
+        out = compressor.compress(data, final)
+    _stats["bytes_in"] += len(data)
+    _stats["bytes_out"] += len(out)
+    return out
+
+
+class _CompressingSend:
+    """
+    包住 ASGI send：先扣住 response.start，看到第一個 body 才決定要不要壓縮
+    （要知道大小、Content-Type 與是否為串流）。
+    """
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start: Optional[Dict[str, Any]] = None
+        self._compressor: Optional[_Compressor] = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if message["type"] != "http.response.body":
+            return await self._send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._start is not None:
+            start, self._start = self._start, None
+            start["headers"] = list(start.get("headers", []))
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(_COMPRESSIBLE_PREFIXES)
+                or (not more_body and len(body) < self._minimum_size)
+            ):
+                _stats["skipped"] += 1
+                await self._send(start)
+                return await self._send(message)
+
+            self._compressor = _Compressor(self._encoding)
+            headers["content-encoding"] = self._encoding
+            headers.add_vary_header("Accept-Encoding")
+            del headers["content-length"]
+            _stats[self._encoding] += 1
+            data = await _compress(self._compressor, body, final=not more_body)
+            if not more_body:
+                headers["content-length"] = str(len(data))
+            await self._send(start)
+            return await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        if self._compressor is None:
+            return await self._send(message)
+        data = await _compress(self._compressor, body, final=not more_body)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    """只處理 path_prefix 底下的 HTTP 請求；client 不接受 br / gzip 時完全不介入。"""
+
+    def __init__(self, app, minimum_size: int, path_prefix: str = "/api"):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+def stats() -> Dict[str, Any]:
+    bytes_in, bytes_out = _stats["bytes_in"], _stats["bytes_out"]
+    return {
+        "br": _stats["br"],
+        "gzip": _stats["gzip"],
+        "skipped": _stats["skipped"],
+        "msgpack": _stats["msgpack"],
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "ratio": round(bytes_out / bytes_in, 3) if bytes_in else None,
+    }
+
+
+metrics.register("compression", stats)
@@ -0,0 +1,153 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from core import metrics
+from core.config import settings
+
+
+# =========================================================
+# 非阻塞的結構化 log
+# =========================================================
+#
+# 各模組照常用 logging.getLogger(__name__)；setup() 之後：
+# - 呼叫端只把 record 丟進記憶體佇列（滿了就丟棄並計數），不碰 stdout
+# - 背景 thread（QueueListener）把 record 寫成一行一個 JSON
+# - 同一個呼叫點（logger + level + 訊息樣板）在 LOG_RATE_INTERVAL 秒內
+#   超過 LOG_RATE_LIMIT 則就先壓下來，下一個時間窗第一筆附上被壓掉的數量
+# - LOG_LEVELS 可對個別模組調整等級，例如 "msg.msg_log_server=WARNING,db=DEBUG"
+
+# LogRecord 內建的屬性；其餘的屬性視為 extra={...} 帶進來的欄位
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """在呼叫端執行：被壓下的 record 不會進佇列，也不會被格式化。"""
+
+    def __init__(self, limit: int, interval: float, max_keys: int = 1000):
+        super().__init__()
+        self._limit = limit
+        self._interval = interval
+        self._max_keys = max_keys
+        # key -> [時間窗開始, 本窗已放行數, 本窗被壓下數]
+        self._windows: "OrderedDict[Tuple[str, int, Any], list]" = OrderedDict()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self._interval:
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+            self._windows[key] = [now, 1, 0]
+            self._windows.move_to_end(key)
+            while len(self._windows) > self._max_keys:
+                self._windows.popitem(last=False)
+            return True
+        if window[1] < self._limit:
+            window[1] += 1
+            return True
+        window[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """佇列滿時丟棄新的 record（計數），而不是阻塞呼叫端或印出錯誤。"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只先組好訊息字串與 traceback（之後 record 會跨 thread），其餘格式化交給背景 thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup():
+    """設定 root logger；重複呼叫不會重複安裝。"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    rate_limit = RateLimitFilter(settings.LOG_RATE_LIMIT, settings.LOG_RATE_INTERVAL)
+    handler.addFilter(rate_limit)
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in _parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown)
+
+    metrics.register("logging", lambda: {
+        "queued": handler.queue.qsize(),
+        "dropped": handler.dropped,
+        "suppressed": rate_limit.suppressed,
+    })
+
+
+def shutdown():
+    """把佇列中剩下的 log 寫完並停止背景 thread。"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
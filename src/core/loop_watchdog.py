@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# =========================================================
+# Event loop 延遲監測
+# =========================================================
+#
+# - loop 內的 coroutine 每 LOOP_LAG_INTERVAL 秒 sleep 一次，實際醒來時間與預期的差就是排程延遲
+# - 背景 thread 盯著 coroutine 的心跳；超過 LOOP_LAG_THRESHOLD 還沒醒來，代表 loop 正被同步程式碼卡住，
+#   此時直接讀 loop thread 的 stack（sys._current_frames）與目前的 task，記下是誰在擋
+# 事後才量 lag 只知道「有卡」，stack 必須在卡住的當下抓，所以要另開 thread。
+
+
+class LoopWatchdog:
+    def __init__(self, interval: float, threshold: float, window: int, max_reports: int):
+        self._interval = interval
+        self._threshold = threshold
+        self._lags: Deque[float] = deque(maxlen=window)
+        self._reports: Deque[Dict[str, Any]] = deque(maxlen=max_reports)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        # 已經抓過 stack 的那次心跳，同一次阻塞只回報一次
+        self._captured_heartbeat = 0.0
+        self._pending_report: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    async def run(self):
+        """在 lifespan 以 task 啟動；取消時一併停止監看 thread。"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        thread.start()
+        try:
+            while True:
+                expected = time.monotonic() + self._interval
+                await asyncio.sleep(self._interval)
+                now = time.monotonic()
+                lag = max(0.0, now - expected)
+                self._heartbeat = now
+                self._record(lag)
+        finally:
+            self._stop.set()
+
+    def _record(self, lag: float):
+        self._lags.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        report, self._pending_report = self._pending_report, None
+        if report is not None:
+            # 補上這次阻塞實際持續的時間
+            report["lag"] = round(lag, 4)
+            logger.warning(
+                "event loop 被阻塞",
+                extra={key: report[key] for key in ("lag", "task", "coro", "where", "stack")},
+            )
+
+    def _watch(self):
+        while not self._stop.wait(self._threshold / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self._interval
+            if blocked < self._threshold or heartbeat == self._captured_heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self._loop)
+            frames = traceback.extract_stack(frame)[-settings.LOOP_LAG_STACK_DEPTH:]
+            self._captured_heartbeat = heartbeat
+            self.stalls += 1
+            report = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "task": task.get_name() if task is not None else None,
+                "coro": getattr(task.get_coro(), "__qualname__", None) if task is not None else None,
+                "lag": round(blocked, 4),
+                "where": f"{os.path.basename(frames[-1].filename)}:{frames[-1].lineno} {frames[-1].name}",
+                "stack": "".join(traceback.format_list(frames)),
+            }
+            self._reports.append(report)
+            self._pending_report = report
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+        p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+        return {
+            "lag_last": round(self._lags[-1], 4) if self._lags else 0.0,
+            "lag_p99": round(p99, 4),
+            "lag_max": round(self.max_lag, 4),
+            "stalls": self.stalls,
+            "recent_stalls": [
+                {key: value for key, value in report.items() if key != "stack"}
+                for report in list(self._reports)[-5:]
+            ],
+        }
+
+
+watchdog = LoopWatchdog(
+    interval=settings.LOOP_LAG_INTERVAL,
+    threshold=settings.LOOP_LAG_THRESHOLD,
+    window=settings.LOOP_LAG_WINDOW,
+    max_reports=settings.LOOP_LAG_REPORTS,
+)
+metrics.register("event_loop", watchdog.stats)
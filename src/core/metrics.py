@@ -0,0 +1,18 @@
+from typing import Any, Callable, Dict
+
+
+# =========================================================
+# 執行期指標：各模組註冊一個回傳 dict 的函式，/api/metrics 時才呼叫
+# =========================================================
+
+Source = Callable[[], Dict[str, Any]]
+
+_sources: Dict[str, Source] = {}
+
+
+def register(name: str, source: Source):
+    _sources[name] = source
+
+
+def snapshot() -> Dict[str, Any]:
+    return {name: source() for name, source in _sources.items()}
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from core import metrics
+from core.config import settings
+from core.security import InvalidToken, token_verifier
+
+logger = logging.getLogger(__name__)
+
+
+# =========================================================
+# 取樣式 profiler（只在有人要求時執行）
+# =========================================================
+#
+# 背景 thread 每 PROFILE_INTERVAL 秒讀一次 event loop thread 的 stack（sys._current_frames），
+# 累計成 collapsed stack（"a.py:f;b.py:g 42"），可直接丟給 flamegraph.pl 或 speedscope。
+# 不 hook 任何函式呼叫，沒有 session 時 thread 不存在，所以可以對正式流量開。
+#
+# 兩種 session：
+# - 單一請求：admin 帶 X-Profile header，只取樣該請求的 task 正在執行的時間
+# - 時間窗：POST /api/profile/start，取樣整個 event loop（含 mqtt_listener / handle_message）
+
+
+class ProfileSession:
+    def __init__(self, label: str, task: Optional[asyncio.Task], deadline: Optional[float]):
+        self.label = label
+        self.task = task
+        self.deadline = deadline
+        self.started_at = datetime.now(timezone.utc)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        safe_label = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in label)[:60]
+        self.filename = (
+            f"{self.started_at:%Y%m%dT%H%M%S}-{safe_label or 'profile'}-{uuid.uuid4().hex[:6]}.folded"
+        )
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float, out_dir: str, max_seconds: float):
+        self._interval = interval
+        self._out_dir = out_dir
+        self._max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._sessions: List[ProfileSession] = []
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self.sessions_started = 0
+        self.files_written = 0
+
+    def start(self, label: str, task: Optional[asyncio.Task] = None,
+              seconds: Optional[float] = None) -> ProfileSession:
+        """在 event loop 內呼叫。task=None 代表取樣整個 loop，seconds 到期後自動寫檔。"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        seconds = min(seconds or self._max_seconds, self._max_seconds)
+        session = ProfileSession(label, task, time.monotonic() + seconds)
+        with self._lock:
+            self._sessions.append(session)
+            self.sessions_started += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    async def stop(self, session: ProfileSession):
+        """結束 session 並寫檔（在 thread 裡寫，不擋 event loop）。"""
+        with self._lock:
+            if session not in self._sessions:
+                return
+            self._sessions.remove(session)
+        await asyncio.to_thread(self._write, session)
+
+    async def stop_all(self):
+        """關閉服務時呼叫：把還在取樣的 session 全部結束並寫檔。"""
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            await self.stop(session)
+
+    def _run(self):
+        while True:
+            time.sleep(self._interval)
+            frame = sys._current_frames().get(self._loop_thread_id)
+            current = asyncio.current_task(self._loop) if self._loop is not None else None
+            stack = _collapse(frame) if frame is not None else None
+            now = time.monotonic()
+            expired = []
+            with self._lock:
+                for session in self._sessions:
+                    if session.deadline is not None and now >= session.deadline:
+                        expired.append(session)
+                    elif stack is not None and (session.task is None or session.task is current):
+                        session.stacks[stack] += 1
+                        session.samples += 1
+                for session in expired:
+                    self._sessions.remove(session)
+                # 在鎖內決定是否結束，避免 start() 同時判斷 thread 還在而不另開
+                finished = not self._sessions
+                if finished:
+                    self._thread = None
+            for session in expired:
+                self._write(session)
+            if finished:
+                return
+
+    def _write(self, session: ProfileSession):
+        os.makedirs(self._out_dir, exist_ok=True)
+        path = os.path.join(self._out_dir, session.filename)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in session.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.files_written += 1
+        logger.info(
+            "profile 已寫入",
+            extra={"file": path, "samples": session.samples, "label": session.label},
+        )
+
+    def active(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "label": session.label,
+                    "file": session.filename,
+                    "samples": session.samples,
+                    "remaining": max(0.0, session.deadline - now),
+                }
+                for session in self._sessions
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = len(self._sessions)
+        return {
+            "active_sessions": active,
+            "sessions_started": self.sessions_started,
+            "files_written": self.files_written,
+        }
+
+    def files(self) -> List[str]:
+        if not os.path.isdir(self._out_dir):
+            return []
+        return sorted(name for name in os.listdir(self._out_dir) if name.endswith(".folded"))
+
+
+profiler = SamplingProfiler(
+    interval=settings.PROFILE_INTERVAL,
+    out_dir=settings.PROFILE_DIR,
+    max_seconds=settings.PROFILE_MAX_SECONDS,
+)
+metrics.register("profiler", profiler.stats)
+
+
+def _is_admin(headers: dict) -> bool:
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        return token_verifier.verify(token) in settings.admin_uids
+    except InvalidToken:
+        return False
+
+
+class ProfileMiddleware:
+    """
+    ASGI middleware：admin 帶 "X-Profile: 1" 的請求會被單獨取樣，
+    回應帶 X-Profile-File 告知檔名。其他請求只多一次 header 查找。
+    （純 ASGI 而非 BaseHTTPMiddleware，handler 才會跑在同一個 task 裡）
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if b"x-profile" not in headers or not _is_admin(headers):
+            return await self.app(scope, receive, send)
+
+        session = profiler.start(f"{scope['method']}-{scope['path']}", task=asyncio.current_task())
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-profile-file", session.filename.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            await profiler.stop(session)
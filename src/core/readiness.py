@@ -0,0 +1,54 @@
+import time
+from typing import Any, Dict, Optional, Set
+
+
+# =========================================================
+# 啟動進度 / readiness
+# =========================================================
+#
+# lifespan 的每個啟動步驟完成後 mark_ready；/readyz 在所有 required 步驟完成前回 503，
+# 讓 orchestrator 只把流量導到連線池與快取都已暖好的 instance。
+# 非 required 的元件（例如 MQTT broker）只回報狀態：broker 斷線時 HTTP API 仍可服務。
+
+
+class Readiness:
+    def __init__(self):
+        self._started_at = time.monotonic()
+        self._ready_at: Optional[float] = None
+        self._components: Dict[str, bool] = {}
+        self._required: Set[str] = set()
+        # 啟動步驟拋出例外時記下；/healthz 因此回 503，讓 orchestrator 重啟 instance
+        self.error: Optional[str] = None
+
+    def expect(self, name: str, required: bool = True):
+        self._components.setdefault(name, False)
+        if required:
+            self._required.add(name)
+
+    def mark_ready(self, name: str):
+        self._components[name] = True
+        if self._ready_at is None and self.ready:
+            self._ready_at = time.monotonic()
+
+    def mark_not_ready(self, name: str):
+        self._components[name] = False
+
+    def fail(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def ready(self) -> bool:
+        return self.error is None and bool(self._required) and all(self._components[name] for name in self._required)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "components": dict(self._components),
+            "error": self.error,
+            "startup_seconds": (
+                round(self._ready_at - self._started_at, 3) if self._ready_at is not None else None
+            ),
+        }
+
+
+readiness = Readiness()
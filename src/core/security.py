@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# =========================================================
+# Bearer token（HS256 JWT）本地驗證
+# =========================================================
+#
+# - 金鑰來源：settings.JWT_SECRET（預設金鑰）以及 settings.JWT_KEYS_FILE
+#   （JSON: {"kid": "secret", ...}），檔案依 mtime 熱重載。
+# - 驗證過的 token 以 sha256(token) 為 key 放進有上限的 TTL 快取，
+#   熱門路徑（join / leave）重複驗證只需一次 dict 查詢。
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _numeric_claim(payload: Dict[str, Any], name: str) -> Optional[float]:
+    """exp / nbf 必須是有限的數字（NaN 會讓過期檢查永遠不成立）。"""
+    value = payload.get(name)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError) as e:
+        raise InvalidToken(f"Invalid {name} claim") from e
+    if isinstance(value, bool) or not math.isfinite(number):
+        raise InvalidToken(f"Invalid {name} claim")
+    return number
+
+
+class KeyRing:
+    """HMAC 金鑰集合；keys 檔案變動時自動重載。"""
+
+    def __init__(self, default_secret: str, keys_file: str, reload_interval: float):
+        self._default = default_secret.encode() if default_secret else None
+        self._keys_file = keys_file
+        self._reload_interval = reload_interval
+        self._keys: Dict[str, bytes] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+        self.version = 0
+
+    def refresh(self) -> int:
+        """必要時重載 keys 檔案，回傳目前的金鑰版本。"""
+        self._maybe_reload()
+        return self.version
+
+    def _maybe_reload(self):
+        if not self._keys_file:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self._reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self._keys_file).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        keys: Dict[str, bytes] = {}
+        if mtime is not None:
+            try:
+                with open(self._keys_file, encoding="utf-8") as f:
+                    keys = {str(kid): secret.encode() for kid, secret in json.load(f).items()}
+            except (OSError, ValueError, AttributeError, TypeError):
+                # 格式錯誤或寫到一半：沿用舊金鑰，下一個 reload_interval 再試
+                logger.exception("JWT keys 檔案載入失敗，沿用目前的金鑰", extra={"keys_file": self._keys_file})
+                return
+        self._keys = keys
+        self._mtime = mtime
+        self.version += 1
+
+    def get(self, kid: Optional[str]) -> Optional[bytes]:
+        if kid is None:
+            return self._default
+        return self._keys.get(kid)
+
+
+class VerifiedTokenCache:
+    """以 token hash 為 key 的 LRU + TTL 快取。"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, UUID]]" = OrderedDict()
+
+    def get(self, key: bytes) -> Optional[UUID]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, subject = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return subject
+
+    def put(self, key: bytes, subject: UUID, token_exp: Optional[float]):
+        expires_at = time.time() + self._ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        self._entries[key] = (expires_at, subject)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class TokenVerifier:
+    def __init__(self, keys: KeyRing, cache: VerifiedTokenCache, leeway: float):
+        self._keys = keys
+        self._cache = cache
+        self._leeway = leeway
+        self._keys_version = keys.version
+
+    def verify(self, token: str) -> UUID:
+        """驗證 token 並回傳 sub（使用者 UUID）；不合法丟出 InvalidToken。"""
+        version = self._keys.refresh()
+        if version != self._keys_version:
+            # 金鑰輪替後，舊的驗證結果一律作廢
+            self._cache.clear()
+            self._keys_version = version
+
+        cache_key = hashlib.sha256(token.encode()).digest()
+        subject = self._cache.get(cache_key)
+        if subject is not None:
+            return subject
+
+        subject, exp = self._verify_signature_and_claims(token)
+        self._cache.put(cache_key, subject, exp)
+        return subject
+
+    def _verify_signature_and_claims(self, token: str) -> Tuple[UUID, Optional[float]]:
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            header: Dict[str, Any] = json.loads(_b64url_decode(header_b64))
+            payload: Dict[str, Any] = json.loads(_b64url_decode(payload_b64))
+            signature = _b64url_decode(signature_b64)
+        except ValueError as e:
+            raise InvalidToken("Malformed token") from e
+        if not isinstance(header, dict) or not isinstance(payload, dict):
+            raise InvalidToken("Malformed token")
+
+        if header.get("alg") != "HS256":
+            raise InvalidToken("Unsupported token algorithm")
+        kid = header.get("kid")
+        if kid is not None and not isinstance(kid, str):
+            raise InvalidToken("Malformed token")
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidToken("Unknown signing key")
+
+        signing_input = f"{header_b64}.{payload_b64}".encode()
+        expected = hmac.new(key, signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, signature):
+            raise InvalidToken("Invalid token signature")
+
+        now = time.time()
+        exp = _numeric_claim(payload, "exp")
+        if exp is not None and now > exp + self._leeway:
+            raise InvalidToken("Token expired")
+        nbf = _numeric_claim(payload, "nbf")
+        if nbf is not None and now + self._leeway < nbf:
+            raise InvalidToken("Token not yet valid")
+
+        try:
+            subject = UUID(str(payload["sub"]))
+        except (KeyError, ValueError) as e:
+            raise InvalidToken("Token subject must be a user UUID") from e
+        return subject, exp
+
+
+token_verifier = TokenVerifier(
+    keys=KeyRing(
+        default_secret=settings.JWT_SECRET,
+        keys_file=settings.JWT_KEYS_FILE,
+        reload_interval=settings.JWT_KEYS_RELOAD_INTERVAL,
+    ),
+    cache=VerifiedTokenCache(
+        max_size=settings.AUTH_CACHE_SIZE,
+        ttl=settings.AUTH_CACHE_TTL,
+    ),
+    leeway=settings.JWT_LEEWAY,
+)
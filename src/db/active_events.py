@@ -0,0 +1,333 @@
+import bisect
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+import asyncpg
+
+
+# =========================================================
+# 進行中活動的記憶體快照
+# =========================================================
+#
+# 進行中（open / full）的活動數量不多、變動也慢，
+# 啟動時從資料庫載入一次，之後由 db_utils 的寫入路徑
+# （以及其他 instance 透過 NOTIFY 送來的變更）增量更新。
+# /api/record/all 與 /api/record/get/{user_id} 直接從這裡讀。
+
+ACTIVE_STATUSES = ("open", "full")
+
+
+def as_uuid(value: Any) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+def as_datetime(value: Any) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+class ActiveEvent:
+    """單一進行中活動；用 __slots__ 壓低每列的記憶體。"""
+
+    __slots__ = (
+        "uid",
+        "sport",
+        "center_id",
+        "center_name",
+        "start_time",
+        "end_time",
+        "capacity",
+        "status",
+        "organizer_uid",
+        "participants",
+    )
+
+    def __init__(
+        self,
+        uid: UUID,
+        sport: str,
+        center_id: UUID,
+        center_name: Optional[str],
+        start_time: datetime,
+        end_time: datetime,
+        capacity: int,
+        status: str,
+        organizer_uid: UUID,
+    ):
+        self.uid = uid
+        self.sport = sport
+        self.center_id = center_id
+        self.center_name = center_name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.capacity = capacity
+        self.status = status
+        self.organizer_uid = organizer_uid
+        self.participants: Set[UUID] = set()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """輸出成與原本 SQL 查詢相同欄位的 dict。"""
+        return {
+            "uid": self.uid,
+            "sport": self.sport,
+            "center_id": self.center_id,
+            "center_name": self.center_name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "capacity": self.capacity,
+            "status": self.status,
+            "organizer_uid": self.organizer_uid,
+        }
+
+
+class ActiveEventStore:
+    """
+    以 sport / center / start_time / participant 建索引的進行中活動集合。
+
+    變更格式（dict，可 JSON 化後透過 NOTIFY 傳遞）：
+    - {"op": "create", "event": {...活動欄位...}, "participants": [...]}
+    - {"op": "join",   "event_uid": ..., "user_uid": ..., "status": ...}
+    - {"op": "leave",  "event_uid": ..., "user_uid": ..., "status": ... | None}
+    - {"op": "status", "event_uid": ..., "status": ...}
+    - {"op": "remove", "event_uid": ...}
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._loading = False
+        self._pending: List[Dict[str, Any]] = []
+        self._reset()
+
+    def _reset(self):
+        self._events: Dict[UUID, ActiveEvent] = {}
+        self._by_sport: Dict[str, Set[UUID]] = {}
+        self._by_center: Dict[UUID, Set[UUID]] = {}
+        self._by_user: Dict[UUID, Set[UUID]] = {}
+        self._starts: List[Tuple[datetime, UUID]] = []
+        self._center_ids: Dict[str, UUID] = {}
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    # -----------------------------------------------------
+    # 載入 / 失效
+    # -----------------------------------------------------
+
+    async def load(self, conn: asyncpg.Connection):
+        """
+        從資料庫重建整份快照。
+        載入期間收到的變更先暫存，換上新快照後依序重播，避免遺漏。
+        """
+        self._loading = True
+        self._pending = []
+        try:
+            event_rows = await conn.fetch(
+                """
+                SELECT
+                    e.uid,
+                    e.sport,
+                    e.center_id,
+                    c.name AS center_name,
+                    e.start_time,
+                    e.end_time,
+                    e.capacity,
+                    e.status,
+                    e.organizer_uid
+                FROM events e
+                LEFT JOIN centers c
+                    ON c.id = e.center_id
+                WHERE
+                    e.status NOT IN ('cancelled', 'closed')
+                    AND e.end_time > NOW();
+                """
+            )
+            participant_rows = await conn.fetch(
+                """
+                SELECT p.event_uid, p.user_uid
+                FROM participants p
+                JOIN events e
+                    ON e.uid = p.event_uid
+                WHERE
+                    e.status NOT IN ('cancelled', 'closed')
+                    AND e.end_time > NOW();
+                """
+            )
+        except BaseException:
+            self._loading = False
+            self._pending = []
+            raise
+
+        self._reset()
+        for row in event_rows:
+            self._insert(ActiveEvent(**dict(row)))
+        for row in participant_rows:
+            self._add_participant(row["event_uid"], row["user_uid"])
+
+        pending, self._pending = self._pending, []
+        self._loading = False
+        self.loaded = True
+        for change in pending:
+            self._apply(change)
+
+    def invalidate(self):
+        """丟掉快照，下次讀取時重新載入（例如 LISTEN 連線中斷時）。"""
+        self.loaded = False
+        self._reset()
+
+    # -----------------------------------------------------
+    # 增量變更
+    # -----------------------------------------------------
+
+    def apply(self, change: Dict[str, Any]):
+        if self._loading:
+            self._pending.append(change)
+        elif self.loaded:
+            self._apply(change)
+
+    def _apply(self, change: Dict[str, Any]):
+        op = change["op"]
+        if op == "create":
+            data = dict(change["event"])
+            event = ActiveEvent(
+                uid=as_uuid(data["uid"]),
+                sport=data["sport"],
+                center_id=as_uuid(data["center_id"]),
+                center_name=data.get("center_name"),
+                start_time=as_datetime(data["start_time"]),
+                end_time=as_datetime(data["end_time"]),
+                capacity=int(data["capacity"]),
+                status=data["status"],
+                organizer_uid=as_uuid(data["organizer_uid"]),
+            )
+            if event.uid in self._events:
+                return
+            self._insert(event)
+            for user_uid in change.get("participants", ()):
+                self._add_participant(event.uid, user_uid)
+            return
+
+        event_uid = as_uuid(change["event_uid"])
+        if op == "remove":
+            self._remove(event_uid)
+            return
+
+        event = self._events.get(event_uid)
+        if event is None:
+            return
+        if op == "join":
+            self._add_participant(event_uid, change["user_uid"])
+        elif op == "leave":
+            self._remove_participant(event_uid, change["user_uid"])
+
+        status = change.get("status")
+        if status is not None:
+            if status in ACTIVE_STATUSES:
+                event.status = status
+            else:
+                self._remove(event_uid)
+
+    def _insert(self, event: ActiveEvent):
+        self._events[event.uid] = event
+        self._by_sport.setdefault(event.sport, set()).add(event.uid)
+        self._by_center.setdefault(event.center_id, set()).add(event.uid)
+        if event.center_name is not None:
+            self._center_ids[event.center_name] = event.center_id
+        bisect.insort(self._starts, (event.start_time, event.uid))
+
+    def _remove(self, event_uid: UUID):
+        event = self._events.pop(event_uid, None)
+        if event is None:
+            return
+        self._discard(self._by_sport, event.sport, event_uid)
+        self._discard(self._by_center, event.center_id, event_uid)
+        for user_uid in event.participants:
+            self._discard(self._by_user, user_uid, event_uid)
+        idx = bisect.bisect_left(self._starts, (event.start_time, event_uid))
+        if idx < len(self._starts) and self._starts[idx][1] == event_uid:
+            del self._starts[idx]
+
+    def _add_participant(self, event_uid: Any, user_uid: Any):
+        event = self._events.get(as_uuid(event_uid))
+        if event is None:
+            return
+        user_uid = as_uuid(user_uid)
+        event.participants.add(user_uid)
+        self._by_user.setdefault(user_uid, set()).add(event.uid)
+
+    def _remove_participant(self, event_uid: Any, user_uid: Any):
+        event = self._events.get(as_uuid(event_uid))
+        if event is None:
+            return
+        user_uid = as_uuid(user_uid)
+        event.participants.discard(user_uid)
+        self._discard(self._by_user, user_uid, event.uid)
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[UUID]], key: Any, event_uid: UUID):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.discard(event_uid)
+        if not bucket:
+            del index[key]
+
+    # -----------------------------------------------------
+    # 讀取
+    # -----------------------------------------------------
+
+    def prune_expired(self, now: Optional[datetime] = None) -> List[UUID]:
+        """移除 end_time 已過的活動，回傳被移除的 uid 列表。"""
+        now = now or datetime.now(timezone.utc)
+        expired = [uid for uid, e in self._events.items() if e.end_time <= now]
+        for uid in expired:
+            self._remove(uid)
+        return expired
+
+    def query(
+        self,
+        sport: Optional[str] = None,
+        center_name: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """依 start_time 排序回傳符合條件的活動。"""
+        candidates: Optional[Set[UUID]] = None
+        if sport is not None:
+            candidates = self._by_sport.get(sport, set())
+        if center_name is not None:
+            center_id = self._center_ids.get(center_name)
+            in_center = self._by_center.get(center_id, set())
+            candidates = in_center if candidates is None else candidates & in_center
+
+        start = 0
+        if start_time is not None:
+            start = bisect.bisect_left(self._starts, (start_time, UUID(int=0)))
+        return self._collect(
+            (uid for _, uid in self._starts[start:]),
+            candidates,
+        )
+
+    def for_user(self, user_uid: Any) -> List[Dict[str, Any]]:
+        event_uids = self._by_user.get(as_uuid(user_uid), set())
+        ordered = sorted(
+            (self._events[uid] for uid in event_uids),
+            key=lambda e: e.start_time,
+        )
+        return [e.as_dict() for e in ordered]
+
+    def _collect(
+        self, ordered_uids: Iterable[UUID], candidates: Optional[Set[UUID]]
+    ) -> List[Dict[str, Any]]:
+        return [
+            self._events[uid].as_dict()
+            for uid in ordered_uids
+            if candidates is None or uid in candidates
+        ]
+
+
+def encode_change(change: Dict[str, Any], origin: str) -> str:
+    return json.dumps({**change, "origin": origin}, default=str)
+
+
+def decode_change(payload: str) -> Dict[str, Any]:
+    return json.loads(payload)
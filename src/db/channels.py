@@ -0,0 +1,88 @@
+from typing import Any, Callable, Dict, List, Set
+from uuid import UUID
+
+import asyncpg
+
+from db.active_events import as_uuid
+
+
+# =========================================================
+# 現存聊天頻道 id 的記憶體集合
+# =========================================================
+#
+# 每個活動建立時會同時建立同 id 的 channel，活動刪除時串聯刪除，
+# 所以沿用 active_events 的變更（create / remove）維護，不需要另外通知。
+# msg_log_server 收到訊息時先查這裡，不存在的頻道直接丟棄，不必借連線、跑注定失敗的 INSERT。
+# 頻道被移除時通知 add_remove_listener 註冊的函式（例如清掉聊天紀錄快取）。
+
+
+class UnknownChannelError(Exception):
+    """寫入訊息時頻道已不存在。"""
+
+
+class ChannelRegistry:
+    def __init__(self):
+        self.loaded = False
+        self._loading = False
+        self._pending: List[Dict[str, Any]] = []
+        self._ids: Set[UUID] = set()
+        # invalidate 前的集合；重新載入後比對，斷線期間被刪的頻道也會通知
+        self._previous_ids: Set[UUID] = set()
+        self._remove_listeners: List[Callable[[UUID], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, channel_id: Any) -> bool:
+        return as_uuid(channel_id) in self._ids
+
+    async def load(self, conn: asyncpg.Connection):
+        """從資料庫載入全部 channel id；載入期間收到的變更暫存後重播。"""
+        self._loading = True
+        self._pending = []
+        try:
+            rows = await conn.fetch("SELECT channel_id FROM channels;")
+        except BaseException:
+            self._loading = False
+            self._pending = []
+            raise
+        self._ids = {row["channel_id"] for row in rows}
+        removed, self._previous_ids = self._previous_ids - self._ids, set()
+        pending, self._pending = self._pending, []
+        self._loading = False
+        self.loaded = True
+        for channel_id in removed:
+            self._notify_removed(channel_id)
+        for change in pending:
+            self._apply(change)
+
+    def invalidate(self):
+        self.loaded = False
+        self._previous_ids |= self._ids
+        self._ids = set()
+
+    def add_remove_listener(self, listener: Callable[[UUID], None]):
+        self._remove_listeners.append(listener)
+
+    def _notify_removed(self, channel_id: UUID):
+        for listener in self._remove_listeners:
+            listener(channel_id)
+
+    def apply(self, change: Dict[str, Any]):
+        if self._loading:
+            self._pending.append(change)
+        elif self.loaded:
+            self._apply(change)
+
+    def _apply(self, change: Dict[str, Any]):
+        op = change["op"]
+        if op == "create":
+            self._ids.add(as_uuid(change["event"]["uid"]))
+        elif op == "remove":
+            self.discard(change["event_uid"])
+
+    def discard(self, channel_id: Any):
+        """頻道被刪除（remove 變更，或寫入時才發現資料庫已經沒有）時呼叫。"""
+        channel_id = as_uuid(channel_id)
+        self._ids.discard(channel_id)
+        self._notify_removed(channel_id)
@@ -1,42 +1,203 @@
+import asyncio
 import asyncpg
+import hashlib
+import itertools
+import json
+import re
+import time
+import uuid
+from uuid import UUID
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import AsyncGenerator, Optional, List, Dict, Any
-from datetime import datetime, timezone
+from typing import AsyncGenerator, AsyncIterator, Callable, Optional, List, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
+from core import metrics
 from core.config import settings
+from core.readiness import readiness
+from db.active_events import ActiveEventStore, as_datetime, as_uuid, encode_change, decode_change
+from db.channels import ChannelRegistry, UnknownChannelError
+from db.deadlines import DeadlineScheduler
+from db.known_users import KnownUsers
+from db.single_flight import single_flight
+from msg import publisher
 
 
-_pool: Optional[asyncpg.Pool] = None
+# 進行中活動快照與其 LISTEN 連線
+ACTIVE_EVENTS_CHANNEL = "active_events"
+REFERENCE_DATA_CHANNEL = "reference_data"
+_INSTANCE_ID = uuid.uuid4().hex
+_active_events = ActiveEventStore()
+_listener_conn: Optional[asyncpg.Connection] = None
+# 啟動時 load_active_events / load_channels 並行，只開一條 LISTEN 連線
+_listener_lock = asyncio.Lock()
+
+# 現存聊天頻道 id（跟著活動的 create / remove 變更維護）
+_channels = ChannelRegistry()
+_channels_lock = asyncio.Lock()
+
+# 已存在於 users 表的使用者；未命中的合併成一次 upsert
+_known_users = KnownUsers(settings.KNOWN_USERS_CACHE_SIZE)
+_pending_users: Dict[UUID, asyncio.Future] = {}
+_user_flush_task: Optional[asyncio.Task] = None
+
+# 活動生命週期排程：開始前提醒 / 開始時截止報名 / 結束後刪除
+_event_deadlines = DeadlineScheduler()
+
+# 球種 / 場館 / 合法組合只會被匯入改動，讀過就快取，匯入後失效
+_reference_cache: Dict[str, Any] = {}
+_reference_generation = 0
 
 
 # =========================================================
-# 連線池（使用 Settings）
+# 連線池（使用 Settings）：依工作類型分開
 # =========================================================
+#
+# - api：HTTP 請求
+# - ingest：MQTT 聊天訊息寫入
+# - maintenance：排程器、過期清理、快照載入、匯入 / 匯出等背景或大量工作
+# 各自有獨立的池子與上限，聊天爆量或清理作業不會吃掉 API 的連線。
+
+API_POOL = "api"
+INGEST_POOL = "ingest"
+MAINTENANCE_POOL = "maintenance"
+
+POOL_SIZES = {
+    API_POOL: settings.DB_POOL_API_SIZE,
+    INGEST_POOL: settings.DB_POOL_INGEST_SIZE,
+    MAINTENANCE_POOL: settings.DB_POOL_MAINTENANCE_SIZE,
+}
+
+_pools: Dict[str, asyncpg.Pool] = {}
+# 每種池子各自一把鎖，啟動時可同時建立
+_pool_locks = {kind: asyncio.Lock() for kind in POOL_SIZES}
 
 
-async def get_pool() -> asyncpg.Pool:
+async def get_pool(kind: str = API_POOL) -> asyncpg.Pool:
     """
-    懶人初始化連線池，確保全程只建一個 pool。
+    懶人初始化連線池，每種工作類型只建一個 pool。
     設定來源同 session.py: 使用 core.config.settings
     """
-    global _pool
-    if _pool is None:
-        _pool = await asyncpg.create_pool(
-            user=settings.POSTGRES_USERNAME,
-            password=settings.POSTGRES_PASSWORD,
-            database=settings.POSTGRES_DB,
-            host=settings.POSTGRES_SERVER,
-            port=settings.POSTGRES_PORT,
-            min_size=1,
-            max_size=10,
-        )
-    return _pool
+    pool = _pools.get(kind)
+    if pool is not None:
+        return pool
+    async with _pool_locks[kind]:
+        if kind not in _pools:
+            _pools[kind] = await asyncpg.create_pool(
+                user=settings.POSTGRES_USERNAME,
+                password=settings.POSTGRES_PASSWORD,
+                database=settings.POSTGRES_DB,
+                host=settings.POSTGRES_SERVER,
+                port=settings.POSTGRES_PORT,
+                min_size=1,
+                max_size=POOL_SIZES[kind],
+            )
+    return _pools[kind]
+
+
+async def warm_pools():
+    """啟動時先建好 API / 寫入連線池，第一個請求不必等建立連線。"""
+    await asyncio.gather(get_pool(API_POOL), get_pool(INGEST_POOL))
+
+
+class PoolWaitTracker:
+    """
+    追蹤向連線池借連線要等多久，給 admission control 判斷是否該卸載流量。
+    - 正在等的人：以最久那位已等待的時間計
+    - 已借到的人：最近一次的等待時間，只在 window 秒內有效
+    另外累計借用次數 / 總等待時間 / 等超過 slow 秒的次數，作為飽和度指標。
+    """
+
+    def __init__(self, window: float = 1.0, slow: float = 0.1):
+        self._window = window
+        self._slow = slow
+        self._tokens = itertools.count()
+        self._waiting: Dict[int, float] = {}
+        self._last_wait = 0.0
+        self._last_at = float("-inf")
+        self.acquired = 0
+        self.slow_acquires = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def start(self) -> int:
+        token = next(self._tokens)
+        self._waiting[token] = time.perf_counter()
+        return token
+
+    def finish(self, token: int):
+        started = self._waiting.pop(token, None)
+        if started is not None:
+            now = time.perf_counter()
+            self._last_wait = now - started
+            self._last_at = now
+            self.acquired += 1
+            self.total_wait += self._last_wait
+            self.max_wait = max(self.max_wait, self._last_wait)
+            if self._last_wait > self._slow:
+                self.slow_acquires += 1
+
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def current_wait(self) -> float:
+        now = time.perf_counter()
+        oldest = min(self._waiting.values(), default=now)
+        recent = self._last_wait if now - self._last_at < self._window else 0.0
+        return max(now - oldest, recent)
+
+
+pool_waits = {kind: PoolWaitTracker() for kind in POOL_SIZES}
+# admission control 只看 API 池
+pool_wait = pool_waits[API_POOL]
+
+
+@asynccontextmanager
+async def acquire(kind: str = API_POOL) -> AsyncIterator[asyncpg.Connection]:
+    """從指定工作類型的連線池借一條連線，並記錄等待時間。"""
+    pool = await get_pool(kind)
+    tracker = pool_waits[kind]
+    token = tracker.start()
+    try:
+        conn = await pool.acquire()
+    finally:
+        tracker.finish(token)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """各連線池的大小 / 使用中 / 排隊中與等待時間統計。"""
+    stats = {}
+    for kind, max_size in POOL_SIZES.items():
+        tracker = pool_waits[kind]
+        pool = _pools.get(kind)
+        size = pool.get_size() if pool is not None else 0
+        idle = pool.get_idle_size() if pool is not None else 0
+        stats[kind] = {
+            "max_size": max_size,
+            "size": size,
+            "in_use": size - idle,
+            "waiting": tracker.waiting(),
+            "current_wait": tracker.current_wait(),
+            "acquired": tracker.acquired,
+            "slow_acquires": tracker.slow_acquires,
+            "avg_wait": tracker.total_wait / tracker.acquired if tracker.acquired else 0.0,
+            "max_wait": tracker.max_wait,
+        }
+    return stats
+
+
+metrics.register("db_pools", pool_stats)
 
 async def get_db() -> AsyncGenerator[asyncpg.Connection, None]:
-    if _pool is None:
+    pool = _pools.get(API_POOL)
+    if pool is None:
         raise RuntimeError(
             "Database pool is not initialized. Call init_db_pool() first."
         )
-    async with _pool.acquire() as connection:
+    async with pool.acquire() as connection:
         async with connection.transaction():
             yield connection
 
@@ -44,28 +205,259 @@ async def get_db() -> AsyncGenerator[asyncpg.Connection, None]:
 # 初始化：若尚未建表則執行 schema.sql
 # =========================================================
 
+# 建表之後新增的索引 / 欄位 / 資料表。
+# 內容有變（checksum 不在 schema_upgrades 裡）時才會整段執行；
+# 舊版資料庫第一次套用時可能已有部分物件，所以仍必須是 idempotent（IF NOT EXISTS）。
+_SCHEMA_UPGRADES = """
+-- 訊息查詢：依頻道 / 發送者按時間排序
+CREATE INDEX IF NOT EXISTS idx_messages_channel_ts ON messages (channel_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_uid_ts ON messages (uid, timestamp);
+
+-- 訊息全文搜尋：
+-- - search_tsv（simple 斷詞）給以空白分詞的文字
+-- - pg_trgm 三連字索引給中文等 CJK 文字（沒有空白可斷詞）
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', coalesce(payload #>> '{}', ''))) STORED;
+CREATE INDEX IF NOT EXISTS idx_messages_search_tsv ON messages USING GIN (search_tsv);
+CREATE INDEX IF NOT EXISTS idx_messages_search_trgm
+    ON messages USING GIN ((payload #>> '{}') gin_trgm_ops);
+
+-- 額滿活動的候補名單（依 created_at 先來先遞補）
+CREATE TABLE IF NOT EXISTS waitlist (
+    event_uid  UUID        NOT NULL,
+    user_uid   UUID        NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+
+    PRIMARY KEY (event_uid, user_uid),
+
+    CONSTRAINT fk_waitlist_event
+        FOREIGN KEY (event_uid)
+        REFERENCES events (uid)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE,
+
+    CONSTRAINT fk_waitlist_user
+        FOREIGN KEY (user_uid)
+        REFERENCES users (uid)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_waitlist_queue ON waitlist (event_uid, created_at);
+
+-- 開始前提醒是否已發送（多 instance 時只發一次）
+ALTER TABLE events ADD COLUMN IF NOT EXISTS reminded BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- 場館 x 球種 x 開始小時（UTC）的活動 / 名額 / 參加人數彙總，由下面的 trigger 增量維護
+CREATE TABLE IF NOT EXISTS event_occupancy (
+    center_id     UUID        NOT NULL,
+    sport         sport_type  NOT NULL,
+    hour_start    TIMESTAMPTZ NOT NULL,
+    events        INT         NOT NULL DEFAULT 0,
+    open_events   INT         NOT NULL DEFAULT 0,
+    full_events   INT         NOT NULL DEFAULT 0,
+    capacity      INT         NOT NULL DEFAULT 0,
+    participants  INT         NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (center_id, sport, hour_start)
+);
+CREATE INDEX IF NOT EXISTS idx_event_occupancy_hour ON event_occupancy (hour_start);
+
+CREATE OR REPLACE FUNCTION event_occupancy_add(
+    p_center_id UUID, p_sport sport_type, p_start_time TIMESTAMPTZ, p_status TEXT,
+    p_sign INT, p_capacity INT, p_participants INT
+) RETURNS VOID AS $$
+DECLARE
+    v_hour TIMESTAMPTZ := date_trunc('hour', p_start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+BEGIN
+    INSERT INTO event_occupancy AS o
+        (center_id, sport, hour_start, events, open_events, full_events, capacity, participants)
+    VALUES (
+        p_center_id, p_sport, v_hour,
+        p_sign,
+        CASE WHEN p_status = 'open' THEN p_sign ELSE 0 END,
+        CASE WHEN p_status = 'full' THEN p_sign ELSE 0 END,
+        p_sign * p_capacity,
+        p_sign * p_participants
+    )
+    ON CONFLICT (center_id, sport, hour_start) DO UPDATE SET
+        events       = o.events       + EXCLUDED.events,
+        open_events  = o.open_events  + EXCLUDED.open_events,
+        full_events  = o.full_events  + EXCLUDED.full_events,
+        capacity     = o.capacity     + EXCLUDED.capacity,
+        participants = o.participants + EXCLUDED.participants;
+
+    IF p_sign < 0 THEN
+        DELETE FROM event_occupancy
+        WHERE center_id = p_center_id AND sport = p_sport AND hour_start = v_hour AND events = 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- events：新增 / 修改 / 刪除時把整場活動（含目前參加人數）移出再移入對應的格子。
+-- 刪除用 BEFORE，趁 participants 還沒被外鍵串聯刪掉時算人數。
+CREATE OR REPLACE FUNCTION event_occupancy_on_event() RETURNS TRIGGER AS $$
+DECLARE
+    v_participants INT := 0;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        SELECT count(*) INTO v_participants FROM participants WHERE event_uid = OLD.uid;
+        PERFORM event_occupancy_add(
+            OLD.center_id, OLD.sport, OLD.start_time, OLD.status::text, -1, OLD.capacity, v_participants
+        );
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    PERFORM event_occupancy_add(
+        NEW.center_id, NEW.sport, NEW.start_time, NEW.status::text, 1, NEW.capacity, v_participants
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- participants：活動還在時才調整人數（活動被刪除時的串聯刪除已由上面扣掉）
+CREATE OR REPLACE FUNCTION event_occupancy_on_participant() RETURNS TRIGGER AS $$
+DECLARE
+    v_event RECORD;
+BEGIN
+    SELECT center_id, sport, start_time INTO v_event
+    FROM events WHERE uid = COALESCE(NEW.event_uid, OLD.event_uid);
+    IF FOUND THEN
+        UPDATE event_occupancy
+        SET participants = participants + CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END
+        WHERE center_id = v_event.center_id
+          AND sport = v_event.sport
+          AND hour_start = date_trunc('hour', v_event.start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_event_occupancy_insert ON events;
+CREATE TRIGGER trg_event_occupancy_insert
+    AFTER INSERT ON events
+    FOR EACH ROW EXECUTE FUNCTION event_occupancy_on_event();
+
+DROP TRIGGER IF EXISTS trg_event_occupancy_update ON events;
+CREATE TRIGGER trg_event_occupancy_update
+    AFTER UPDATE OF center_id, sport, start_time, capacity, status ON events
+    FOR EACH ROW
+    WHEN (OLD.center_id, OLD.sport, OLD.start_time, OLD.capacity, OLD.status)
+        IS DISTINCT FROM (NEW.center_id, NEW.sport, NEW.start_time, NEW.capacity, NEW.status)
+    EXECUTE FUNCTION event_occupancy_on_event();
+
+DROP TRIGGER IF EXISTS trg_event_occupancy_delete ON events;
+CREATE TRIGGER trg_event_occupancy_delete
+    BEFORE DELETE ON events
+    FOR EACH ROW EXECUTE FUNCTION event_occupancy_on_event();
+
+DROP TRIGGER IF EXISTS trg_event_occupancy_participants ON participants;
+CREATE TRIGGER trg_event_occupancy_participants
+    AFTER INSERT OR DELETE ON participants
+    FOR EACH ROW EXECUTE FUNCTION event_occupancy_on_participant();
+
+-- 每位使用者在每個頻道讀到哪裡（未讀數 = 之後別人發的訊息數）
+CREATE TABLE IF NOT EXISTS read_cursors (
+    user_uid     UUID        NOT NULL,
+    channel_id   UUID        NOT NULL,
+    last_read_at TIMESTAMPTZ NOT NULL,
+
+    PRIMARY KEY (user_uid, channel_id),
+
+    CONSTRAINT fk_read_cursors_user
+        FOREIGN KEY (user_uid)
+        REFERENCES users (uid)
+        ON DELETE CASCADE,
+
+    CONSTRAINT fk_read_cursors_channel
+        FOREIGN KEY (channel_id)
+        REFERENCES channels (channel_id)
+        ON DELETE CASCADE
+);
+-- 列出使用者參加的所有頻道（participants 的主鍵以 event_uid 開頭，查不到 user_uid）
+CREATE INDEX IF NOT EXISTS idx_participants_user ON participants (user_uid);
+
+-- 已套用過的 _SCHEMA_UPGRADES 版本（內容的 sha256）
+CREATE TABLE IF NOT EXISTS schema_upgrades (
+    checksum   TEXT PRIMARY KEY,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+_SCHEMA_UPGRADES_CHECKSUM = hashlib.sha256(_SCHEMA_UPGRADES.encode()).hexdigest()
+
+# 多個 instance 同時啟動時，用這個 advisory lock 讓建表 / upgrades 一次只有一個在跑
+# （任意常數，整個資料庫共用同一把）
+_SCHEMA_LOCK_KEY = 0x5350_4F52
+
+# 從 events / participants 重算整張 event_occupancy（第一次建立時，或懷疑彙總漂移時）
+_REBUILD_OCCUPANCY = """
+DELETE FROM event_occupancy;
+INSERT INTO event_occupancy
+    (center_id, sport, hour_start, events, open_events, full_events, capacity, participants)
+SELECT
+    e.center_id,
+    e.sport,
+    date_trunc('hour', e.start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+    count(*),
+    count(*) FILTER (WHERE e.status = 'open'),
+    count(*) FILTER (WHERE e.status = 'full'),
+    sum(e.capacity),
+    coalesce(sum(p.n), 0)
+FROM events e
+LEFT JOIN (
+    SELECT event_uid, count(*) AS n FROM participants GROUP BY event_uid
+) p ON p.event_uid = e.uid
+GROUP BY 1, 2, 3;
+"""
+
+
+async def _schema_upgrades_applied(conn: asyncpg.Connection) -> bool:
+    """目前這版 _SCHEMA_UPGRADES 是否已經套用過。"""
+    if not await conn.fetchval("SELECT to_regclass('public.schema_upgrades') IS NOT NULL;"):
+        return False
+    return await conn.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM schema_upgrades WHERE checksum = $1);",
+        _SCHEMA_UPGRADES_CHECKSUM,
+    )
+
 
 async def init_db(schema_path: str = "schema.sql"):
     """
     啟動服務時呼叫一次：
-    - 若 public.centers 不存在，視為尚未初始化 -> 執行 schema.sql
-    - 若已存在，略過（避免重複 CREATE TABLE 失敗）
+    - 目前這版 _SCHEMA_UPGRADES 已套用過 -> 直接返回，不跑任何 DDL
+      （DDL 會對 events / participants 拿 ACCESS EXCLUSIVE 鎖，不該每次啟動都做）
+    - 否則在同一個交易裡拿 advisory lock 後：
+      - 若 public.centers 不存在，視為尚未初始化 -> 執行 schema.sql
+      - 執行 _SCHEMA_UPGRADES 並記下 checksum
+      同時啟動的 instance 會在鎖上排隊，拿到鎖後再檢查一次，前一個做完就不重跑。
 
     🔹連線設定改為沿用 Settings（透過 get_pool）
     """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        exists_row = await conn.fetchrow(
-            """
-            SELECT EXISTS (
-                SELECT 1 FROM information_schema.tables
-                WHERE table_schema = 'public' AND table_name = 'centers'
-            ) AS exists;
-            """
-        )
-        if not exists_row["exists"]:
-            # asyncpg.execute 可一次吃多個 statement（有分號也可以）
-            await conn.execute("""
+    async with acquire(MAINTENANCE_POOL) as conn:
+        if await _schema_upgrades_applied(conn):
+            return
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1);", _SCHEMA_LOCK_KEY)
+            if await _schema_upgrades_applied(conn):
+                return
+            await _apply_schema(conn)
+
+
+async def _apply_schema(conn: asyncpg.Connection):
+    """init_db 拿到 advisory lock 之後的建表 / upgrades；呼叫端負責交易。"""
+    exists_row = await conn.fetchrow(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.tables
+            WHERE table_schema = 'public' AND table_name = 'centers'
+        ) AS exists;
+        """
+    )
+    if not exists_row["exists"]:
+        # asyncpg.execute 可一次吃多個 statement（有分號也可以）
+        await conn.execute("""
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE TYPE sport_type AS ENUM (
     '羽球',
@@ -232,39 +624,361 @@ CREATE TABLE messages (
 );
                                """)
 
+    occupancy_exists = await conn.fetchval(
+        "SELECT to_regclass('public.event_occupancy') IS NOT NULL;"
+    )
+    await conn.execute(_SCHEMA_UPGRADES)
+    await conn.execute(
+        "INSERT INTO schema_upgrades (checksum) VALUES ($1) ON CONFLICT DO NOTHING;",
+        _SCHEMA_UPGRADES_CHECKSUM,
+    )
+    if not occupancy_exists:
+        await rebuild_occupancy(conn)
+
+
+async def rebuild_occupancy(conn: Optional[asyncpg.Connection] = None):
+    """
+    重算 event_occupancy。
+    鎖住 events / participants 的寫入，避免重算期間 trigger 的增量和重算結果重複。
+    """
+    if conn is None:
+        async with acquire(MAINTENANCE_POOL) as conn:
+            await rebuild_occupancy(conn)
+        return
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE events, participants IN SHARE MODE;")
+        await conn.execute(_REBUILD_OCCUPANCY)
+
 
 # =========================================================
 # 共用小工具
 # =========================================================
 
 
-async def _ensure_user(conn: asyncpg.Connection, user_uid: str):
+async def _ensure_users(user_uids: List[Any]):
+    """
+    確保使用者存在於 users 表。
+    已知的使用者直接略過；其餘排進待寫入清單，由 _flush_users 把同時間的未命中合併成一次 upsert。
+    要在借交易連線之前呼叫，等待 upsert 時不佔住連線。
+    """
+    global _user_flush_task
+    waits = []
+    for user_uid in user_uids:
+        key = as_uuid(user_uid)
+        if key in _known_users:
+            continue
+        future = _pending_users.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            _pending_users[key] = future
+        # shield：某個請求被取消時，不影響等待同一位使用者的其他請求
+        waits.append(asyncio.shield(future))
+    if not waits:
+        return
+    if _user_flush_task is None or _user_flush_task.done():
+        _user_flush_task = asyncio.create_task(_flush_users())
+    await asyncio.gather(*waits)
+
+
+async def _flush_users():
+    # 讓同一輪 event loop 裡的其他請求也排進來
+    await asyncio.sleep(0)
+    while _pending_users:
+        batch = dict(_pending_users)
+        _pending_users.clear()
+        try:
+            async with acquire() as conn:
+                await conn.execute(
+                    """
+                    INSERT INTO users (uid)
+                    SELECT unnest($1::uuid[])
+                    ON CONFLICT (uid) DO NOTHING;
+                    """,
+                    list(batch),
+                )
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        _known_users.add_many(batch)
+        for future in batch.values():
+            if not future.done():
+                future.set_result(None)
+
+
+async def warm_known_users():
+    """啟動時先載入一批既有使用者，暖機期間的報名也不必 upsert。"""
+    async with acquire(MAINTENANCE_POOL) as conn:
+        rows = await conn.fetch(
+            "SELECT uid FROM users LIMIT $1;",
+            settings.KNOWN_USERS_CACHE_SIZE,
+        )
+    _known_users.add_many(row["uid"] for row in rows)
+
+
+# =========================================================
+# 進行中活動快照：載入 / 變更通知
+# =========================================================
+
+
+async def _notify_change(conn: asyncpg.Connection, change: Dict[str, Any]):
+    """
+    在交易內送出 NOTIFY，commit 後才會送達其他 instance。
+    本 instance 的快照由呼叫端在 commit 後直接 _apply_change。
+    """
     await conn.execute(
-        "INSERT INTO users (uid) VALUES ($1) ON CONFLICT (uid) DO NOTHING;",
-        user_uid,
+        "SELECT pg_notify($1, $2);",
+        ACTIVE_EVENTS_CHANNEL,
+        encode_change(change, _INSTANCE_ID),
     )
 
 
+def _apply_change(change: Optional[Dict[str, Any]]):
+    if change is not None:
+        _active_events.apply(change)
+        _channels.apply(change)
+        _track_deadlines(change)
+
+
+def _on_active_events_notify(conn, pid, channel, payload):
+    change = decode_change(payload)
+    if change.pop("origin", None) == _INSTANCE_ID:
+        return
+    _apply_change(change)
+
+
+def _on_reference_data_notify(conn, pid, channel, payload):
+    invalidate_reference_cache()
+
+
+def _on_listener_terminated(conn):
+    # LISTEN 斷線期間的變更會漏掉，直接讓快照失效，下次讀取重新載入
+    global _listener_conn
+    _listener_conn = None
+    _active_events.invalidate()
+    _channels.invalidate()
+    invalidate_reference_cache()
+
+
+async def _listen_notifications():
+    global _listener_conn
+    async with _listener_lock:
+        if _listener_conn is not None and not _listener_conn.is_closed():
+            return
+        conn = await asyncpg.connect(settings.database_url)
+        conn.add_termination_listener(_on_listener_terminated)
+        await conn.add_listener(ACTIVE_EVENTS_CHANNEL, _on_active_events_notify)
+        await conn.add_listener(REFERENCE_DATA_CHANNEL, _on_reference_data_notify)
+        _listener_conn = conn
+
+
+async def load_active_events() -> ActiveEventStore:
+    """
+    確保進行中活動快照已載入（只載一次）。
+    先 LISTEN 再載入，載入期間的變更由 store 暫存後重播。
+    """
+    if not _active_events.loaded:
+        await _load_active_events()
+    return _active_events
+
+
+@single_flight()
+async def _load_active_events():
+    # 進行中活動唯一會查資料庫的地方；同時進來的第一次讀取共用這一次載入
+    if not _active_events.loaded:
+        await _listen_notifications()
+        async with acquire(MAINTENANCE_POOL) as conn:
+            await _cleanup_expired_events(conn)
+            await _active_events.load(conn)
+
+
+async def load_channels() -> ChannelRegistry:
+    """確保頻道 id 集合已載入（只載一次），與 load_active_events 相同的 LISTEN / 重播機制。"""
+    if _channels.loaded:
+        return _channels
+    async with _channels_lock:
+        if not _channels.loaded:
+            await _listen_notifications()
+            async with acquire(MAINTENANCE_POOL) as conn:
+                await _channels.load(conn)
+    return _channels
+
+
+def on_channel_removed(listener: Callable[[UUID], None]):
+    """頻道被刪除時（本 instance 或 NOTIFY 收到的 remove）呼叫 listener(channel_id)。"""
+    _channels.add_remove_listener(listener)
+
+
+def forget_channel(channel_id: Any):
+    """寫入訊息撞到 fk_channel 時呼叫：集合裡有、資料庫卻已刪除的頻道。"""
+    _channels.discard(channel_id)
+
+
+def _event_change(op: str, event: asyncpg.Record, **extra) -> Dict[str, Any]:
+    return {"op": op, "event": dict(event), **extra}
+
+
+# =========================================================
+# 活動生命週期排程
+# =========================================================
+
+
+def _schedule_event(event_uid: UUID, start_time: datetime, end_time: datetime, active: bool = True):
+    start = start_time.timestamp()
+    if active:
+        reminder_at = start - settings.EVENT_REMINDER_LEAD_MINUTES * 60
+        if time.time() < start:
+            _event_deadlines.schedule("remind", event_uid, reminder_at)
+        _event_deadlines.schedule("close", event_uid, start)
+    _event_deadlines.schedule("expire", event_uid, end_time.timestamp())
+
+
+def _track_deadlines(change: Dict[str, Any]):
+    """依活動變更維護排程（本 instance 的寫入與 NOTIFY 收到的變更都會走這裡）。"""
+    op = change["op"]
+    if op == "create":
+        event = change["event"]
+        _schedule_event(
+            as_uuid(event["uid"]),
+            as_datetime(event["start_time"]),
+            as_datetime(event["end_time"]),
+        )
+        return
+
+    event_uid = as_uuid(change["event_uid"])
+    if op == "remove":
+        for kind in ("remind", "close", "expire"):
+            _event_deadlines.cancel(kind, event_uid)
+    elif change.get("status") in ("closed", "cancelled"):
+        _event_deadlines.cancel("remind", event_uid)
+        _event_deadlines.cancel("close", event_uid)
+
+
+async def _load_event_deadlines():
+    async with acquire(MAINTENANCE_POOL) as conn:
+        rows = await conn.fetch(
+            """
+            SELECT uid, start_time, end_time, status, reminded
+            FROM events;
+            """
+        )
+    for row in rows:
+        active = row["status"] in ("open", "full")
+        _schedule_event(row["uid"], row["start_time"], row["end_time"], active=active)
+        if row["reminded"]:
+            _event_deadlines.cancel("remind", row["uid"])
+
+
+async def _on_event_deadline(kind: str, event_uid: UUID):
+    """
+    期限到時執行狀態轉換。
+    UPDATE / DELETE 都帶條件，多個 instance 同時觸發也只有一個會成功並發通知。
+    """
+    change = None
+    async with acquire(MAINTENANCE_POOL) as conn:
+        if kind == "remind":
+            start_time = await conn.fetchval(
+                """
+                UPDATE events
+                SET reminded = TRUE
+                WHERE uid = $1 AND NOT reminded AND status IN ('open', 'full')
+                RETURNING start_time;
+                """,
+                event_uid,
+            )
+            if start_time is not None:
+                publisher.publish_notice(
+                    event_uid,
+                    "event_reminder",
+                    f"活動將於 {settings.EVENT_REMINDER_LEAD_MINUTES} 分鐘後開始",
+                    start_time=start_time,
+                )
+            return
+
+        async with conn.transaction():
+            if kind == "close":
+                closed = await conn.fetchval(
+                    """
+                    UPDATE events
+                    SET status = 'closed'
+                    WHERE uid = $1 AND status IN ('open', 'full')
+                    RETURNING uid;
+                    """,
+                    event_uid,
+                )
+                if closed is not None:
+                    change = {"op": "status", "event_uid": event_uid, "status": "closed"}
+            elif kind == "expire":
+                result = await conn.execute(
+                    "DELETE FROM events WHERE uid = $1;",
+                    event_uid,
+                )
+                if result.startswith("DELETE 1"):
+                    change = {"op": "remove", "event_uid": event_uid}
+            if change is not None:
+                await _notify_change(conn, change)
+
+    _apply_change(change)
+
+
+async def run_event_scheduler():
+    """
+    由 main.lifespan 啟動：載入所有活動的期限後持續觸發。
+    期限載入完成才回報 "scheduler" ready，載入失敗時 instance 不會開始接流量。
+    """
+    await _load_event_deadlines()
+    readiness.mark_ready("scheduler")
+    await _event_deadlines.run(_on_event_deadline)
+
+
 # =========================================================
 # 查詢：球種 / 場館 / 合法組合
 # =========================================================
 
 
+def invalidate_reference_cache():
+    global _reference_generation
+    _reference_generation += 1
+    _reference_cache.clear()
+
+
+async def _load_reference(key: str, query: str) -> List[asyncpg.Record]:
+    """
+    讀取參考資料並快取結果列。
+    查詢途中若被 invalidate，結果不寫回快取，避免把舊資料留下來。
+    """
+    if key in _reference_cache:
+        return _reference_cache[key]
+    generation = _reference_generation
+    rows = await _fetch_reference(key, generation, query)
+    if generation == _reference_generation:
+        _reference_cache[key] = rows
+    return rows
+
+
+@single_flight()
+async def _fetch_reference(key: str, generation: int, query: str) -> List[asyncpg.Record]:
+    # 參考資料唯一的合併層（get_sports 等不再另外包 single_flight，避免同一個呼叫被算兩次）
+    # generation 也是 key 的一部分：失效之後進來的呼叫不會共用失效前開始的查詢
+    async with acquire() as conn:
+        return await conn.fetch(query)
+
+
 async def get_sports() -> List[str]:
     """
     取得目前有設定合法組合的球類列表。
     回傳範例: ["羽球", "籃球", "桌球", ...]
     """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT DISTINCT sport
-            FROM allowed_pairs
-            ORDER BY sport;
-            """
-        )
-        return [r["sport"] for r in rows]
+    rows = await _load_reference(
+        "sports",
+        """
+        SELECT DISTINCT sport
+        FROM allowed_pairs
+        ORDER BY sport;
+        """,
+    )
+    return [r["sport"] for r in rows]
 
 
 async def get_centers() -> List[Dict[str, Any]]:
@@ -276,16 +990,15 @@ async def get_centers() -> List[Dict[str, Any]]:
         ...
     ]
     """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT id, name, latitude, longitude
-            FROM centers
-            ORDER BY id;
-            """
-        )
-        return [dict(r) for r in rows]
+    rows = await _load_reference(
+        "centers",
+        """
+        SELECT id, name, latitude, longitude
+        FROM centers
+        ORDER BY id;
+        """,
+    )
+    return [dict(r) for r in rows]
 
 
 async def get_allowed_pairs_grouped() -> List[Dict[str, Any]]:
@@ -299,19 +1012,92 @@ async def get_allowed_pairs_grouped() -> List[Dict[str, Any]]:
         ...
     ]
     """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT ap.sport,
-                   array_agg(c.name ORDER BY c.name) AS centers
-            FROM allowed_pairs ap
-            JOIN centers c ON ap.center_id = c.id
-            GROUP BY ap.sport
-            ORDER BY ap.sport;
-            """
-        )
-        return [{"sport": r["sport"], "centers": list(r["centers"])} for r in rows]
+    rows = await _load_reference(
+        "allowed_pairs",
+        """
+        SELECT ap.sport,
+               array_agg(c.name ORDER BY c.name) AS centers
+        FROM allowed_pairs ap
+        JOIN centers c ON ap.center_id = c.id
+        GROUP BY ap.sport
+        ORDER BY ap.sport;
+        """,
+    )
+    return [{"sport": r["sport"], "centers": list(r["centers"])} for r in rows]
+
+
+# =========================================================
+# 匯入：場館與合法組合
+# =========================================================
+
+
+async def import_centers(centers: List[Tuple[str, float, float, List[str]]]) -> Dict[str, int]:
+    """
+    批次匯入場館與其可開團的球種，整批在同一個交易內完成：
+    - 以 copy_records_to_table 灌進暫存表
+    - 依名稱 upsert 到 centers（已存在者更新經緯度）
+    - 補上 allowed_pairs（只新增，不刪除既有組合）
+    centers: [(name, latitude, longitude, [sport, ...]), ...]
+    回傳: {"centers": 匯入場館數, "allowed_pairs": 新增組合數}
+    有不存在的球種則丟出 ValueError（整批不寫入）。
+    """
+    async with acquire(MAINTENANCE_POOL) as conn:
+        async with conn.transaction():
+            await conn.execute(
+                """
+                CREATE TEMP TABLE centers_staging (
+                    name      VARCHAR(50)      NOT NULL,
+                    latitude  DOUBLE PRECISION NOT NULL,
+                    longitude DOUBLE PRECISION NOT NULL,
+                    sports    TEXT[]           NOT NULL
+                ) ON COMMIT DROP;
+                """
+            )
+            await conn.copy_records_to_table(
+                "centers_staging",
+                records=centers,
+                columns=["name", "latitude", "longitude", "sports"],
+            )
+
+            unknown = await conn.fetchval(
+                """
+                SELECT array_agg(DISTINCT s.sport)
+                FROM centers_staging, unnest(sports) AS s(sport)
+                WHERE s.sport NOT IN (SELECT unnest(enum_range(NULL::sport_type))::text);
+                """
+            )
+            if unknown:
+                raise ValueError(f"未知的球種: {', '.join(unknown)}")
+
+            center_result = await conn.execute(
+                """
+                INSERT INTO centers (name, latitude, longitude)
+                SELECT DISTINCT ON (name) name, latitude, longitude
+                FROM centers_staging
+                ORDER BY name
+                ON CONFLICT (name) DO UPDATE
+                SET latitude = EXCLUDED.latitude,
+                    longitude = EXCLUDED.longitude;
+                """
+            )
+            pair_result = await conn.execute(
+                """
+                INSERT INTO allowed_pairs (sport, center_id)
+                SELECT DISTINCT s.sport::sport_type, c.id
+                FROM centers_staging cs
+                CROSS JOIN unnest(cs.sports) AS s(sport)
+                JOIN centers c ON c.name = cs.name
+                ON CONFLICT DO NOTHING;
+                """
+            )
+            await conn.execute("SELECT pg_notify($1, '');", REFERENCE_DATA_CHANNEL)
+
+    invalidate_reference_cache()
+    # asyncpg.execute 回傳 "INSERT 0 <筆數>"
+    return {
+        "centers": int(center_result.split()[-1]),
+        "allowed_pairs": int(pair_result.split()[-1]),
+    }
 
 
 # =========================================================
@@ -319,6 +1105,77 @@ async def get_allowed_pairs_grouped() -> List[Dict[str, Any]]:
 # =========================================================
 
 
+# 一次往返建立活動：events / participants / channels 寫入與 NOTIFY 在同一個 statement 裡，
+# 合法性交給資料表的 FK / CHECK / UNIQUE 判斷（外鍵檢查在 statement 結束時執行，看得到同一句 CTE 寫入的列）。
+# 未知使用者多一段 users upsert；已知的略過。
+_CREATE_EVENT_SQL = """
+WITH {ensure_user}ev AS (
+    INSERT INTO events (sport, center_id, start_time, end_time, capacity, organizer_uid)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    RETURNING uid, sport, center_id,
+              (SELECT name FROM centers WHERE id = center_id) AS center_name,
+              start_time, end_time, capacity, status, organizer_uid
+),
+joined AS (
+    INSERT INTO participants (event_uid, user_uid)
+    SELECT uid, organizer_uid FROM ev
+),
+channel AS (
+    INSERT INTO channels (channel_id, channel_name, is_active)
+    SELECT uid, uid::text, TRUE FROM ev
+)
+SELECT ev.*,
+       pg_notify($7, json_build_object(
+           'op', 'create',
+           'event', row_to_json(ev),
+           'participants', json_build_array(ev.organizer_uid),
+           'origin', $8::text
+       )::text) AS notified
+FROM ev;
+"""
+_CREATE_EVENT = _CREATE_EVENT_SQL.format(ensure_user="")
+_CREATE_EVENT_WITH_USER = _CREATE_EVENT_SQL.format(
+    ensure_user="""new_user AS (
+    INSERT INTO users (uid) VALUES ($6) ON CONFLICT DO NOTHING
+),
+""")
+
+# 違反的 constraint -> 與原本 API 逐項檢查時相同的 400 訊息（memory_storage 共用）
+CREATE_EVENT_ERRORS = {
+    "sport_type": "Invalid sport type",
+    "fk_events_center": "Invalid place ID",
+    "fk_events_allowed_pair": "非法的球種與場館組合",
+    "events_capacity_check": "Capacity must be between 2 and 100",
+    "uq_event_unique_slot": "Event already exists for this time slot",
+    "event_time": "Invalid start or end time",
+}
+
+# asyncpg 在送出前編碼參數失敗時，訊息為 "invalid input for query argument $N: ..."；
+# 依 _CREATE_EVENT 的參數位置對應到欄位
+_QUERY_ARGUMENT = re.compile(r"query argument \$(\d+)")
+_CREATE_EVENT_ARGUMENT_ERRORS = {
+    1: "sport_type",
+    2: "fk_events_center",
+    3: "event_time",
+    4: "event_time",
+    5: "events_capacity_check",
+}
+
+
+def _create_event_data_error(e: asyncpg.DataError) -> Optional[str]:
+    """把 DataError 對應到實際出錯的欄位；對應不到回傳 None。"""
+    if isinstance(e, asyncpg.NumericValueOutOfRangeError):
+        return CREATE_EVENT_ERRORS["events_capacity_check"]
+    if isinstance(e, (asyncpg.DatetimeFieldOverflowError, asyncpg.InvalidDatetimeFormatError)):
+        return CREATE_EVENT_ERRORS["event_time"]
+    match = _QUERY_ARGUMENT.search(str(e))
+    if match is not None:
+        key = _CREATE_EVENT_ARGUMENT_ERRORS.get(int(match.group(1)))
+        if key is not None:
+            return CREATE_EVENT_ERRORS[key]
+    return None
+
+
 async def create_event(
     user_uid: str,
     sport: str,
@@ -328,65 +1185,48 @@ async def create_event(
     capacity: int,
 ) -> Dict[str, Any]:
     """
-    建立揪團活動：
-    - 檢查 (sport, center_id) 是否在 allowed_pairs
+    建立揪團活動（單一 statement、一次往返）：
+    - (sport, center_id) 是否在 allowed_pairs 由外鍵檢查
     - 自動建立 user（如果不存在）
-    - 自動讓發起人加入 participants
+    - 自動讓發起人加入 participants、建立聊天頻道
 
     回傳: 新建立活動的資料(dict)
     不合法則丟出 ValueError（給上層 API 轉成 4xx）
     """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            allowed = await conn.fetchrow(
-                """
-                SELECT 1 FROM allowed_pairs
-                WHERE sport = $1 AND center_id = $2;
-                """,
-                sport,
-                center_id,
-            )
-            if not allowed:
-                raise ValueError("非法的球種與場館組合")
-
-            await _ensure_user(conn, user_uid)
-
-            event = await conn.fetchrow(
-                """
-                INSERT INTO events (sport, center_id, start_time, end_time, capacity, organizer_uid)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                RETURNING uid, sport, center_id, start_time, end_time,
-                          capacity, status, organizer_uid, created_at;
-                """,
+    known = as_uuid(user_uid) in _known_users
+    try:
+        async with acquire() as conn:
+            row = await conn.fetchrow(
+                _CREATE_EVENT if known else _CREATE_EVENT_WITH_USER,
                 sport,
                 center_id,
                 start_time,
                 end_time,
                 capacity,
                 user_uid,
+                ACTIVE_EVENTS_CHANNEL,
+                _INSTANCE_ID,
             )
-
-            await conn.execute(
-                """
-                INSERT INTO participants (event_uid, user_uid)
-                VALUES ($1, $2)
-                ON CONFLICT DO NOTHING;
-                """,
-                event["uid"],
-                user_uid,
-            )
-            await conn.execute(
-                """
-                INSERT INTO channels (channel_id, channel_name, is_active)
-                VALUES ($1, $2, TRUE)
-                ON CONFLICT DO NOTHING;
-                """,
-                event["uid"],
-                user_uid,
-            )
-
-            return {"uid": str(event["uid"])}
+    except asyncpg.InvalidTextRepresentationError as e:
+        # sport 不是 sport_type enum 的值
+        raise ValueError(CREATE_EVENT_ERRORS["sport_type"]) from e
+    except asyncpg.IntegrityConstraintViolationError as e:
+        message = CREATE_EVENT_ERRORS.get(e.constraint_name)
+        if message is None:
+            raise
+        raise ValueError(message) from e
+    except asyncpg.DataError as e:
+        # 參數編碼失敗（asyncpg 送出前丟出）或資料庫端的數值 / 時間超出範圍
+        message = _create_event_data_error(e)
+        if message is None:
+            raise
+        raise ValueError(message) from e
+
+    if not known:
+        _known_users.add_many([as_uuid(user_uid)])
+    event = {key: value for key, value in row.items() if key != "notified"}
+    _apply_change(_event_change("create", event, participants=[user_uid]))
+    return {"uid": str(event["uid"])}
 
 
 # =========================================================
@@ -404,11 +1244,10 @@ async def join_event(user_uid: str, event_uid: str) -> Dict[str, Any]:
         "status": "joined" / "already_joined" / "full" / "closed" / "not_found"
     }
     """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    change = None
+    await _ensure_users([user_uid])
+    async with acquire() as conn:
         async with conn.transaction():
-            await _ensure_user(conn, user_uid)
-
             event = await conn.fetchrow(
                 """
                 SELECT uid, capacity, status
@@ -459,42 +1298,66 @@ async def join_event(user_uid: str, event_uid: str) -> Dict[str, Any]:
                         "UPDATE events SET status = 'full' WHERE uid = $1;",
                         event_uid,
                     )
-                return {
+                    change = {"op": "status", "event_uid": event_uid, "status": "full"}
+                    await _notify_change(conn, change)
+                result = {
                     "event_uid": event_uid,
                     "user_uid": user_uid,
                     "status": "full",
                 }
-
-            await conn.execute(
-                """
-                INSERT INTO participants (event_uid, user_uid)
-                VALUES ($1, $2)
-                ON CONFLICT DO NOTHING;
-                """,
-                event_uid,
-                user_uid,
-            )
-
-            new_cnt_row = await conn.fetchrow(
-                """
-                SELECT COUNT(*)::int AS cnt
-                FROM participants
-                WHERE event_uid = $1;
-                """,
-                event_uid,
-            )
-            new_cnt = new_cnt_row["cnt"]
-            if new_cnt >= event["capacity"]:
+            else:
                 await conn.execute(
-                    "UPDATE events SET status = 'full' WHERE uid = $1;",
+                    """
+                    INSERT INTO participants (event_uid, user_uid)
+                    VALUES ($1, $2)
+                    ON CONFLICT DO NOTHING;
+                    """,
                     event_uid,
+                    user_uid,
+                )
+                # 有在候補名單的話，直接報名成功就不用再候補
+                await conn.execute(
+                    "DELETE FROM waitlist WHERE event_uid = $1 AND user_uid = $2;",
+                    event_uid,
+                    user_uid,
                 )
 
-            return {
-                "event_uid": event_uid,
-                "user_uid": user_uid,
-                "status": "joined",
-            }
+                new_cnt_row = await conn.fetchrow(
+                    """
+                    SELECT COUNT(*)::int AS cnt
+                    FROM participants
+                    WHERE event_uid = $1;
+                    """,
+                    event_uid,
+                )
+                new_cnt = new_cnt_row["cnt"]
+                new_status = event["status"]
+                if new_cnt >= event["capacity"]:
+                    await conn.execute(
+                        "UPDATE events SET status = 'full' WHERE uid = $1;",
+                        event_uid,
+                    )
+                    new_status = "full"
+
+                change = {
+                    "op": "join",
+                    "event_uid": event_uid,
+                    "user_uid": user_uid,
+                    "status": new_status,
+                }
+                await _notify_change(conn, change)
+                result = {
+                    "event_uid": event_uid,
+                    "user_uid": user_uid,
+                    "status": "joined",
+                }
+
+    _apply_change(change)
+    if result["status"] == "joined":
+        publisher.publish_notice(event_uid, "user_joined", "有新成員加入活動", user_id=user_uid)
+        if change["status"] == "full":
+            publisher.publish_notice(event_uid, "event_full", "活動已額滿")
+    return result
 
 
 # =========================================================
@@ -502,93 +1365,71 @@ async def join_event(user_uid: str, event_uid: str) -> Dict[str, Any]:
 # =========================================================
 
 
-async def cancel_event(event_uid: str):
-
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+async def cancel_event(event_uid: str, organizer_uid: Optional[str] = None) -> bool:
+    """
+    取消活動（直接刪除，participants / channels / messages 由外鍵串聯刪除）。
+    - 有給 organizer_uid 時，只有發起人本人可以取消。
+    回傳是否真的刪除了活動。
+    """
+    change = None
+    async with acquire() as conn:
         async with conn.transaction():
             result = await conn.execute(
                 """
                 DELETE FROM events
-                WHERE uid = $1;
+                WHERE uid = $1
+                  AND ($2::uuid IS NULL OR organizer_uid = $2);
                 """,
                 event_uid,
+                organizer_uid,
             )
             # asyncpg.execute 會回傳類似 "DELETE 1" 或 "DELETE 0"
             deleted = result.startswith("DELETE 1")
-            
+            if deleted:
+                change = {"op": "remove", "event_uid": event_uid}
+                await _notify_change(conn, change)
+
+    _apply_change(change)
+    if deleted:
+        publisher.publish_notice(event_uid, "event_cancelled", "活動已被發起人取消")
+    return deleted
+
 async def get_user_active_events(user_uid: str) -> List[Dict[str, Any]]:
     """
     取得某個使用者「正在進行」的活動列表。
     規則：
     - 有出現在 participants
     - 活動狀態不是 cancelled / closed
-    - end_time 未過期（過期的已在這裡被刪除）
-    """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        await _cleanup_expired_events(conn)
+    - end_time 未過期（過期的只從記憶體快照修剪；資料庫裡的由 run_event_scheduler 刪除）
 
-        rows = await conn.fetch(
-            """
-            SELECT
-                e.uid,
-                e.sport,
-                e.center_id,
-                c.name AS center_name,
-                e.start_time,
-                e.end_time,
-                e.capacity,
-                e.status,
-                e.organizer_uid
-            FROM events e
-            JOIN participants p
-                ON p.event_uid = e.uid
-            LEFT JOIN centers c
-                ON c.id = e.center_id
-            WHERE
-                p.user_uid = $1
-                AND e.status NOT IN ('cancelled', 'closed')
-            ORDER BY e.start_time;
-            """,
-            user_uid,
-        )
-        return [dict(r) for r in rows]
-
-
-async def get_all_active_events() -> List[Dict[str, Any]]:
+    直接從記憶體快照讀取，不走資料庫。
     """
-    取得所有「正在進行」的活動列表。
+    store = await load_active_events()
+    # 只修剪記憶體快照；資料庫裡的過期活動由 run_event_scheduler 的 "expire" 刪除，
+    # 讀取路徑不借 MAINTENANCE_POOL（匯出會長時間佔住那裡的連線）
+    store.prune_expired()
+    return store.for_user(user_uid)
+
+
+async def get_all_active_events(
+    sport: Optional[str] = None,
+    center_name: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    取得所有「正在進行」的活動列表，依 start_time 排序。
     規則：
     - 狀態不是 cancelled / closed
-    - end_time 未過期（過期的已在這裡被刪除）
-    """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        # 先清掉已過期活動
-        await _cleanup_expired_events(conn)
+    - end_time 未過期（過期的只從記憶體快照修剪；資料庫裡的由 run_event_scheduler 刪除）
+    - 可選擇依球種、場館名稱、最早開始時間過濾
 
-        rows = await conn.fetch(
-            """
-            SELECT
-                e.uid,
-                e.sport,
-                e.center_id,
-                c.name AS center_name,
-                e.start_time,
-                e.end_time,
-                e.capacity,
-                e.status,
-                e.organizer_uid
-            FROM events e
-            LEFT JOIN centers c
-                ON c.id = e.center_id
-            WHERE
-                e.status NOT IN ('cancelled', 'closed')
-            ORDER BY e.start_time;
-            """
-        )
-        return [dict(r) for r in rows]
+    直接從記憶體快照讀取，不走資料庫。
+    """
+    store = await load_active_events()
+    # 只修剪記憶體快照；資料庫裡的過期活動由 run_event_scheduler 的 "expire" 刪除，
+    # 讀取路徑不借 MAINTENANCE_POOL（匯出會長時間佔住那裡的連線）
+    store.prune_expired()
+    return store.query(sport=sport, center_name=center_name, start_time=start_time)
 
 
 async def _cleanup_expired_events(conn: asyncpg.Connection):
@@ -608,35 +1449,535 @@ async def leave_event(user_uid: str, event_uid: str) -> bool:
     """
     使用者退出活動。
     - 如果使用者有參加 -> 刪除 participants 紀錄。
-    - 若活動原本為 full 且退出後未滿，改回 open。
+    - 候補名單有人時，同一個交易內讓排最前面的人遞補（SKIP LOCKED 佇列），並發 MQTT 通知。
+    - 沒人遞補且活動原本為 full，改回 open。
     - 若使用者沒參加，回傳 False。
     """
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    changes: List[Dict[str, Any]] = []
+    promoted_uid = None
+    async with acquire() as conn:
         async with conn.transaction():
-            # 檢查是否參加
-            exists = await conn.fetchval(
-                "SELECT 1 FROM participants WHERE user_uid = $1 AND event_uid = $2;",
-                user_uid,
+            # 鎖住活動，與 join_event / join_waitlist 互斥，名額計算才一致
+            event = await conn.fetchrow(
+                "SELECT uid, status FROM events WHERE uid = $1 FOR UPDATE;",
                 event_uid,
             )
-            if not exists:
+            if event is None:
                 return False
 
-            # 刪除參加者
-            await conn.execute(
+            # 刪除參加者（順便確認是否有參加）
+            deleted = await conn.execute(
                 "DELETE FROM participants WHERE user_uid = $1 AND event_uid = $2;",
                 user_uid,
                 event_uid,
             )
-            # 若原本為 full，改回 open
-            await conn.execute(
+            if deleted == "DELETE 0":
+                return False
+            changes.append({
+                "op": "leave",
+                "event_uid": event_uid,
+                "user_uid": user_uid,
+                "status": None,
+            })
+
+            if event["status"] in ("open", "full"):
+                promoted_uid = await _promote_from_waitlist(conn, event_uid)
+
+            if promoted_uid is not None:
+                changes.append({
+                    "op": "join",
+                    "event_uid": event_uid,
+                    "user_uid": promoted_uid,
+                    "status": None,
+                })
+            else:
+                # 若原本為 full，改回 open
+                new_status = await conn.fetchval(
+                    """
+                    UPDATE events
+                    SET status = 'open'
+                    WHERE uid = $1 AND status = 'full'
+                    RETURNING status;
+                    """,
+                    event_uid,
+                )
+                changes[0]["status"] = new_status
+
+            for change in changes:
+                await _notify_change(conn, change)
+
+    for change in changes:
+        _apply_change(change)
+    if promoted_uid is not None:
+        publisher.publish_notice(
+            event_uid,
+            "waitlist_promoted",
+            "候補成功，已為你保留名額",
+            user_id=promoted_uid,
+        )
+    return True
+
+
+# =========================================================
+# 候補名單
+# =========================================================
+
+
+async def _promote_from_waitlist(conn: asyncpg.Connection, event_uid: str) -> Optional[UUID]:
+    """
+    取出候補名單最前面的人並加入 participants（呼叫端需已鎖住活動列）。
+    SKIP LOCKED：正在被取消候補的列直接跳過，不會互相卡住。
+    回傳遞補者 uid，沒人候補則回傳 None。
+    """
+    promoted_uid = await conn.fetchval(
+        """
+        DELETE FROM waitlist
+        WHERE (event_uid, user_uid) = (
+            SELECT event_uid, user_uid
+            FROM waitlist
+            WHERE event_uid = $1
+            ORDER BY created_at
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING user_uid;
+        """,
+        event_uid,
+    )
+    if promoted_uid is not None:
+        await conn.execute(
+            """
+            INSERT INTO participants (event_uid, user_uid)
+            VALUES ($1, $2)
+            ON CONFLICT DO NOTHING;
+            """,
+            event_uid,
+            promoted_uid,
+        )
+    return promoted_uid
+
+
+async def join_waitlist(user_uid: str, event_uid: str) -> Dict[str, Any]:
+    """
+    活動額滿時排入候補名單。
+    回傳:
+    {
+        "event_uid": str,
+        "user_uid": str,
+        "status": "waiting" / "already_waiting" / "already_joined" / "not_full" / "closed" / "not_found",
+        "position": int | None   # 在候補名單中的順位（1 起算）
+    }
+    """
+    result = {"event_uid": event_uid, "user_uid": user_uid, "position": None}
+    await _ensure_users([user_uid])
+    async with acquire() as conn:
+        async with conn.transaction():
+            # FOR SHARE：等正在進行的 leave_event 做完遞補再判斷是否額滿
+            event = await conn.fetchrow(
+                "SELECT uid, status FROM events WHERE uid = $1 FOR SHARE;",
+                event_uid,
+            )
+            if event is None:
+                return {**result, "status": "not_found"}
+            if event["status"] not in ("open", "full"):
+                return {**result, "status": "closed"}
+
+            joined = await conn.fetchval(
+                "SELECT 1 FROM participants WHERE event_uid = $1 AND user_uid = $2;",
+                event_uid,
+                user_uid,
+            )
+            if joined:
+                return {**result, "status": "already_joined"}
+            if event["status"] != "full":
+                return {**result, "status": "not_full"}
+
+            inserted = await conn.fetchval(
                 """
-                UPDATE events
-                SET status = 'open'
-                WHERE uid = $1 AND status = 'full';
+                INSERT INTO waitlist (event_uid, user_uid)
+                VALUES ($1, $2)
+                ON CONFLICT DO NOTHING
+                RETURNING 1;
                 """,
                 event_uid,
+                user_uid,
+            )
+            position = await conn.fetchval(
+                """
+                SELECT COUNT(*)::int
+                FROM waitlist w
+                WHERE w.event_uid = $1
+                  AND w.created_at <= (
+                      SELECT created_at FROM waitlist
+                      WHERE event_uid = $1 AND user_uid = $2
+                  );
+                """,
+                event_uid,
+                user_uid,
+            )
+            return {
+                **result,
+                "status": "waiting" if inserted else "already_waiting",
+                "position": position,
+            }
+
+
+async def leave_waitlist(user_uid: str, event_uid: str) -> bool:
+    """取消候補；本來就不在候補名單則回傳 False。"""
+    async with acquire() as conn:
+        result = await conn.execute(
+            "DELETE FROM waitlist WHERE event_uid = $1 AND user_uid = $2;",
+            event_uid,
+            user_uid,
+        )
+        return result != "DELETE 0"
+
+
+# =========================================================
+# 統計：場館 x 球種 x 小時的使用率（讀 event_occupancy 彙總表）
+# =========================================================
+
+@single_flight(ttl=settings.STATS_CACHE_TTL)
+async def get_occupancy(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    center_id: Optional[str] = None,
+    sport: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    回傳 [start, end) 內每個 (場館, 球種, 開始小時) 的活動數 / 名額 / 參加人數。
+    start / end 以活動開始時間所在的小時比較。
+    """
+    async with acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT
+                o.center_id,
+                c.name AS center_name,
+                o.sport,
+                o.hour_start,
+                o.events,
+                o.open_events,
+                o.full_events,
+                o.capacity,
+                o.participants
+            FROM event_occupancy o
+            JOIN centers c ON c.id = o.center_id
+            WHERE
+                o.events > 0
+                AND ($1::timestamptz IS NULL OR o.hour_start >= date_trunc('hour', $1::timestamptz AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')
+                AND ($2::timestamptz IS NULL OR o.hour_start < $2)
+                AND ($3::uuid IS NULL OR o.center_id = $3)
+                AND ($4::sport_type IS NULL OR o.sport = $4)
+            ORDER BY o.hour_start, c.name, o.sport;
+            """,
+            start,
+            end,
+            center_id,
+            sport,
+        )
+        return [dict(row) for row in rows]
+
+
+# =========================================================
+# 匯出：COPY ... TO STDOUT 串流
+# =========================================================
+
+# 三種資料集都 JOIN events，才能用場館 / 球種過濾；
+# $1 / $2 為時間區間（events 看 start_time，messages 看 timestamp），$3 場館、$4 球種
+_EXPORT_FILTER = """
+    ($1::timestamptz IS NULL OR {time_col} >= $1)
+    AND ($2::timestamptz IS NULL OR {time_col} < $2)
+    AND ($3::uuid IS NULL OR e.center_id = $3)
+    AND ($4::sport_type IS NULL OR e.sport = $4)
+"""
+
+EXPORT_QUERIES = {
+    "events": """
+        SELECT
+            e.uid, e.sport, e.center_id, c.name AS center_name,
+            e.start_time, e.end_time, e.capacity, e.status,
+            e.organizer_uid, e.created_at
+        FROM events e
+        LEFT JOIN centers c ON c.id = e.center_id
+        WHERE {filter}
+        """.format(filter=_EXPORT_FILTER.format(time_col="e.start_time")),
+    "participants": """
+        SELECT
+            p.event_uid, p.user_uid, e.sport, e.center_id, e.start_time
+        FROM participants p
+        JOIN events e ON e.uid = p.event_uid
+        WHERE {filter}
+        """.format(filter=_EXPORT_FILTER.format(time_col="e.start_time")),
+    "messages": """
+        SELECT
+            m.channel_id, m.uid, m.payload, m.timestamp
+        FROM messages m
+        JOIN events e ON e.uid = m.channel_id
+        WHERE {filter}
+        """.format(filter=_EXPORT_FILTER.format(time_col="m.timestamp")),
+}
+
+
+async def stream_export(
+    dataset: str,
+    fmt: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    center_id: Optional[str] = None,
+    sport: Optional[str] = None,
+) -> AsyncIterator[bytes]:
+    """
+    以 COPY ... TO STDOUT 匯出資料集，逐 chunk 產出 bytes。
+    - fmt = "csv"：含標頭的 CSV
+    - fmt = "ndjson"：每列一個 JSON 物件（row_to_json）
+    COPY 與下游之間只隔一個有上限的 queue，記憶體用量固定。
+    """
+    query = EXPORT_QUERIES[dataset]
+    if fmt == "ndjson":
+        # row_to_json 會把控制字元跳脫，用不會出現的控制字元當分隔 / 引號，輸出即為原始 JSON
+        query = f"SELECT row_to_json(t) FROM ({query}) t"
+        options = {"format": "csv", "delimiter": "\x1f", "quote": "\x1e"}
+    else:
+        options = {"format": "csv", "header": True}
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EXPORT_QUEUE_CHUNKS)
+    done = object()
+
+    async def produce():
+        try:
+            async with acquire(MAINTENANCE_POOL) as conn:
+                await conn.copy_from_query(
+                    query, start, end, center_id, sport, output=queue.put, **options
+                )
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(done)
+
+    task = asyncio.create_task(produce())
+    try:
+        while (chunk := await queue.get()) is not done:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        # 下游提早斷線時，一併中止 COPY 並歸還連線
+        task.cancel()
+
+
+# =========================================================
+# 聊天訊息
+# =========================================================
+
+
+async def has_channel(channel_id: Any) -> bool:
+    """頻道是否存在（讀記憶體中的頻道集合）。"""
+    return as_uuid(channel_id) in await load_channels()
+
+
+async def insert_message(channel_id: UUID, user_id: UUID, payload: Any) -> datetime:
+    """寫入一則訊息，回傳資料庫給的 timestamp；頻道已不存在則丟出 UnknownChannelError。"""
+    async with acquire(INGEST_POOL) as conn:
+        try:
+            return await conn.fetchval(
+                """
+                INSERT INTO messages (channel_id, uid, payload)
+                VALUES ($1, $2, $3)
+                RETURNING timestamp;
+                """,
+                channel_id,
+                user_id,
+                json.dumps(payload),
             )
+        except asyncpg.ForeignKeyViolationError as e:
+            # 頻道在集合裡但資料庫已刪除（過期活動批次清除），之後的訊息直接在入口丟棄
+            forget_channel(channel_id)
+            raise UnknownChannelError(channel_id) from e
+
+
+async def get_recent_messages(channel_id: Any, limit: int) -> List[asyncpg.Record]:
+    """頻道最後 limit 則訊息 (uid, payload, timestamp)，舊到新。"""
+    async with acquire() as conn:
+        records = await conn.fetch(
+            """
+            SELECT uid, payload, timestamp
+            FROM messages
+            WHERE channel_id = $1
+            ORDER BY timestamp DESC
+            LIMIT $2
+            """,
+            channel_id,
+            limit,
+        )
+    return records[::-1]
+
+
+async def get_channel_messages(channel_id: Any) -> List[asyncpg.Record]:
+    """頻道所有訊息 (uid, payload, timestamp)，舊到新。"""
+    async with acquire() as conn:
+        return await conn.fetch(
+            """
+            SELECT uid, payload, timestamp
+            FROM messages
+            WHERE channel_id = $1
+            ORDER BY timestamp ASC
+            """,
+            channel_id,
+        )
+
 
-            return True
+def _has_cjk(text: str) -> bool:
+    return any(
+        "\u3040" <= ch <= "\u30ff"      # 日文假名
+        or "\u3400" <= ch <= "\u9fff"   # CJK 統一表意文字（含擴充 A）
+        or "\uac00" <= ch <= "\ud7af"   # 韓文
+        or "\uf900" <= ch <= "\ufaff"   # CJK 相容表意文字
+        for ch in text
+    )
+
+
+# pg_trgm 以三個字元為單位建索引；比這短的 ILIKE 用不到 GIN 索引，只能逐列比對
+TRGM_MIN_CHARS = 3
+SHORT_CJK_QUERY_ERROR = f"中日韓文字搜尋少於 {TRGM_MIN_CHARS} 個字時必須指定 channel_id"
+
+
+def check_search_query(query: str, channel_id: Optional[Any]):
+    """
+    短的中日韓查詢只允許在單一頻道內搜（以 idx_messages_channel_ts 限定範圍），
+    否則會整張 messages 表逐列 ILIKE。不符合時拋 ValueError。
+    """
+    if channel_id is None and _has_cjk(query) and len(query) < TRGM_MIN_CHARS:
+        raise ValueError(SHORT_CJK_QUERY_ERROR)
+
+
+async def find_messages(
+    query: str,
+    channel_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[asyncpg.Record]:
+    """
+    依相關度搜尋訊息，回傳 (channel_id, uid, payload, timestamp, rank)。
+    - 含中日韓文字：走 pg_trgm 三連字索引（ILIKE + similarity 排序）
+      少於 TRGM_MIN_CHARS 個字時索引派不上用場，必須指定 channel_id，改為掃該頻道的訊息
+    - 其他：走 search_tsv 全文索引（ts_rank 排序）
+    """
+    check_search_query(query, channel_id)
+    if _has_cjk(query) and len(query) < TRGM_MIN_CHARS:
+        # 明寫 channel_id = $2（不用 $2 IS NULL OR ...），generic plan 也會走頻道索引
+        sql = r"""
+            SELECT channel_id, uid, payload, timestamp,
+                   similarity(payload #>> '{}', $1) AS rank
+            FROM messages
+            WHERE channel_id = $2
+              AND (payload #>> '{}') ILIKE
+                    '%' || replace(replace(replace($1, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+              AND ($3::uuid IS NULL OR uid = $3)
+            ORDER BY rank DESC, timestamp DESC
+            LIMIT $4 OFFSET $5
+        """
+    elif _has_cjk(query):
+        # ILIKE 的萬用字元先跳脫，避免使用者輸入被當成 pattern
+        sql = r"""
+            SELECT channel_id, uid, payload, timestamp,
+                   similarity(payload #>> '{}', $1) AS rank
+            FROM messages
+            WHERE (payload #>> '{}') ILIKE
+                    '%' || replace(replace(replace($1, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+              AND ($2::uuid IS NULL OR channel_id = $2)
+              AND ($3::uuid IS NULL OR uid = $3)
+            ORDER BY rank DESC, timestamp DESC
+            LIMIT $4 OFFSET $5
+        """
+    else:
+        sql = """
+            SELECT channel_id, uid, payload, timestamp,
+                   ts_rank(search_tsv, q) AS rank
+            FROM messages, plainto_tsquery('simple', $1) AS q
+            WHERE search_tsv @@ q
+              AND ($2::uuid IS NULL OR channel_id = $2)
+              AND ($3::uuid IS NULL OR uid = $3)
+            ORDER BY rank DESC, timestamp DESC
+            LIMIT $4 OFFSET $5
+        """
+
+    async with acquire() as conn:
+        return await conn.fetch(sql, query, channel_id, user_id, limit, offset)
+
+
+# =========================================================
+# 已讀位置 / 未讀數
+# =========================================================
+
+
+async def mark_read(user_uid: Any, channel_id: Any, read_at: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    把使用者在頻道的已讀位置往前推（不會倒退）。
+    read_at 未指定時推到頻道最新一則訊息；晚於現在的時間以現在計。
+    回傳更新後的已讀時間；頻道不存在回傳 None。
+    """
+    await _ensure_users([user_uid])
+    async with acquire() as conn:
+        try:
+            return await conn.fetchval(
+                """
+                INSERT INTO read_cursors (user_uid, channel_id, last_read_at)
+                VALUES (
+                    $1, $2,
+                    -- 不接受未來時間：已讀位置只進不退，推到未來之後的未讀就永遠看不到了
+                    LEAST(
+                        COALESCE(
+                            $3,
+                            (SELECT max(timestamp) FROM messages WHERE channel_id = $2),
+                            NOW()
+                        ),
+                        NOW()
+                    )
+                )
+                ON CONFLICT (user_uid, channel_id) DO UPDATE
+                SET last_read_at = GREATEST(read_cursors.last_read_at, EXCLUDED.last_read_at)
+                RETURNING last_read_at;
+                """,
+                user_uid,
+                channel_id,
+                read_at,
+            )
+        except asyncpg.ForeignKeyViolationError:
+            return None
+
+
+async def get_unread_counts(user_uid: Any, cap: int) -> List[Dict[str, Any]]:
+    """
+    使用者參加的每個頻道的未讀數（別人在已讀位置之後發的訊息）。
+    每個頻道在 (channel_id, timestamp) 索引上最多數到 cap 則就停，
+    訊息再多，一次刷新也只讀 頻道數 x cap 列。
+    """
+    async with acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT
+                p.event_uid AS channel_id,
+                rc.last_read_at,
+                (
+                    SELECT count(*)
+                    FROM (
+                        SELECT 1
+                        FROM messages m
+                        WHERE m.channel_id = p.event_uid
+                          AND m.timestamp > COALESCE(rc.last_read_at, '-infinity')
+                          AND m.uid <> p.user_uid
+                        LIMIT $2
+                    ) capped
+                )::int AS unread
+            FROM participants p
+            LEFT JOIN read_cursors rc
+                ON rc.user_uid = p.user_uid AND rc.channel_id = p.event_uid
+            WHERE p.user_uid = $1
+            ORDER BY p.event_uid;
+            """,
+            user_uid,
+            cap,
+        )
+    return [dict(row) for row in rows]
@@ -0,0 +1,82 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+# =========================================================
+# 以 min-heap 排程的期限觸發器
+# =========================================================
+#
+# 每個 (kind, key) 最多一個有效期限；重新排程或取消只更新 _live，
+# heap 裡過期的舊項目在彈出時才略過（lazy deletion），
+# 所以排程 / 取消 / 觸發都是 O(log n)，不需要定期掃整張表。
+
+Handler = Callable[[str, Any], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    def __init__(self, retry_delay: float = 30.0):
+        self._heap: List[Tuple[float, int, str, Any]] = []
+        self._live: Dict[Tuple[str, Any], int] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._retry_delay = retry_delay
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def schedule(self, kind: str, key: Any, when: float):
+        """在 when（epoch 秒）觸發 (kind, key)；已有排程則覆蓋。"""
+        seq = next(self._seq)
+        self._live[(kind, key)] = seq
+        heapq.heappush(self._heap, (when, seq, kind, key))
+        if self._heap[0][1] == seq:
+            # 新的期限比目前等待中的更早，叫醒 run() 重新計算
+            self._wakeup.set()
+
+    def cancel(self, kind: str, key: Any):
+        self._live.pop((kind, key), None)
+
+    def clear(self):
+        self._heap.clear()
+        self._live.clear()
+        self._wakeup.set()
+
+    def _pop_due(self, now: float) -> List[Tuple[str, Any]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, kind, key = heapq.heappop(self._heap)
+            if self._live.get((kind, key)) == seq:
+                del self._live[(kind, key)]
+                due.append((kind, key))
+        return due
+
+    async def run(self, handler: Handler):
+        """依序觸發到期項目；handler 失敗的項目 retry_delay 秒後重試。"""
+        while True:
+            self._wakeup.clear()
+            for kind, key in self._pop_due(time.time()):
+                try:
+                    await handler(kind, key)
+                except Exception:
+                    logger.exception(
+                        "排程執行失敗，稍後重試",
+                        extra={"kind": kind, "key": key, "retry_in": self._retry_delay},
+                    )
+                    self.schedule(kind, key, time.time() + self._retry_delay)
+
+            # 丟掉堆頂已失效的項目，避免為它們空等
+            while self._heap and self._live.get((self._heap[0][2], self._heap[0][3])) != self._heap[0][1]:
+                heapq.heappop(self._heap)
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is not None and timeout <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,313 @@
+"""
+產生壓測用的大量假資料（centers / allowed_pairs / users / events / participants /
+channels / messages / waitlist），符合 schema 的所有外鍵與 CHECK。
+
+- --scale 1 約為 1 萬場館、100 萬使用者、100 萬活動、1000 萬參加紀錄、5000 萬訊息
+- 同一個 --seed（加上 --now）產生的資料完全相同（與 worker 數無關）：
+  每個 chunk 用 (seed, chunk) 建自己的亂數，UUID 由 (seed, 種類, 序號) 直接算出
+- 活動依 chunk 平行產生，每個 worker 用自己的連線以 COPY 寫入
+- 預設暫停 event_occupancy 的 trigger，寫完後整張重算（避免逐列更新與 worker 之間搶同一列）
+- 已結束的活動標為 closed；服務啟動後排程器會照常刪除它們，要保留歷史資料請在服務停止時使用
+
+用法（在 src/ 底下）：
+    python -m db.gen_data --scale 0.1 --seed 42 --workers 8
+    python -m db.gen_data --scale 1 --reset        # 先清空既有資料
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import asyncpg
+
+from core.config import settings
+from db import db_utils
+
+# --scale 1 時各表的目標筆數
+BASE_CENTERS = 10_000
+BASE_USERS = 1_000_000
+BASE_EVENTS = 1_000_000
+MESSAGES_PER_EVENT = 50
+
+EVENTS_PER_CHUNK = 5_000
+
+# UUID 序號用的種類代碼（寫進 UUID 的 bit 48-61，見 make_uuid）
+KIND_CENTER = 1
+KIND_USER = 2
+KIND_EVENT = 3
+
+# 名額平均約 12、報名率平均 75%，每場約 9-10 人
+CAPACITIES = (6, 8, 10, 12, 12, 14, 16, 20)
+WORDS = (
+    "好", "我", "到了", "幾點", "場地", "等我", "+1", "謝謝", "下次見", "球拍",
+    "hi", "ok", "see", "you", "late", "court", "parking", "thanks", "again", "now",
+)
+
+# 營業時間內的開始小時（台北時間）
+OPEN_HOURS = range(7, 22)
+LOCAL_TZ = timezone(timedelta(hours=8))
+
+
+def make_uuid(seed_bits: int, kind: int, index: int) -> uuid.UUID:
+    """由 (seed, kind, index) 直接算出 UUID，不同 worker 不需要共享對照表。"""
+    return uuid.UUID(int=(seed_bits << 64) | (kind << 48) | index, version=4)
+
+
+def seed_bits_of(seed: int) -> int:
+    return int.from_bytes(hashlib.blake2b(str(seed).encode(), digest_size=8).digest(), "big")
+
+
+def chunk_rng(seed: int, name: str, chunk: int) -> random.Random:
+    return random.Random(f"{seed}:{name}:{chunk}")
+
+
+class Plan:
+    """依 scale 算出各表筆數與時間範圍；會被 pickle 傳給 worker。"""
+
+    def __init__(self, args: argparse.Namespace, sports: List[str]):
+        self.seed = args.seed
+        self.seed_bits = seed_bits_of(args.seed)
+        self.centers = max(1, int(BASE_CENTERS * args.scale))
+        self.users = max(2, int(BASE_USERS * args.scale))
+        self.events = max(1, int(BASE_EVENTS * args.scale))
+        self.messages_per_event = args.messages_per_event
+        self.sports = sports
+        self.center_sport_lists = [self._center_sports(i) for i in range(self.centers)]
+        self.now = args.now or datetime.now(timezone.utc)
+        today = self.now.astimezone(LOCAL_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.first_day = today - timedelta(days=args.days_back)
+        self.days = args.days_back + args.days_ahead
+        self.database_url = settings.database_url
+
+    def center_uid(self, i: int) -> uuid.UUID:
+        return make_uuid(self.seed_bits, KIND_CENTER, i)
+
+    def user_uid(self, i: int) -> uuid.UUID:
+        return make_uuid(self.seed_bits, KIND_USER, i)
+
+    def event_uid(self, i: int) -> uuid.UUID:
+        return make_uuid(self.seed_bits, KIND_EVENT, i)
+
+    def _center_sports(self, i: int) -> List[str]:
+        rng = chunk_rng(self.seed, "center_sports", i)
+        return rng.sample(self.sports, rng.randint(1, min(4, len(self.sports))))
+
+
+# =========================================================
+# 場館 / 合法組合 / 使用者（主程序寫入）
+# =========================================================
+
+def center_rows(plan: Plan) -> Tuple[List[tuple], List[tuple]]:
+    rng = chunk_rng(plan.seed, "centers", 0)
+    centers = []
+    pairs = []
+    for i in range(plan.centers):
+        uid = plan.center_uid(i)
+        # 大台北範圍
+        centers.append((uid, f"gen{plan.seed}-{i:06d}", rng.uniform(24.95, 25.20), rng.uniform(121.45, 121.65)))
+        pairs.extend((sport, uid) for sport in plan.center_sport_lists[i])
+    return centers, pairs
+
+
+async def load_reference(conn: asyncpg.Connection, plan: Plan):
+    centers, pairs = center_rows(plan)
+    await conn.copy_records_to_table(
+        "centers", records=centers, columns=["id", "name", "latitude", "longitude"]
+    )
+    await conn.copy_records_to_table(
+        "allowed_pairs", records=pairs, columns=["sport", "center_id"]
+    )
+    step = 100_000
+    for start in range(0, plan.users, step):
+        await conn.copy_records_to_table(
+            "users",
+            records=[(plan.user_uid(i),) for i in range(start, min(plan.users, start + step))],
+            columns=["uid"],
+        )
+    print(f"centers={len(centers)} allowed_pairs={len(pairs)} users={plan.users}")
+
+
+# =========================================================
+# 活動與其參加者 / 頻道 / 訊息 / 候補（worker 依 chunk 產生）
+# =========================================================
+
+def event_chunk_rows(plan: Plan, chunk: int) -> Dict[str, List[tuple]]:
+    rng = chunk_rng(plan.seed, "events", chunk)
+    rows: Dict[str, List[tuple]] = {
+        "events": [], "participants": [], "channels": [], "messages": [], "waitlist": [],
+    }
+    first = chunk * EVENTS_PER_CHUNK
+    for i in range(first, min(plan.events, first + EVENTS_PER_CHUNK)):
+        uid = plan.event_uid(i)
+        center = rng.randrange(plan.centers)
+        sport = rng.choice(plan.center_sport_lists[center])
+        day = plan.first_day + timedelta(days=rng.randrange(plan.days))
+        # 整點開始；加上 i 微秒讓 start_time 全域唯一，
+        # 保證 (organizer_uid, start_time, center_id, sport) 不重複
+        start_time = day.replace(hour=rng.choice(OPEN_HOURS)) + timedelta(microseconds=i)
+        end_time = start_time + timedelta(hours=rng.choice((1, 1, 2, 2, 3)))
+        # 建立時間在開始前 12 小時（最晚到現在）與開始前 14 天之間
+        latest = min(start_time - timedelta(hours=12), plan.now)
+        earliest = min(start_time - timedelta(days=14), latest)
+        created_at = earliest + (latest - earliest) * rng.random()
+        capacity = rng.choice(CAPACITIES)
+
+        organizer = rng.randrange(plan.users)
+        count = max(1, round(capacity * rng.betavariate(3, 1)))
+        members = {organizer}
+        while len(members) < count:
+            members.add(rng.randrange(plan.users))
+
+        if end_time <= plan.now:
+            status = "closed"
+        elif count >= capacity:
+            status = "full"
+        else:
+            status = "open"
+        reminded = start_time <= plan.now
+
+        rows["events"].append((
+            uid, sport, plan.center_uid(center), start_time, end_time, capacity,
+            status, plan.user_uid(organizer), created_at, reminded,
+        ))
+        member_uids = [plan.user_uid(m) for m in members]
+        rows["participants"].extend((uid, m) for m in member_uids)
+        rows["channels"].append((uid, str(uid), status != "closed"))
+
+        if status == "full":
+            waiting = {rng.randrange(plan.users) for _ in range(rng.randint(0, 3))} - members
+            rows["waitlist"].extend(
+                (uid, plan.user_uid(w), created_at + timedelta(seconds=n))
+                for n, w in enumerate(sorted(waiting))
+            )
+
+        # 訊息只落在建立之後、現在（或結束）之前
+        span = (min(end_time, plan.now) - created_at).total_seconds()
+        if span <= 0 or not plan.messages_per_event:
+            continue
+        for _ in range(int(rng.expovariate(1 / plan.messages_per_event))):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+            rows["messages"].append((
+                uid,
+                rng.choice(member_uids),
+                json.dumps(text),
+                created_at + timedelta(seconds=rng.uniform(0, span)),
+            ))
+    return rows
+
+
+CHUNK_COLUMNS = {
+    "events": [
+        "uid", "sport", "center_id", "start_time", "end_time", "capacity",
+        "status", "organizer_uid", "created_at", "reminded",
+    ],
+    "participants": ["event_uid", "user_uid"],
+    "channels": ["channel_id", "channel_name", "is_active"],
+    "messages": ["channel_id", "uid", "payload", "timestamp"],
+    "waitlist": ["event_uid", "user_uid", "created_at"],
+}
+
+
+async def _copy_chunk(plan: Plan, chunk: int) -> Dict[str, int]:
+    rows = event_chunk_rows(plan, chunk)
+    conn = await asyncpg.connect(plan.database_url)
+    try:
+        async with conn.transaction():
+            # 依外鍵順序寫入：events 先於其他表
+            for table, columns in CHUNK_COLUMNS.items():
+                if rows[table]:
+                    await conn.copy_records_to_table(table, records=rows[table], columns=columns)
+    finally:
+        await conn.close()
+    return {table: len(records) for table, records in rows.items()}
+
+
+def copy_chunk(plan: Plan, chunk: int) -> Dict[str, int]:
+    return asyncio.run(_copy_chunk(plan, chunk))
+
+
+# =========================================================
+# 主流程
+# =========================================================
+
+_RESET = """
+TRUNCATE events, participants, channels, messages, waitlist, allowed_pairs, centers, users,
+         event_occupancy CASCADE;
+"""
+
+# 大量寫入期間暫停的 trigger（彙總表寫完再重算）
+_BULK_TRIGGERS = (
+    ("events", "trg_event_occupancy_insert"),
+    ("participants", "trg_event_occupancy_participants"),
+)
+
+
+async def _set_bulk_triggers(conn: asyncpg.Connection, enabled: bool):
+    action = "ENABLE" if enabled else "DISABLE"
+    for table, trigger in _BULK_TRIGGERS:
+        await conn.execute(f"ALTER TABLE {table} {action} TRIGGER {trigger};")
+
+
+async def main(args: argparse.Namespace):
+    await db_utils.init_db()
+    conn = await asyncpg.connect(settings.database_url)
+    try:
+        sports = await conn.fetchval("SELECT enum_range(NULL::sport_type)::text[];")
+        plan = Plan(args, sports)
+        if args.reset:
+            await conn.execute(_RESET)
+
+        started = time.monotonic()
+        await load_reference(conn, plan)
+
+        if not args.keep_triggers:
+            await _set_bulk_triggers(conn, False)
+        try:
+            totals: Dict[str, int] = {table: 0 for table in CHUNK_COLUMNS}
+            chunks = range((plan.events + EVENTS_PER_CHUNK - 1) // EVENTS_PER_CHUNK)
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                futures = [loop.run_in_executor(pool, copy_chunk, plan, chunk) for chunk in chunks]
+                for done, future in enumerate(asyncio.as_completed(futures), 1):
+                    for table, count in (await future).items():
+                        totals[table] += count
+                    if done % 20 == 0 or done == len(futures):
+                        print(f"chunk {done}/{len(futures)} " + " ".join(f"{t}={n}" for t, n in totals.items()))
+        finally:
+            if not args.keep_triggers:
+                await _set_bulk_triggers(conn, True)
+
+        if not args.keep_triggers:
+            await db_utils.rebuild_occupancy(conn)
+        await conn.execute("ANALYZE;")
+        print(f"完成，耗時 {time.monotonic() - started:.1f} 秒")
+    finally:
+        await conn.close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="產生壓測用的假資料")
+    parser.add_argument("--scale", type=float, default=0.01,
+                        help="1 = 1 萬場館 / 100 萬活動 / 1000 萬參加紀錄 / 5000 萬訊息")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4, help="平行 COPY 的程序數")
+    parser.add_argument("--messages-per-event", type=float, default=MESSAGES_PER_EVENT)
+    parser.add_argument("--days-back", type=int, default=30,
+                        help="活動開始時間的範圍：過去幾天（已結束的活動為 closed）")
+    parser.add_argument("--days-ahead", type=int, default=14)
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None,
+                        help="以這個時間（含時區）為「現在」，固定後每次產生的資料完全相同")
+    parser.add_argument("--reset", action="store_true", help="先 TRUNCATE 所有資料表")
+    parser.add_argument("--keep-triggers", action="store_true",
+                        help="寫入時保留 event_occupancy trigger（較慢）")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
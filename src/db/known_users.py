@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from typing import Any, Iterable
+from uuid import UUID
+
+from db.active_events import as_uuid
+
+
+# =========================================================
+# 已確認存在於 users 表的使用者（有上限的 LRU 集合）
+# =========================================================
+#
+# users 沒有刪除路徑，所以「見過」就代表資料庫裡一定有；
+# 超過上限只會淘汰最久沒出現的，被淘汰的人下次再多一次 upsert 而已。
+
+
+class KnownUsers:
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._uids: "OrderedDict[UUID, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._uids)
+
+    def __contains__(self, user_uid: Any) -> bool:
+        key = as_uuid(user_uid)
+        if key not in self._uids:
+            return False
+        self._uids.move_to_end(key)
+        return True
+
+    def add_many(self, user_uids: Iterable[Any]):
+        for user_uid in user_uids:
+            key = as_uuid(user_uid)
+            self._uids[key] = None
+            self._uids.move_to_end(key)
+        while len(self._uids) > self._max_size:
+            self._uids.popitem(last=False)
+
+    def clear(self):
+        self._uids.clear()
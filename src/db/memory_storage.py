@@ -0,0 +1,627 @@
+import bisect
+import csv
+import io
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from core.config import settings
+from core.readiness import readiness
+from db.active_events import ActiveEventStore, as_uuid
+from db.channels import UnknownChannelError
+from db.db_utils import CREATE_EVENT_ERRORS, check_search_query
+from db.deadlines import DeadlineScheduler
+from db.storage import Storage
+from msg import publisher
+
+
+# =========================================================
+# 記憶體儲存引擎（STORAGE_BACKEND=memory）
+# =========================================================
+#
+# 給不想依賴 Postgres 的場合：單獨壓測 HTTP / MQTT 層、本機開發。重啟後資料全部消失。
+# - 以 dict 建索引（活動、參加者、候補、頻道訊息），進行中活動沿用 ActiveEventStore
+# - 每個操作中間沒有 await，在單一 event loop 上天生是原子的，
+#   報名 / 退出 / 候補遞補的名額判斷與 Postgres 版（FOR UPDATE 鎖活動列）語意相同
+# - 合法性檢查對應資料表的 FK / CHECK / UNIQUE，錯誤訊息共用 CREATE_EVENT_ERRORS
+# - 場館 id 用名稱算出的固定 UUID（與 API 的 place_id 型別一致）
+# - 訊息搜尋以子字串比對近似 pg_trgm / 全文索引
+
+# sport_type enum 的值（依宣告順序，也是排序依據）
+SPORTS = ("羽球", "籃球", "桌球", "撞球", "壁球", "高爾夫")
+
+# 與 schema.sql 相同的初始場館 / 合法組合
+_SEED_CENTERS = [
+    ("中正", 25.0385225, 121.5167618),
+    ("內湖", 25.0781635, 121.5746265),
+    ("北投", 25.1164633, 121.5098119),
+    ("大安", 25.0207438, 121.5431821),
+    ("大同", 25.0653758, 121.5136244),
+    ("士林", 25.0894274, 121.5189874),
+    ("萬華", 25.0474624, 121.5042924),
+    ("文山", 24.9970192, 121.55688),
+    ("信義", 25.0317033, 121.5641931),
+    ("中山", 25.0548481, 121.51877),
+]
+_SEED_PAIRS = {
+    "羽球": ("中正", "內湖", "北投", "大安", "大同", "士林", "萬華", "文山", "信義", "中山"),
+    "籃球": ("中正", "內湖", "大安", "大同", "士林", "信義"),
+    "桌球": ("中正", "內湖", "北投", "大安", "大同", "士林", "萬華", "文山", "信義"),
+    "撞球": ("內湖", "北投", "大安", "文山"),
+    "壁球": ("內湖", "大安", "信義"),
+    "高爾夫": ("萬華",),
+}
+
+_CENTER_NAMESPACE = uuid.UUID("6f1c4b7e-2d0a-4c55-9a37-1f8e6c2b9d40")
+
+# 與 db_utils.EXPORT_QUERIES 相同的欄位
+_EXPORT_COLUMNS = {
+    "events": [
+        "uid", "sport", "center_id", "center_name", "start_time", "end_time",
+        "capacity", "status", "organizer_uid", "created_at",
+    ],
+    "participants": ["event_uid", "user_uid", "sport", "center_id", "start_time"],
+    "messages": ["channel_id", "uid", "payload", "timestamp"],
+}
+_EXPORT_CHUNK_ROWS = 1000
+
+
+def center_uuid(name: str) -> UUID:
+    return uuid.uuid5(_CENTER_NAMESPACE, name)
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self._centers: Dict[UUID, Dict[str, Any]] = {}
+        self._center_ids: Dict[str, UUID] = {}
+        self._pairs: Set[Tuple[str, UUID]] = set()
+        self._users: Set[UUID] = set()
+        # uid -> 活動列（與 events 表同欄位，另有 reminded）
+        self._events: Dict[UUID, Dict[str, Any]] = {}
+        # uq_event_unique_slot
+        self._slots: Set[Tuple[UUID, datetime, UUID, str]] = set()
+        self._participants: Dict[UUID, Set[UUID]] = {}
+        # user_uid -> 參加的活動（= 頻道）
+        self._user_events: Dict[UUID, Set[UUID]] = {}
+        # event_uid -> {user_uid: created_at}，dict 的插入順序即候補順序
+        self._waitlist: Dict[UUID, Dict[UUID, datetime]] = {}
+        # channel_id -> [(timestamp, uid, payload JSON 字串)]，依時間排序
+        self._messages: Dict[UUID, List[Tuple[datetime, UUID, str]]] = {}
+        # (user_uid, channel_id) -> 已讀到的時間
+        self._cursors: Dict[Tuple[UUID, UUID], datetime] = {}
+        self._channel_listeners: List[Callable[[UUID], None]] = []
+
+        self._active = ActiveEventStore()
+        self._active.loaded = True
+        self._deadlines = DeadlineScheduler()
+
+        self._upsert_centers(
+            (name, lat, lng, [sport for sport, names in _SEED_PAIRS.items() if name in names])
+            for name, lat, lng in _SEED_CENTERS
+        )
+
+    # -----------------------------------------------------
+    # 啟動：記憶體引擎不需要暖機
+    # -----------------------------------------------------
+
+    async def init_db(self):
+        pass
+
+    async def warm_pools(self):
+        pass
+
+    async def load_active_events(self):
+        return self._active
+
+    async def load_channels(self):
+        pass
+
+    async def warm_known_users(self):
+        pass
+
+    async def run_event_scheduler(self):
+        # 期限在建立活動時就排好，沒有要預先載入的
+        readiness.mark_ready("scheduler")
+        await self._deadlines.run(self._on_deadline)
+
+    # -----------------------------------------------------
+    # 參考資料
+    # -----------------------------------------------------
+
+    async def get_sports(self) -> List[str]:
+        return sorted({sport for sport, _ in self._pairs}, key=SPORTS.index)
+
+    async def get_centers(self) -> List[Dict[str, Any]]:
+        return [dict(center) for center in self._centers.values()]
+
+    async def get_allowed_pairs_grouped(self) -> List[Dict[str, Any]]:
+        grouped: Dict[str, List[str]] = {}
+        for sport, center_id in self._pairs:
+            grouped.setdefault(sport, []).append(self._centers[center_id]["name"])
+        return [
+            {"sport": sport, "centers": sorted(grouped[sport])}
+            for sport in sorted(grouped, key=SPORTS.index)
+        ]
+
+    async def import_centers(self, centers: List[Tuple[str, float, float, List[str]]]) -> Dict[str, int]:
+        unknown = sorted({sport for *_, sports in centers for sport in sports} - set(SPORTS))
+        if unknown:
+            raise ValueError(f"未知的球種: {', '.join(unknown)}")
+        return self._upsert_centers(centers)
+
+    def _upsert_centers(self, centers) -> Dict[str, int]:
+        # 同名的只取第一筆，與 DISTINCT ON (name) 相同
+        seen: Set[str] = set()
+        pairs_before = len(self._pairs)
+        for name, latitude, longitude, sports in centers:
+            if name in seen:
+                continue
+            seen.add(name)
+            center_id = self._center_ids.setdefault(name, center_uuid(name))
+            self._centers[center_id] = {
+                "id": center_id,
+                "name": name,
+                "latitude": latitude,
+                "longitude": longitude,
+            }
+            self._pairs.update((sport, center_id) for sport in sports)
+        return {"centers": len(seen), "allowed_pairs": len(self._pairs) - pairs_before}
+
+    # -----------------------------------------------------
+    # 活動
+    # -----------------------------------------------------
+
+    def _public_row(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """與 create_event 的 RETURNING 相同欄位。"""
+        return {
+            "uid": event["uid"],
+            "sport": event["sport"],
+            "center_id": event["center_id"],
+            "center_name": self._centers[event["center_id"]]["name"],
+            "start_time": event["start_time"],
+            "end_time": event["end_time"],
+            "capacity": event["capacity"],
+            "status": event["status"],
+            "organizer_uid": event["organizer_uid"],
+        }
+
+    async def create_event(
+        self,
+        user_uid: Any,
+        sport: str,
+        center_id: Any,
+        start_time: datetime,
+        end_time: datetime,
+        capacity: int,
+    ) -> Dict[str, Any]:
+        try:
+            center = as_uuid(center_id)
+        except ValueError:
+            center = None
+        if center not in self._centers:
+            raise ValueError(CREATE_EVENT_ERRORS["fk_events_center"])
+        if sport not in SPORTS:
+            raise ValueError(CREATE_EVENT_ERRORS["sport_type"])
+        if (sport, center) not in self._pairs:
+            raise ValueError(CREATE_EVENT_ERRORS["fk_events_allowed_pair"])
+        if not 1 < capacity <= 100:
+            raise ValueError(CREATE_EVENT_ERRORS["events_capacity_check"])
+        organizer = as_uuid(user_uid)
+        slot = (organizer, start_time, center, sport)
+        if slot in self._slots:
+            raise ValueError(CREATE_EVENT_ERRORS["uq_event_unique_slot"])
+
+        event_uid = uuid.uuid4()
+        event = {
+            "uid": event_uid,
+            "sport": sport,
+            "center_id": center,
+            "start_time": start_time,
+            "end_time": end_time,
+            "capacity": capacity,
+            "status": "open",
+            "organizer_uid": organizer,
+            "created_at": datetime.now(timezone.utc),
+            "reminded": False,
+        }
+        self._users.add(organizer)
+        self._events[event_uid] = event
+        self._slots.add(slot)
+        self._participants[event_uid] = set()
+        self._add_participant(event_uid, organizer)
+        self._waitlist[event_uid] = {}
+        self._messages[event_uid] = []
+
+        self._active.apply({"op": "create", "event": self._public_row(event), "participants": [organizer]})
+        self._schedule(event)
+        return {"uid": str(event_uid)}
+
+    async def join_event(self, user_uid: Any, event_uid: Any) -> Dict[str, Any]:
+        result = {"event_uid": event_uid, "user_uid": user_uid}
+        event = self._events.get(as_uuid(event_uid))
+        if event is None:
+            return {**result, "status": "not_found"}
+        if event["status"] not in ("open", "full"):
+            return {**result, "status": "closed"}
+
+        uid, user = event["uid"], as_uuid(user_uid)
+        self._users.add(user)
+        participants = self._participants[uid]
+        if user in participants:
+            return {**result, "status": "already_joined"}
+
+        if len(participants) >= event["capacity"]:
+            if event["status"] != "full":
+                event["status"] = "full"
+                self._active.apply({"op": "status", "event_uid": uid, "status": "full"})
+            return {**result, "status": "full"}
+
+        self._add_participant(uid, user)
+        # 有在候補名單的話，直接報名成功就不用再候補
+        self._waitlist[uid].pop(user, None)
+        if len(participants) >= event["capacity"]:
+            event["status"] = "full"
+        self._active.apply({"op": "join", "event_uid": uid, "user_uid": user, "status": event["status"]})
+
+        publisher.publish_notice(event_uid, "user_joined", "有新成員加入活動", user_id=user_uid)
+        if event["status"] == "full":
+            publisher.publish_notice(event_uid, "event_full", "活動已額滿")
+        return {**result, "status": "joined"}
+
+    async def leave_event(self, user_uid: Any, event_uid: Any) -> bool:
+        event = self._events.get(as_uuid(event_uid))
+        if event is None:
+            return False
+        uid, user = event["uid"], as_uuid(user_uid)
+        participants = self._participants[uid]
+        if user not in participants:
+            return False
+        self._remove_participant(uid, user)
+        leave = {"op": "leave", "event_uid": uid, "user_uid": user, "status": None}
+
+        promoted_uid = None
+        waitlist = self._waitlist[uid]
+        if event["status"] in ("open", "full") and waitlist:
+            promoted_uid = next(iter(waitlist))
+            del waitlist[promoted_uid]
+            self._add_participant(uid, promoted_uid)
+        elif event["status"] == "full":
+            event["status"] = "open"
+            leave["status"] = "open"
+
+        self._active.apply(leave)
+        if promoted_uid is not None:
+            self._active.apply({"op": "join", "event_uid": uid, "user_uid": promoted_uid, "status": None})
+            publisher.publish_notice(
+                event_uid,
+                "waitlist_promoted",
+                "候補成功，已為你保留名額",
+                user_id=promoted_uid,
+            )
+        return True
+
+    async def cancel_event(self, event_uid: Any, organizer_uid: Optional[Any] = None) -> bool:
+        event = self._events.get(as_uuid(event_uid))
+        if event is None:
+            return False
+        if organizer_uid is not None and event["organizer_uid"] != as_uuid(organizer_uid):
+            return False
+        self._remove_event(event["uid"])
+        publisher.publish_notice(event_uid, "event_cancelled", "活動已被發起人取消")
+        return True
+
+    def _remove_event(self, event_uid: UUID):
+        """刪除活動與其參加者 / 候補 / 頻道 / 訊息（對應外鍵的 ON DELETE CASCADE）。"""
+        event = self._events.pop(event_uid, None)
+        if event is None:
+            return
+        self._slots.discard((event["organizer_uid"], event["start_time"], event["center_id"], event["sport"]))
+        for user_uid in list(self._participants.get(event_uid, ())):
+            self._remove_participant(event_uid, user_uid)
+            self._cursors.pop((user_uid, event_uid), None)
+        self._participants.pop(event_uid, None)
+        self._waitlist.pop(event_uid, None)
+        if self._messages.pop(event_uid, None) is not None:
+            for listener in self._channel_listeners:
+                listener(event_uid)
+        for kind in ("remind", "close", "expire"):
+            self._deadlines.cancel(kind, event_uid)
+        self._active.apply({"op": "remove", "event_uid": event_uid})
+
+    def _add_participant(self, event_uid: UUID, user_uid: UUID):
+        self._participants[event_uid].add(user_uid)
+        self._user_events.setdefault(user_uid, set()).add(event_uid)
+
+    def _remove_participant(self, event_uid: UUID, user_uid: UUID):
+        self._participants[event_uid].discard(user_uid)
+        events = self._user_events.get(user_uid)
+        if events is not None:
+            events.discard(event_uid)
+            if not events:
+                del self._user_events[user_uid]
+
+    async def join_waitlist(self, user_uid: Any, event_uid: Any) -> Dict[str, Any]:
+        result = {"event_uid": event_uid, "user_uid": user_uid, "position": None}
+        event = self._events.get(as_uuid(event_uid))
+        if event is None:
+            return {**result, "status": "not_found"}
+        if event["status"] not in ("open", "full"):
+            return {**result, "status": "closed"}
+        uid, user = event["uid"], as_uuid(user_uid)
+        self._users.add(user)
+        if user in self._participants[uid]:
+            return {**result, "status": "already_joined"}
+        if event["status"] != "full":
+            return {**result, "status": "not_full"}
+
+        waitlist = self._waitlist[uid]
+        inserted = user not in waitlist
+        if inserted:
+            waitlist[user] = datetime.now(timezone.utc)
+        return {
+            **result,
+            "status": "waiting" if inserted else "already_waiting",
+            "position": list(waitlist).index(user) + 1,
+        }
+
+    async def leave_waitlist(self, user_uid: Any, event_uid: Any) -> bool:
+        waitlist = self._waitlist.get(as_uuid(event_uid), {})
+        return waitlist.pop(as_uuid(user_uid), None) is not None
+
+    async def get_user_active_events(self, user_uid: Any) -> List[Dict[str, Any]]:
+        self._prune_expired()
+        return self._active.for_user(user_uid)
+
+    async def get_all_active_events(
+        self,
+        sport: Optional[str] = None,
+        center_name: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        self._prune_expired()
+        return self._active.query(sport=sport, center_name=center_name, start_time=start_time)
+
+    def _prune_expired(self):
+        for event_uid in self._active.prune_expired():
+            self._remove_event(event_uid)
+
+    # -----------------------------------------------------
+    # 活動生命週期（與 db_utils 相同的 remind / close / expire）
+    # -----------------------------------------------------
+
+    def _schedule(self, event: Dict[str, Any]):
+        start = event["start_time"].timestamp()
+        if time.time() < start:
+            self._deadlines.schedule(
+                "remind", event["uid"], start - settings.EVENT_REMINDER_LEAD_MINUTES * 60
+            )
+        self._deadlines.schedule("close", event["uid"], start)
+        self._deadlines.schedule("expire", event["uid"], event["end_time"].timestamp())
+
+    async def _on_deadline(self, kind: str, event_uid: UUID):
+        event = self._events.get(event_uid)
+        if event is None:
+            return
+        if kind == "remind":
+            if not event["reminded"] and event["status"] in ("open", "full"):
+                event["reminded"] = True
+                publisher.publish_notice(
+                    event_uid,
+                    "event_reminder",
+                    f"活動將於 {settings.EVENT_REMINDER_LEAD_MINUTES} 分鐘後開始",
+                    start_time=event["start_time"],
+                )
+        elif kind == "close":
+            if event["status"] in ("open", "full"):
+                event["status"] = "closed"
+                self._deadlines.cancel("remind", event_uid)
+                self._active.apply({"op": "status", "event_uid": event_uid, "status": "closed"})
+        elif kind == "expire":
+            self._remove_event(event_uid)
+
+    # -----------------------------------------------------
+    # 統計 / 匯出
+    # -----------------------------------------------------
+
+    def _matching_events(self, center_id: Optional[Any], sport: Optional[str]):
+        center = as_uuid(center_id) if center_id is not None else None
+        for event in self._events.values():
+            if center is not None and event["center_id"] != center:
+                continue
+            if sport is not None and event["sport"] != sport:
+                continue
+            yield event
+
+    async def get_occupancy(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        center_id: Optional[Any] = None,
+        sport: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        buckets: Dict[Tuple[UUID, str, datetime], Dict[str, Any]] = {}
+        for event in self._matching_events(center_id, sport):
+            hour_start = _hour(event["start_time"])
+            if start is not None and hour_start < _hour(start):
+                continue
+            if end is not None and hour_start >= end:
+                continue
+            key = (event["center_id"], event["sport"], hour_start)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    "center_id": key[0],
+                    "center_name": self._centers[key[0]]["name"],
+                    "sport": key[1],
+                    "hour_start": key[2],
+                    "events": 0,
+                    "open_events": 0,
+                    "full_events": 0,
+                    "capacity": 0,
+                    "participants": 0,
+                }
+            bucket["events"] += 1
+            bucket["open_events"] += event["status"] == "open"
+            bucket["full_events"] += event["status"] == "full"
+            bucket["capacity"] += event["capacity"]
+            bucket["participants"] += len(self._participants[event["uid"]])
+        return sorted(
+            buckets.values(),
+            key=lambda row: (row["hour_start"], row["center_name"], row["sport"]),
+        )
+
+    def _export_rows(self, dataset, start, end, center_id, sport):
+        def in_range(ts: datetime) -> bool:
+            return (start is None or ts >= start) and (end is None or ts < end)
+
+        for event in self._matching_events(center_id, sport):
+            if dataset == "events":
+                if in_range(event["start_time"]):
+                    yield {**self._public_row(event), "created_at": event["created_at"]}
+            elif dataset == "participants":
+                if in_range(event["start_time"]):
+                    for user_uid in self._participants[event["uid"]]:
+                        yield {
+                            "event_uid": event["uid"],
+                            "user_uid": user_uid,
+                            "sport": event["sport"],
+                            "center_id": event["center_id"],
+                            "start_time": event["start_time"],
+                        }
+            else:
+                for ts, uid, payload in self._messages[event["uid"]]:
+                    if in_range(ts):
+                        yield {"channel_id": event["uid"], "uid": uid, "payload": payload, "timestamp": ts}
+
+    async def stream_export(
+        self,
+        dataset: str,
+        fmt: str = "csv",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        center_id: Optional[Any] = None,
+        sport: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        columns = _EXPORT_COLUMNS[dataset]  # 與 EXPORT_QUERIES 一樣，未知的資料集丟 KeyError
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt != "ndjson":
+            writer.writerow(columns)
+        for i, row in enumerate(self._export_rows(dataset, start, end, center_id, sport), 1):
+            if fmt == "ndjson":
+                if dataset == "messages":
+                    row = {**row, "payload": json.loads(row["payload"])}
+                buffer.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+            else:
+                writer.writerow([row[column] for column in columns])
+            if i % _EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    # -----------------------------------------------------
+    # 聊天訊息
+    # -----------------------------------------------------
+
+    async def has_channel(self, channel_id: Any) -> bool:
+        return as_uuid(channel_id) in self._messages
+
+    def on_channel_removed(self, listener: Callable[[UUID], None]):
+        self._channel_listeners.append(listener)
+
+    async def insert_message(self, channel_id: UUID, user_id: UUID, payload: Any) -> datetime:
+        messages = self._messages.get(as_uuid(channel_id))
+        if messages is None:
+            raise UnknownChannelError(channel_id)
+        timestamp = datetime.now(timezone.utc)
+        item = (timestamp, as_uuid(user_id), json.dumps(payload))
+        if messages and timestamp < messages[-1][0]:
+            bisect.insort(messages, item, key=lambda m: m[0])
+        else:
+            messages.append(item)
+        return timestamp
+
+    @staticmethod
+    def _message_row(item: Tuple[datetime, UUID, str], **extra) -> Dict[str, Any]:
+        timestamp, uid, payload = item
+        return {"uid": uid, "payload": payload, "timestamp": timestamp, **extra}
+
+    async def get_recent_messages(self, channel_id: Any, limit: int) -> List[Dict[str, Any]]:
+        messages = self._messages.get(as_uuid(channel_id), [])
+        return [self._message_row(item) for item in messages[-limit:]]
+
+    async def get_channel_messages(self, channel_id: Any) -> List[Dict[str, Any]]:
+        return [self._message_row(item) for item in self._messages.get(as_uuid(channel_id), [])]
+
+    async def mark_read(self, user_uid: Any, channel_id: Any, read_at: Optional[datetime] = None) -> Optional[datetime]:
+        channel = as_uuid(channel_id)
+        messages = self._messages.get(channel)
+        if messages is None:
+            return None
+        now = datetime.now(timezone.utc)
+        if read_at is None:
+            read_at = messages[-1][0] if messages else now
+        elif read_at.tzinfo is None:
+            read_at = read_at.replace(tzinfo=timezone.utc)
+        read_at = min(read_at, now)
+        key = (as_uuid(user_uid), channel)
+        self._users.add(key[0])
+        current = self._cursors.get(key)
+        if current is None or read_at > current:
+            self._cursors[key] = read_at
+        return self._cursors[key]
+
+    async def get_unread_counts(self, user_uid: Any, cap: int) -> List[Dict[str, Any]]:
+        user = as_uuid(user_uid)
+        counts = []
+        for channel in sorted(self._user_events.get(user, ())):
+            last_read_at = self._cursors.get((user, channel))
+            unread = 0
+            # 從最新往回數，遇到已讀位置或數到 cap 就停
+            for timestamp, sender, _ in reversed(self._messages[channel]):
+                if unread >= cap or (last_read_at is not None and timestamp <= last_read_at):
+                    break
+                if sender != user:
+                    unread += 1
+            counts.append({"channel_id": channel, "last_read_at": last_read_at, "unread": unread})
+        return counts
+
+    async def find_messages(
+        self,
+        query: str,
+        channel_id: Optional[Any] = None,
+        user_id: Optional[Any] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        check_search_query(query, channel_id)
+        words = query.lower().split()
+        if not words:
+            return []
+        if channel_id is not None:
+            channels = [as_uuid(channel_id)]
+        else:
+            channels = list(self._messages)
+        user = as_uuid(user_id) if user_id is not None else None
+
+        matches = []
+        for channel in channels:
+            for item in self._messages.get(channel, []):
+                if user is not None and item[1] != user:
+                    continue
+                text = str(json.loads(item[2])).lower()
+                if all(word in text for word in words):
+                    # 近似相關度：查詢字佔訊息長度的比例
+                    rank = sum(len(word) * text.count(word) for word in words) / max(len(text), 1)
+                    matches.append(self._message_row(item, channel_id=channel, rank=rank))
+        matches.sort(key=lambda row: (row["rank"], row["timestamp"]), reverse=True)
+        return matches[offset:offset + limit]
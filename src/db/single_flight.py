@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from core import metrics
+
+
+# =========================================================
+# 相同參數的並行讀取只執行一次（single-flight）
+# =========================================================
+#
+# 第一個呼叫者開始查詢，同時間帶相同參數進來的呼叫者直接等同一個結果，
+# 首頁大量同時載入時只佔一條連線。可選擇的 ttl（秒）讓結果在短時間內繼續共用。
+# 共用的結果是同一個物件，呼叫端不可修改。
+
+T = TypeVar("T")
+
+_groups: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    def __init__(self, ttl: float = 0.0, max_entries: int = 1024):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._recent: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self.ttl_hits = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        if self._ttl > 0:
+            cached = self._recent.get(key)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    self.ttl_hits += 1
+                    return cached[1]
+                del self._recent[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            # 獨立的 task：第一個呼叫者被取消時，其他等待者仍拿得到結果
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if self._ttl > 0 and not task.cancelled() and task.exception() is None:
+            self._recent[key] = (time.monotonic() + self._ttl, task.result())
+            self._recent.move_to_end(key)
+            while len(self._recent) > self._max_entries:
+                self._recent.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": self.shared,
+            "ttl_hits": self.ttl_hits,
+        }
+
+
+def single_flight(ttl: float = 0.0):
+    """
+    async 讀取函式的 decorator；以 (args, kwargs) 為 key，參數必須可 hash。
+        @single_flight(ttl=1.0)
+        async def get_occupancy(...): ...
+    """
+
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        group = SingleFlight(ttl)
+        _groups[f"{fn.__module__}.{fn.__qualname__}"] = group
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs) -> T:
+            key = (args, tuple(sorted(kwargs.items())))
+            return await group.do(key, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+metrics.register("single_flight", lambda: {name: group.stats() for name, group in _groups.items()})
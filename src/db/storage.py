@@ -0,0 +1,215 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from core.config import settings
+from db import db_utils
+
+
+# =========================================================
+# 儲存層介面
+# =========================================================
+#
+# API 與 msg_log_server 只透過 storage 讀寫，實際引擎由 STORAGE_BACKEND 決定：
+# - "postgres"（預設）：db_utils 的 asyncpg 實作
+# - "memory"：db.memory_storage，全部放在記憶體，用來單獨壓測 HTTP / MQTT 層或本機開發
+# 回傳格式、ValueError 訊息與狀態字串兩邊一致，上層不需要知道用的是哪一個。
+#
+# 訊息列（get_recent_messages / get_channel_messages / find_messages）
+# 以 row["uid"] / row["payload"]（JSON 字串）/ row["timestamp"] 取值。
+
+
+class Storage(ABC):
+    # -----------------------------------------------------
+    # 啟動（main.startup 依序 / 並行呼叫，不需要的引擎直接返回）
+    # -----------------------------------------------------
+
+    @abstractmethod
+    async def init_db(self): ...
+
+    @abstractmethod
+    async def warm_pools(self): ...
+
+    @abstractmethod
+    async def load_active_events(self): ...
+
+    @abstractmethod
+    async def load_channels(self): ...
+
+    @abstractmethod
+    async def warm_known_users(self): ...
+
+    @abstractmethod
+    async def run_event_scheduler(self):
+        """活動開始前提醒 / 開始時截止報名 / 結束後刪除；常駐執行。期限載入完成後 mark_ready("scheduler")。"""
+
+    # -----------------------------------------------------
+    # 參考資料
+    # -----------------------------------------------------
+
+    @abstractmethod
+    async def get_sports(self) -> List[str]: ...
+
+    @abstractmethod
+    async def get_centers(self) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def get_allowed_pairs_grouped(self) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def import_centers(self, centers: List[Tuple[str, float, float, List[str]]]) -> Dict[str, int]: ...
+
+    # -----------------------------------------------------
+    # 活動 / 報名 / 候補
+    # -----------------------------------------------------
+
+    @abstractmethod
+    async def create_event(
+        self,
+        user_uid: Any,
+        sport: str,
+        center_id: Any,
+        start_time: datetime,
+        end_time: datetime,
+        capacity: int,
+    ) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    async def join_event(self, user_uid: Any, event_uid: Any) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    async def leave_event(self, user_uid: Any, event_uid: Any) -> bool: ...
+
+    @abstractmethod
+    async def cancel_event(self, event_uid: Any, organizer_uid: Optional[Any] = None) -> bool: ...
+
+    @abstractmethod
+    async def join_waitlist(self, user_uid: Any, event_uid: Any) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    async def leave_waitlist(self, user_uid: Any, event_uid: Any) -> bool: ...
+
+    @abstractmethod
+    async def get_user_active_events(self, user_uid: Any) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def get_all_active_events(
+        self,
+        sport: Optional[str] = None,
+        center_name: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    # -----------------------------------------------------
+    # 統計 / 匯出
+    # -----------------------------------------------------
+
+    @abstractmethod
+    async def get_occupancy(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        center_id: Optional[Any] = None,
+        sport: Optional[str] = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def stream_export(
+        self,
+        dataset: str,
+        fmt: str = "csv",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        center_id: Optional[Any] = None,
+        sport: Optional[str] = None,
+    ) -> AsyncIterator[bytes]: ...
+
+    # -----------------------------------------------------
+    # 聊天訊息
+    # -----------------------------------------------------
+
+    @abstractmethod
+    async def has_channel(self, channel_id: Any) -> bool: ...
+
+    @abstractmethod
+    def on_channel_removed(self, listener: Callable[[UUID], None]):
+        """頻道被刪除（活動取消 / 過期）時呼叫 listener(channel_id)。"""
+
+    @abstractmethod
+    async def insert_message(self, channel_id: UUID, user_id: UUID, payload: Any) -> datetime:
+        """回傳寫入時間；頻道不存在丟出 db.channels.UnknownChannelError。"""
+
+    @abstractmethod
+    async def get_recent_messages(self, channel_id: Any, limit: int) -> List[Any]: ...
+
+    @abstractmethod
+    async def get_channel_messages(self, channel_id: Any) -> List[Any]: ...
+
+    @abstractmethod
+    async def mark_read(self, user_uid: Any, channel_id: Any, read_at: Optional[datetime] = None) -> Optional[datetime]:
+        """已讀位置只前進不後退；read_at 未指定時推到最新訊息，晚於現在以現在計。頻道不存在回傳 None。"""
+
+    @abstractmethod
+    async def get_unread_counts(self, user_uid: Any, cap: int) -> List[Dict[str, Any]]:
+        """[{"channel_id", "last_read_at", "unread"}]，unread 最多數到 cap。"""
+
+    @abstractmethod
+    async def find_messages(
+        self,
+        query: str,
+        channel_id: Optional[Any] = None,
+        user_id: Optional[Any] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Any]:
+        """短的中日韓查詢沒指定 channel_id 時拋 ValueError（見 db_utils.check_search_query）。"""
+
+
+class PostgresStorage(Storage):
+    """預設引擎：直接沿用 db_utils 的函式。"""
+
+    init_db = staticmethod(db_utils.init_db)
+    warm_pools = staticmethod(db_utils.warm_pools)
+    load_active_events = staticmethod(db_utils.load_active_events)
+    load_channels = staticmethod(db_utils.load_channels)
+    warm_known_users = staticmethod(db_utils.warm_known_users)
+    run_event_scheduler = staticmethod(db_utils.run_event_scheduler)
+
+    get_sports = staticmethod(db_utils.get_sports)
+    get_centers = staticmethod(db_utils.get_centers)
+    get_allowed_pairs_grouped = staticmethod(db_utils.get_allowed_pairs_grouped)
+    import_centers = staticmethod(db_utils.import_centers)
+
+    create_event = staticmethod(db_utils.create_event)
+    join_event = staticmethod(db_utils.join_event)
+    leave_event = staticmethod(db_utils.leave_event)
+    cancel_event = staticmethod(db_utils.cancel_event)
+    join_waitlist = staticmethod(db_utils.join_waitlist)
+    leave_waitlist = staticmethod(db_utils.leave_waitlist)
+    get_user_active_events = staticmethod(db_utils.get_user_active_events)
+    get_all_active_events = staticmethod(db_utils.get_all_active_events)
+
+    get_occupancy = staticmethod(db_utils.get_occupancy)
+    stream_export = staticmethod(db_utils.stream_export)
+
+    has_channel = staticmethod(db_utils.has_channel)
+    on_channel_removed = staticmethod(db_utils.on_channel_removed)
+    insert_message = staticmethod(db_utils.insert_message)
+    get_recent_messages = staticmethod(db_utils.get_recent_messages)
+    get_channel_messages = staticmethod(db_utils.get_channel_messages)
+    find_messages = staticmethod(db_utils.find_messages)
+    mark_read = staticmethod(db_utils.mark_read)
+    get_unread_counts = staticmethod(db_utils.get_unread_counts)
+
+
+def create_storage(backend: str) -> Storage:
+    if backend == "postgres":
+        return PostgresStorage()
+    if backend == "memory":
+        from db.memory_storage import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"未知的 STORAGE_BACKEND: {backend}")
+
+
+storage = create_storage(settings.STORAGE_BACKEND)
@@ -1,19 +1,98 @@
 import asyncio
+import logging
+from typing import Coroutine, Dict
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from api.router import api_router
-from db.db_utils import init_db
+from core import log
+from core.config import settings
+from core.encoding import CompressionMiddleware
+from core.loop_watchdog import watchdog
+from core.profiler import ProfileMiddleware, profiler
+from api.health import router as health_router
+from core.readiness import readiness
+from db.storage import storage
 from msg.msg_log_server import mqtt_listener
 from fastapi.middleware.cors import CORSMiddleware
 
 
+log.setup()
+logger = logging.getLogger(__name__)
+
+
+STARTUP_STEPS = ("schema", "pools", "active_events", "channels", "known_users")
+
+# Long-running tasks started by the lifespan, by readiness component name.
+# Cancelled and awaited on shutdown.
+background_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _task_done(task: asyncio.Task):
+    if task.cancelled() or task.exception() is None:
+        return
+    logger.error("Background task failed", exc_info=task.exception(), extra={"task": task.get_name()})
+    readiness.mark_not_ready(task.get_name())
+
+
+def spawn(name: str, coro: Coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    task.add_done_callback(_task_done)
+    background_tasks[name] = task
+    return task
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _step(name: str, awaitable):
+    await awaitable
+    readiness.mark_ready(name)
+
+
+async def startup():
+    """
+    Warm up in the background so /healthz answers immediately and /readyz
+    reports progress. Only the schema has to exist before the caches load;
+    everything else runs concurrently.
+    """
+    try:
+        await asyncio.gather(_step("schema", storage.init_db()), _step("pools", storage.warm_pools()))
+        logger.info("Schema ready, initializing MQTT")
+        spawn("mqtt", mqtt_listener())
+        await asyncio.gather(
+            _step("active_events", storage.load_active_events()),
+            _step("channels", storage.load_channels()),
+            _step("known_users", storage.warm_known_users()),
+        )
+        # run_event_scheduler marks "scheduler" ready once its deadlines are loaded
+        spawn("scheduler", storage.run_event_scheduler())
+        logger.info("Startup complete", extra=readiness.snapshot())
+    except Exception as e:
+        readiness.fail(e)
+        logger.exception("Startup failed")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_db()
-    global mqtt_task
-    print("🚀 FastAPI starting, initializing MQTT...")
-    mqtt_task = asyncio.create_task(mqtt_listener())
-    yield
+    for name in STARTUP_STEPS + ("scheduler",):
+        readiness.expect(name)
+    # the HTTP API keeps serving while the broker is unreachable
+    readiness.expect("mqtt", required=False)
+    readiness.expect("watchdog", required=False)
+    spawn("watchdog", watchdog.run())
+    readiness.mark_ready("watchdog")
+    spawn("startup", startup())
+    try:
+        yield
+    finally:
+        # stop the warm-up first so it cannot spawn more tasks while we cancel them
+        await _cancel([background_tasks.pop("startup")])
+        await _cancel(list(background_tasks.values()))
+        background_tasks.clear()
+        await profiler.stop_all()
 
 app = FastAPI(
     title="jo exercise",
@@ -30,8 +109,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfileMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESS_MIN_BYTES)
 
 app.include_router(api_router, prefix="/api")
+app.include_router(health_router)
 
 
 @app.get("/")
@@ -1,16 +1,18 @@
-import paho.mqtt.client as mqtt
+"""
+除錯用：訂閱 TownPass/{channel_id} 並印出收到的聊天訊息。
+
+用法（在 src/ 底下）：
+    python -m msg.get_msg                      # 所有頻道
+    python -m msg.get_msg --channel <uuid>     # 單一頻道
+"""
+import argparse
 import json
 import uuid
 
-from core.config import settings
-
-MQTT_USR_NAME = settings.MQTT_USR_NAME
-MQTT_USR_PWD = settings.MQTT_USR_PWD
-MQTT_BROKER = settings.MQTT_BROKER
+import paho.mqtt.client as mqtt
 
-CHANNEL_ID = ""
+from core.config import settings
 
-subToppic = f"TownPass/{CHANNEL_ID}"
 
 def is_valid_uuid(uuid_str, version=4):
     try:
@@ -24,89 +26,69 @@ def on_subcribe(client, userdata, mid, reason_code_list, properties):
         print(f"Broker 拒絕了您的訂閱: {reason_code_list[0]}")
     else:
         print(f"Broker 授予的 QoS: {reason_code_list[0].value}")
-def on_unsubcribe(client, userdata, mid, reason_code_list, properties):
-    if len(reason_code_list) == 0 or not reason_code_list[0].is_failure:
-        print("取消訂閱成功 (若在 MQTTv3 收到 SUBACK 則成功)")
-    else:
-        print(f"Broker 回覆失敗: {reason_code_list[0]}")
-    client.disconnect()
 
 def on_connect(client, userdata, flags, reason_code, properties):
     if reason_code.is_failure:
         print(f"連接失敗: {reason_code}。loop_forever() 將重試連接")
-        print(f"訂閱主題: {subToppic}")
     else:
-        client.subscribe(subToppic)
+        print(f"訂閱主題: {userdata['topic']}")
+        client.subscribe(userdata["topic"])
 
-def on_disconnect(client, userdata, rc):
-    print(f"與 Broker 斷開連接，原因代碼: {rc}")
+def on_disconnect(client, userdata, flags, reason_code, properties):
+    print(f"與 Broker 斷開連接，原因代碼: {reason_code}")
 
 def on_message(client, userdata, message):
-    full_topic = message.topic
-    payload_str = message.payload.decode('utf-8')
-
-    topic_parts = full_topic.split('/')
-    
-    channel_id = None
-    if len(topic_parts) >= 2 and topic_parts[0] == "TownPass":
-        channel_id = topic_parts[1]
-    else:
-        print(f"無法從主題 '{full_topic}' 提取 channel_id，請檢查主題格式。")
+    topic_parts = message.topic.split('/')
+    if len(topic_parts) != 2 or topic_parts[0] != "TownPass":
+        print(f"無法從主題 '{message.topic}' 提取 channel_id，請檢查主題格式。")
         return
-    
+    channel_id = topic_parts[1]
     if not is_valid_uuid(channel_id):
         print(f"channel_id '{channel_id}' 不是有效的 UUID 格式。")
         return
-    
-    user_msg_dict = None
+
+    # 與 msg_log_server 相同的格式：{"sender": "<user uuid>", "text": "<字串>"}
     try:
-        user_msg_dict = json.loads(payload_str)
-        if not isinstance(user_msg_dict, dict):
-            print("Payload 解析後不是字典格式。")
-            return
-    except json.JSONDecodeError:
-        print(f"無法解析訊息載荷為 JSON: {payload_str}")
+        data = json.loads(message.payload)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        print(f"無法解析訊息載荷為 JSON: {message.payload!r}")
         return
-    
-    
-    if not user_msg_dict:
-        print("訊息字典為空。")
+    if not isinstance(data, dict) or not isinstance(data.get("text"), str):
+        print(f"訊息載荷格式錯誤：{data!r}")
         return
-
-    if len(user_msg_dict) != 1:
-        print("訊息載荷格式錯誤：預期只有一個 user_id 作為鍵。")
+    sender = data.get("sender")
+    if not isinstance(sender, str) or not is_valid_uuid(sender):
+        print(f"sender '{sender}' 不是有效的 UUID 格式。")
         return
 
-    user_id = list(user_msg_dict.keys())[0]
-    
-    if not is_valid_uuid(user_id):
-        print(f"user_id '{user_id}' 不是有效的 UUID 格式。")
-        return
-        
-    chat_message = user_msg_dict[user_id]
-    
-    message_data = {
-        "channel_id": channel_id,
-        "user_id": user_id,
-        "message": chat_message
-    }
-    
-    print("--- 接收到新的聊天訊息 (UUID 驗證成功) ---")
-    print(f"聊天室 ID: {message_data['channel_id']}")
-    print(f"用戶 ID: {message_data['user_id']}")
-    print(f"訊息內容: {message_data['message']}")
+    print("--- 接收到新的聊天訊息 ---")
+    print(f"聊天室 ID: {channel_id}")
+    print(f"用戶 ID: {sender}")
+    print(f"訊息內容: {data['text']}")
     print("----------------------------")
 
 
-mqttc = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-mqttc.on_connect = on_connect
-mqttc.on_disconnect = on_disconnect
-mqttc.on_message = on_message
-mqttc.on_subscribe = on_subcribe
-mqttc.on_unsubscribe = on_unsubcribe
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="訂閱並印出聊天訊息")
+    parser.add_argument("--channel", default="+", help="channel uuid，預設訂閱所有頻道")
+    parser.add_argument("--broker", default=None, help="預設為 Settings.MQTT_BROKER")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args(argv)
+
+    mqttc = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    mqttc.on_connect = on_connect
+    mqttc.on_disconnect = on_disconnect
+    mqttc.on_message = on_message
+    mqttc.on_subscribe = on_subcribe
+
+    mqttc.user_data_set({"topic": f"TownPass/{args.channel}"})
+    mqttc.username_pw_set(settings.MQTT_USR_NAME, settings.MQTT_USR_PWD)
+    mqttc.connect(args.broker or settings.MQTT_BROKER, args.port)
+    try:
+        mqttc.loop_forever()
+    except KeyboardInterrupt:
+        mqttc.disconnect()
 
-mqttc.user_data_set([])
-mqttc.username_pw_set(MQTT_USR_NAME, MQTT_USR_PWD)
-mqttc.connect(MQTT_BROKER)
 
-mqttc.loop_forever()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import bisect
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+
+# =========================================================
+# 每個頻道最近 N 則訊息的記憶體快取
+# =========================================================
+#
+# - 讀取時若頻道不在快取，從資料庫補最近 N 則（back-fill）
+# - handle_message 寫入資料庫後，已在快取的頻道直接附加新訊息
+# - 以估計的位元組數為全域上限，超過時依 LRU 淘汰整個頻道
+# 快取內容永遠是該頻道歷史的「最後 N 則」，所以 limit <= N 的請求都能直接回應。
+
+# 每則訊息除了內容以外的估計額外開銷（dict、datetime、字串物件）
+_ENTRY_OVERHEAD = 400
+
+Entry = Tuple[datetime, Dict[str, Any], int]
+
+
+def _key(channel_id: Any) -> UUID:
+    return channel_id if isinstance(channel_id, UUID) else UUID(str(channel_id))
+
+
+class _ChannelBuffer:
+    __slots__ = ("entries", "size", "pending")
+
+    def __init__(self):
+        self.entries: List[Entry] = []
+        self.size = 0
+        # back-fill 查詢進行中收到的新訊息，補完後再併入
+        self.pending: Optional[List[Entry]] = []
+
+
+class ChannelHistoryCache:
+    def __init__(self, per_channel: int, max_bytes: int):
+        self.per_channel = per_channel
+        self._max_bytes = max_bytes
+        self._channels: "OrderedDict[UUID, _ChannelBuffer]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, channel_id: Any, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """回傳最後 limit 則訊息（依時間排序）；不在快取則回傳 None。"""
+        key = _key(channel_id)
+        buffer = self._channels.get(key)
+        if buffer is None or buffer.pending is not None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._channels.move_to_end(key)
+        return [entry for _, entry, _ in buffer.entries[-limit:]]
+
+    def begin_fill(self, channel_id: Any):
+        """標記頻道開始 back-fill；之後 append 的訊息先暫存。"""
+        key = _key(channel_id)
+        if key not in self._channels:
+            self._channels[key] = _ChannelBuffer()
+
+    def finish_fill(self, channel_id: Any, history: List[Entry]):
+        """
+        填入從資料庫讀到的最近訊息 [(timestamp, entry, 原始大小), ...]（舊到新），
+        並併入 back-fill 期間收到的訊息。
+        """
+        key = _key(channel_id)
+        buffer = self._channels.get(key)
+        if buffer is None or buffer.pending is None:
+            return
+        pending, buffer.pending = buffer.pending, None
+        for ts, entry, raw_size in history:
+            self._insert(buffer, (ts, entry, raw_size + _ENTRY_OVERHEAD))
+        seen = {(ts, entry["sender"]) for ts, entry, _ in buffer.entries}
+        for ts, entry, size in pending:
+            if (ts, entry["sender"]) not in seen:
+                self._insert(buffer, (ts, entry, size))
+        self._evict()
+
+    def abort_fill(self, channel_id: Any):
+        key = _key(channel_id)
+        buffer = self._channels.get(key)
+        if buffer is not None and buffer.pending is not None:
+            del self._channels[key]
+
+    def append(self, channel_id: Any, timestamp: datetime, entry: Dict[str, Any], raw_size: int):
+        """新訊息寫入資料庫後呼叫；頻道不在快取就略過（讀取時再 back-fill）。"""
+        buffer = self._channels.get(_key(channel_id))
+        if buffer is None:
+            return
+        item = (timestamp, entry, raw_size + _ENTRY_OVERHEAD)
+        if buffer.pending is not None:
+            buffer.pending.append(item)
+            return
+        self._insert(buffer, item)
+        self._evict()
+
+    def discard(self, channel_id: Any):
+        buffer = self._channels.pop(_key(channel_id), None)
+        if buffer is not None:
+            self._size -= buffer.size
+
+    def _insert(self, buffer: _ChannelBuffer, item: Entry):
+        # 多個 handle_message 並行時，寫入順序不一定等於時間順序
+        if buffer.entries and item[0] < buffer.entries[-1][0]:
+            idx = bisect.bisect_right([ts for ts, _, _ in buffer.entries], item[0])
+            buffer.entries.insert(idx, item)
+        else:
+            buffer.entries.append(item)
+        buffer.size += item[2]
+        self._size += item[2]
+        while len(buffer.entries) > self.per_channel:
+            _, _, size = buffer.entries.pop(0)
+            buffer.size -= size
+            self._size -= size
+
+    def _evict(self):
+        while self._size > self._max_bytes and self._channels:
+            _, buffer = self._channels.popitem(last=False)
+            self._size -= buffer.size
@@ -1,93 +1,186 @@
 import asyncio
 import json
+import logging
 import uuid
-from typing import List, Dict
+from collections import Counter
+from datetime import datetime
+from typing import Any, List, Dict, Optional, Tuple
 
 from aiomqtt import Client, MqttError
+from core import metrics
 from core.config import settings
-from db.db_utils import get_pool
+from core.readiness import readiness
+from db.channels import UnknownChannelError
+from db.single_flight import single_flight
+from db.storage import storage
+from msg import publisher
+from msg.history_cache import ChannelHistoryCache
 
 MQTT_USR_NAME = settings.MQTT_USR_NAME
 MQTT_USR_PWD = settings.MQTT_USR_PWD
 MQTT_BROKER = settings.MQTT_BROKER
 MQTT_TOPIC = "TownPass/#"
 
+logger = logging.getLogger(__name__)
 
-async def save_message_to_db(channel_id: str, user_id: str, payload: dict):
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+# 被丟棄的訊息數（依原因）
+dropped_messages: Counter = Counter()
+
+history_cache = ChannelHistoryCache(
+    per_channel=settings.HISTORY_CACHE_PER_CHANNEL,
+    max_bytes=settings.HISTORY_CACHE_MAX_BYTES,
+)
+# 活動取消 / 過期時頻道跟著刪除，快取裡的紀錄也要一起丟掉，否則 ?limit=N 仍會讀到
+storage.on_channel_removed(history_cache.discard)
+metrics.register("ingest", lambda: {
+    "dropped": dict(dropped_messages),
+    "history_cache_hits": history_cache.hits,
+    "history_cache_misses": history_cache.misses,
+})
+
+
+async def save_message_to_db(channel_id: uuid.UUID, user_id: uuid.UUID, payload: Any) -> Optional[datetime]:
+    """寫入一則訊息，回傳資料庫給的 timestamp；失敗回傳 None。"""
+    try:
+        return await storage.insert_message(channel_id, user_id, payload)
+    except UnknownChannelError:
+        # 頻道在集合裡但已被刪除（過期活動批次清除），之後的訊息直接在入口丟棄
+        _drop("unknown_channel", f"TownPass/{channel_id}")
+        return None
+    except Exception:
+        logger.exception("訊息寫入失敗", extra={"channel_id": channel_id, "user_id": user_id})
+        return None
+
+
+def _history_entry(uid, payload, timestamp: datetime) -> Dict:
+    return {
+        "sender": uid,
+        "text": payload,
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+@single_flight()
+async def get_message_history(channel_id: str, limit: Optional[int] = None) -> List[Dict]:
+    """
+    回傳頻道訊息（舊到新）。
+    指定 limit 且不超過快取容量時只取最後 limit 則，優先從 history_cache 讀；
+    不指定 limit 則照舊讀整個頻道。
+    """
+    if limit is not None and limit <= history_cache.per_channel:
+        cached = history_cache.get(channel_id, limit)
+        if cached is not None:
+            return cached
+        history_cache.begin_fill(channel_id)
         try:
-            await conn.execute(
-                """
-                INSERT INTO messages (channel_id, uid, payload)
-                VALUES ($1, $2, $3);
-                """,
-                channel_id,
-                user_id,
-                json.dumps(payload),
-            )
-            print(f"成功儲存訊息：Channel ID={channel_id}, User ID={user_id}")
-        except Exception as e:
-            print(f"資料庫儲存錯誤: {e}")
-
-
-async def get_message_history(channel_id: str) -> List[Dict]:
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        records = await conn.fetch(
-            """
-            SELECT uid, payload, timestamp
-            FROM messages
-            WHERE channel_id = $1
-            ORDER BY timestamp ASC
-            """,
-            channel_id,
-        )
-        history = []
+            records = await storage.get_recent_messages(channel_id, history_cache.per_channel)
+        except BaseException:
+            history_cache.abort_fill(channel_id)
+            raise
+        recent = []
         for record in records:
             message_payload = json.loads(record["payload"]) if record["payload"] else {}
-            history.append({
-                "sender": record["uid"],
-                "text": message_payload,
-                "timestamp": record["timestamp"].isoformat(),
-            })
-        return history
+            entry = _history_entry(record["uid"], message_payload, record["timestamp"])
+            recent.append((record["timestamp"], entry, len(record["payload"] or "")))
+        history_cache.finish_fill(channel_id, recent)
+        return [entry for _, entry, _ in recent[-limit:]]
+
+    history = []
+    for record in await storage.get_channel_messages(channel_id):
+        message_payload = json.loads(record["payload"]) if record["payload"] else {}
+        history.append(_history_entry(record["uid"], message_payload, record["timestamp"]))
+    return history
+
+
+@single_flight()
+async def search_messages(
+    query: str,
+    channel_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict]:
+    """
+    在某個頻道或某位使用者的訊息中搜尋，依相關度排序並分頁
+    （Postgres 依文字走 pg_trgm 或全文索引，見 db_utils.find_messages）。
+    """
+    records = await storage.find_messages(query, channel_id, user_id, limit, offset)
+    return [
+        {
+            "channel_id": record["channel_id"],
+            "sender": record["uid"],
+            "text": json.loads(record["payload"]) if record["payload"] else {},
+            "timestamp": record["timestamp"].isoformat(),
+            "rank": record["rank"],
+        }
+        for record in records
+    ]
+
+
+def _parse_chat_payload(payload: bytes) -> Optional[Tuple[uuid.UUID, str]]:
+    """聊天訊息格式：{"sender": "<user uuid>", "text": "<字串>"}；不符合回傳 None。"""
+    try:
+        data = json.loads(payload)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    sender = data.get("sender")
+    text = data.get("text")
+    if not isinstance(sender, str) or not isinstance(text, str) or not text:
+        return None
+    try:
+        return uuid.UUID(sender), text
+    except ValueError:
+        return None
 
 
+def _drop(reason: str, topic: str):
+    dropped_messages[reason] += 1
+    logger.warning("丟棄訊息", extra={"reason": reason, "topic": topic})
 
-async def handle_message(message):
-    full_topic = str(message.topic)
-    payload_str = message.payload.decode("utf-8")
 
-    topic_parts = full_topic.split('/')
-    if len(topic_parts) < 2 or topic_parts[0] != "TownPass":
-        print(f"無法從主題 '{full_topic}' 提取 Channel ID")
+async def handle_message(message):
+    """
+    驗證後寫入一則聊天訊息。
+    主題 / 頻道 / 格式不對的訊息計數後丟棄（見 dropped_messages），不佔用資料庫連線；
+    log 有限流，大量垃圾訊息不會拖慢寫入。
+    """
+    topic = str(message.topic)
+    topic_parts = topic.split('/')
+    if len(topic_parts) != 2 or topic_parts[0] != "TownPass":
+        _drop("bad_topic", topic)
         return
 
-    channel_id_str = topic_parts[1]
     try:
-        uuid.UUID(channel_id_str)
+        channel_id = uuid.UUID(topic_parts[1])
     except ValueError:
-        print(f"Channel ID '{channel_id_str}' 無法轉換為 UUID")
+        _drop("bad_topic", topic)
         return
 
-    try:
-        user_msg_dict = json.loads(payload_str)
-        if not isinstance(user_msg_dict, dict):
-            print("Payload 解析後不是字典格式")
-            return
-    except json.JSONDecodeError:
-        print(f"無法解析訊息載荷為 JSON: {payload_str}")
+    if not await storage.has_channel(channel_id):
+        _drop("unknown_channel", topic)
         return
 
-    if not user_msg_dict:
-        print("訊息載荷為空字典")
+    parsed = _parse_chat_payload(message.payload)
+    if parsed is None:
+        _drop("bad_payload", topic)
+        return
+    user_id, text = parsed
+    if user_id == publisher.SYSTEM_SENDER_UUID:
+        # 系統通知（本機或其他 instance 發的）只給 client 即時顯示，不寫進聊天紀錄；
+        # 寫進去會變成每個 instance 各存一份、且算進每位參加者的未讀數。冒用 SYSTEM_SENDER 的訊息同樣擋掉。
+        dropped_messages["system_notice"] += 1
         return
 
-    user_id = user_msg_dict["sender"]
-    message_payload = user_msg_dict["text"]
-    print(channel_id_str, user_id, message_payload)
-    await save_message_to_db(channel_id_str, user_id, message_payload)
+    timestamp = await save_message_to_db(channel_id, user_id, text)
+    if timestamp is not None:
+        history_cache.append(
+            channel_id,
+            timestamp,
+            _history_entry(user_id, text, timestamp),
+            len(message.payload),
+        )
 
 
 async def mqtt_listener():
@@ -95,14 +188,26 @@ async def mqtt_listener():
     while True:
         try:
             # aiomqtt 的 Client 用法
-            async with Client(MQTT_BROKER, username=MQTT_USR_NAME, password=MQTT_USR_PWD) as client:
+            async with Client(
+                MQTT_BROKER,
+                username=MQTT_USR_NAME,
+                password=MQTT_USR_PWD,
+                max_inflight_messages=settings.MQTT_MAX_INFLIGHT,
+            ) as client:
                 await client.subscribe(MQTT_TOPIC)
-                print(f"已訂閱主題: {MQTT_TOPIC}")
-                async for message in client.messages:
-                    asyncio.create_task(handle_message(message))
+                logger.info("已訂閱主題", extra={"topic": MQTT_TOPIC})
+                readiness.mark_ready("mqtt")
+                # 系統通知共用這條連線發佈
+                publisher.attach(client)
+                try:
+                    async for message in client.messages:
+                        asyncio.create_task(handle_message(message))
+                finally:
+                    publisher.detach()
 
         except MqttError as e:
-            print(f"MQTT 錯誤: {e}, {reconnect_interval}秒後重試連線")
+            readiness.mark_not_ready("mqtt")
+            logger.warning("MQTT 連線錯誤，稍後重試", extra={"error": str(e), "retry_in": reconnect_interval})
             await asyncio.sleep(reconnect_interval)
 
 
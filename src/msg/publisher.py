@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from aiomqtt import Client, MqttError
+
+from core import metrics
+from core.config import settings
+
+
+# =========================================================
+# 系統通知：透過 mqtt_listener 已連上的 client 發佈到 TownPass/{channel_id}
+# =========================================================
+#
+# 寫入路徑只把通知丟進記憶體佇列（不等網路），
+# 背景 worker 在 MQTT 連線期間持續送出：同時最多 max_inflight 則等待 PUBACK（QoS 1），
+# 其餘排隊。斷線時未確認的通知放回佇列最前面，重新連上後再送。
+
+logger = logging.getLogger(__name__)
+
+# 系統通知的 sender，與使用者 UUID 區隔
+SYSTEM_SENDER = "00000000-0000-0000-0000-000000000000"
+SYSTEM_SENDER_UUID = uuid.UUID(SYSTEM_SENDER)
+
+Notice = Tuple[str, str]
+
+
+class NotificationPublisher:
+    def __init__(self, max_queue: int, max_inflight: int):
+        self._max_queue = max_queue
+        self._queue: Deque[Notice] = deque()
+        self._has_items = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._worker: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def attach(self, client: Client):
+        """mqtt_listener 連線成功後呼叫，開始送出佇列中的通知。"""
+        self.detach()
+        self._worker = asyncio.create_task(self._run(client))
+
+    def detach(self):
+        """連線結束時呼叫；送到一半的通知會回到佇列。"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def enqueue(self, topic: str, payload: str):
+        if len(self._queue) >= self._max_queue:
+            self.dropped += 1
+            logger.warning("通知佇列已滿，丟棄通知", extra={"topic": topic})
+            return
+        self._queue.append((topic, payload))
+        self._has_items.set()
+
+    def _requeue(self, notice: Notice):
+        self._queue.appendleft(notice)
+        self._has_items.set()
+
+    async def _run(self, client: Client):
+        inflight: Set[asyncio.Task] = set()
+        try:
+            while True:
+                await self._has_items.wait()
+                while self._queue:
+                    await self._slots.acquire()
+                    if not self._queue:
+                        self._slots.release()
+                        break
+                    task = asyncio.create_task(self._send(client, self._queue.popleft()))
+                    inflight.add(task)
+                    task.add_done_callback(inflight.discard)
+                self._has_items.clear()
+        finally:
+            for task in inflight:
+                task.cancel()
+
+    async def _send(self, client: Client, notice: Notice):
+        topic, payload = notice
+        try:
+            # QoS 1：等到 broker 回 PUBACK 才算送出
+            await client.publish(topic, payload, qos=1)
+            self.published += 1
+        except MqttError as e:
+            self.failed += 1
+            logger.warning("通知發佈失敗，放回佇列", extra={"topic": topic, "error": str(e)})
+            self._requeue(notice)
+            # 佔著名額稍等，避免連線異常時不斷重送空轉
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            self._requeue(notice)
+            raise
+        finally:
+            self._slots.release()
+
+
+notifications = NotificationPublisher(
+    max_queue=settings.MQTT_NOTICE_QUEUE_SIZE,
+    max_inflight=settings.MQTT_MAX_INFLIGHT,
+)
+metrics.register("notifications", lambda: {
+    "queued": len(notifications._queue),
+    "published": notifications.published,
+    "dropped": notifications.dropped,
+    "failed": notifications.failed,
+})
+
+
+def attach(client: Client):
+    notifications.attach(client)
+
+
+def detach():
+    notifications.detach()
+
+
+def publish_notice(channel_id: Any, notice_type: str, text: str, **data: Any):
+    """
+    發佈一則系統通知到 TownPass/{channel_id}（只進佇列，不等待 PUBACK）。
+    payload 與聊天訊息同格式（sender / text），另附 notice 欄位給 client 判斷類型。
+    msg_log_server 收到 SYSTEM_SENDER 的訊息不會存進聊天紀錄。
+    """
+    payload: Dict[str, Any] = {
+        "sender": SYSTEM_SENDER,
+        "text": text,
+        "notice": {"type": notice_type, **data},
+    }
+    notifications.enqueue(f"TownPass/{channel_id}", json.dumps(payload, default=str))
@@ -1,17 +1,17 @@
-import paho.mqtt.client as mqtt
-import json, sys, time, atexit
-from apscheduler.schedulers.background import BackgroundScheduler
+"""
+除錯用：對 TownPass/{channel_id} 發佈一則聊天訊息（QoS 1，等到 PUBACK 才結束）。
+
+用法（在 src/ 底下）：
+    python -m msg.send_msg --channel <uuid> --sender <uuid> --text "Hello"
+"""
+import argparse
+import json
 import uuid
 
-from core.config import settings
+import paho.mqtt.client as mqtt
 
-MQTT_USR_NAME = settings.MQTT_USR_NAME
-MQTT_USR_PWD = settings.MQTT_USR_PWD
-MQTT_BROKER = settings.MQTT_BROKER
+from core.config import settings
 
-CHANNEL_ID = "a1b2c3d4-e5f6-7890-1234-567890abcdef"
-USER_ID = "f0e9d8c7-b6a5-4321-fedc-ba9876543210"
-USER_MSG = "Hello, this is a test message."
 
 def is_valid_uuid(uuid_str, version=4):
     try:
@@ -20,47 +20,43 @@ def is_valid_uuid(uuid_str, version=4):
     except ValueError:
         return False
 
-def on_publish(client, userdata, mid, reason_code, properties):
-    try:
-        userdata.remove(mid)
-    except KeyError:
-        print("on_publish() is called with a mid not present in unacked_publish")
-
-unacked_publish = set()
-mqttc = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-mqttc.on_publish = on_publish
-
-mqttc.user_data_set(unacked_publish)
-mqttc.username_pw_set(MQTT_USR_NAME, MQTT_USR_PWD)
-mqttc.connect(MQTT_BROKER, 1883)
-mqttc.loop_start()
-
-def mqtt_publish(topic, msg, qos=1):
-    if not is_valid_uuid(CHANNEL_ID):
-        print(f"發佈失敗: CHANNEL_ID '{CHANNEL_ID}' 不是有效的 UUID 格式。")
+def mqtt_publish(mqttc, channel_id, sender, text, qos=1):
+    if not is_valid_uuid(channel_id):
+        print(f"發佈失敗: channel '{channel_id}' 不是有效的 UUID 格式。")
         return
-    
-    if USER_ID and not is_valid_uuid(USER_ID):
-        print(f"發佈失敗: USER_ID '{USER_ID}' 不是有效的 UUID 格式。")
+    if not is_valid_uuid(sender):
+        print(f"發佈失敗: sender '{sender}' 不是有效的 UUID 格式。")
         return
 
-    msg_info = mqttc.publish(topic, json.dumps(msg), qos=qos)
-    unacked_publish.add(msg_info.mid)
-    print(f"Message {msg_info.mid} published to topic {topic} with payload: {msg}")
-
-def disconnect_mqtt():
-    if mqttc:
+    # 與 msg_log_server 相同的格式
+    payload = {"sender": sender, "text": text}
+    topic = f"TownPass/{channel_id}"
+    msg_info = mqttc.publish(topic, json.dumps(payload), qos=qos)
+    msg_info.wait_for_publish()
+    print(f"Message {msg_info.mid} published to topic {topic} with payload: {payload}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="發佈一則聊天訊息")
+    parser.add_argument("--channel", required=True, help="channel uuid（活動的 channel_id）")
+    parser.add_argument("--sender", required=True, help="發送者的 user uuid")
+    parser.add_argument("--text", default="Hello, this is a test message.")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--broker", default=None, help="預設為 Settings.MQTT_BROKER")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args(argv)
+
+    mqttc = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    mqttc.username_pw_set(settings.MQTT_USR_NAME, settings.MQTT_USR_PWD)
+    mqttc.connect(args.broker or settings.MQTT_BROKER, args.port)
+    mqttc.loop_start()
+    try:
+        mqtt_publish(mqttc, args.channel, args.sender, args.text, qos=args.qos)
+    finally:
         mqttc.loop_stop()
         mqttc.disconnect()
         print("MQTT disconnected.")
 
-atexit.register(disconnect_mqtt)
-
-MsgJson = {}
-MsgJson[USER_ID] = USER_MSG
-SendMsg = MsgJson
-
-mqtt_publish(f"capstone/{CHANNEL_ID}", SendMsg, qos=1)
 
-while len(unacked_publish) > 0:
-    time.sleep(0.1)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from uuid import UUID
 from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 class Location(BaseModel):
@@ -19,3 +21,21 @@ class Record(BaseModel):
     capacity: int
     status: str
     organizer_id: UUID
+
+class Occupancy(BaseModel):
+    place: Place
+    sport: str
+    hour_start: datetime
+    events: int
+    open_events: int
+    full_events: int
+    capacity: int
+    participants: int
+    fill_ratio: float
+
+class UnreadCount(BaseModel):
+    channel_id: UUID
+    last_read_at: Optional[datetime]
+    unread: int
+    # unread 達到 UNREAD_COUNT_CAP 時不再往下數，前端顯示成「99+」之類
+    capped: bool
@@ -2,7 +2,7 @@ from uuid import UUID
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from schemas.base import Location
 
@@ -19,3 +19,10 @@ class RecordRequest(BaseModel):
         start_time: datetime
         end_time: datetime
         capacity: int
+
+class AdminRequest(BaseModel):
+    class CenterImportRowModel(BaseModel):
+        name: str = Field(min_length=1, max_length=50)
+        latitude: float = Field(ge=-90, le=90)
+        longitude: float = Field(ge=-180, le=180)
+        sports: list[str] = []
@@ -1,7 +1,8 @@
 from uuid import UUID
+from datetime import datetime
 from pydantic import BaseModel
 
-from schemas.base import Place, Record
+from schemas.base import Occupancy, Place, Record, UnreadCount
 
 class ComputeResponse(BaseModel):
     class ClosestPlaceResponseModel(BaseModel):
@@ -23,3 +24,25 @@ class RecordResponse(BaseModel):
 
     class CreateRecordResponseModel(BaseModel):
         record_id: UUID
+
+    class JoinWaitlistResponseModel(BaseModel):
+        position: int
+
+
+class AdminResponse(BaseModel):
+    class ImportCentersResponseModel(BaseModel):
+        centers: int
+        allowed_pairs: int
+
+
+class StatsResponse(BaseModel):
+    class OccupancyResponseModel(BaseModel):
+        occupancy: list[Occupancy]
+
+
+class MessageResponse(BaseModel):
+    class MarkReadResponseModel(BaseModel):
+        last_read_at: datetime
+
+    class UnreadCountsResponseModel(BaseModel):
+        channels: list[UnreadCount]
@@ -0,0 +1,61 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+# Settings() reads the environment at import time; the tests run against the
+# in-memory storage engine, so the connection settings only need placeholders.
+for key, value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USERNAME": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "MQTT_USR_NAME": "test",
+    "MQTT_USR_PWD": "test",
+    "MQTT_BROKER": "localhost",
+    "STORAGE_BACKEND": "memory",
+    "JWT_SECRET": "test-secret",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.fixture
+def memory_storage(monkeypatch):
+    """A fresh MemoryStorage, swapped in for every module that imported the storage singleton."""
+    from db import storage as storage_module
+    from db.memory_storage import MemoryStorage
+
+    original = storage_module.storage
+    fresh = MemoryStorage()
+    for module in list(sys.modules.values()):
+        if getattr(module, "storage", None) is original:
+            monkeypatch.setattr(module, "storage", fresh)
+    return fresh
+
+
+@pytest.fixture
+def create_event(memory_storage):
+    """async create_event(organizer=None, participants=()) -> event uid"""
+    from db.memory_storage import center_uuid
+
+    slots = iter(range(1, 10_000))
+
+    async def create(organizer=None, participants=()):
+        pair = (await memory_storage.get_allowed_pairs_grouped())[0]
+        start = datetime.now(timezone.utc) + timedelta(days=1, hours=next(slots))
+        event = await memory_storage.create_event(
+            organizer or uuid4(),
+            pair["sport"],
+            center_uuid(pair["centers"][0]),
+            start,
+            start + timedelta(hours=1),
+            10,
+        )
+        for user in participants:
+            await memory_storage.join_event(user, event["uid"])
+        return event["uid"]
+
+    return create
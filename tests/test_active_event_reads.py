@@ -0,0 +1,72 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from db import db_utils
+from db.active_events import ActiveEventStore
+
+
+def _event(end_time: datetime) -> dict:
+    return {
+        "uid": uuid4(),
+        "sport": "羽球",
+        "center_id": uuid4(),
+        "center_name": "大安",
+        "start_time": end_time - timedelta(hours=1),
+        "end_time": end_time,
+        "capacity": 4,
+        "status": "open",
+        "organizer_uid": uuid4(),
+    }
+
+
+def test_listing_prunes_snapshot_without_borrowing_a_connection(monkeypatch):
+    store = ActiveEventStore()
+    store.loaded = True
+    now = datetime.now(timezone.utc)
+    expired, upcoming = _event(now - timedelta(minutes=1)), _event(now + timedelta(hours=2))
+    for event in (expired, upcoming):
+        store.apply({"op": "create", "event": event, "participants": [event["organizer_uid"]]})
+    monkeypatch.setattr(db_utils, "_active_events", store)
+
+    @asynccontextmanager
+    async def no_connections(*args, **kwargs):
+        raise AssertionError("read path must not acquire a connection")
+        yield
+
+    monkeypatch.setattr(db_utils, "acquire", no_connections)
+
+    events = asyncio.run(db_utils.get_all_active_events())
+    assert [event["uid"] for event in events] == [upcoming["uid"]]
+    assert asyncio.run(db_utils.get_user_active_events(expired["organizer_uid"])) == []
+
+
+def test_concurrent_first_reads_share_one_load(monkeypatch):
+    loads = []
+
+    class CountingStore(ActiveEventStore):
+        async def load(self, conn):
+            loads.append(conn)
+            await asyncio.sleep(0.01)
+            self.loaded = True
+
+    async def noop(*args):
+        pass
+
+    @asynccontextmanager
+    async def acquire(*args, **kwargs):
+        yield object()
+
+    monkeypatch.setattr(db_utils, "_active_events", CountingStore())
+    monkeypatch.setattr(db_utils, "_listen_notifications", noop)
+    monkeypatch.setattr(db_utils, "_cleanup_expired_events", noop)
+    monkeypatch.setattr(db_utils, "acquire", acquire)
+
+    async def scenario():
+        return await asyncio.gather(*(db_utils.get_all_active_events() for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(loads) == 1
+    # plain snapshot reads: each caller gets its own list
+    assert len({id(result) for result in results}) == 5
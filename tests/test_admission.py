@@ -0,0 +1,70 @@
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from core import admission
+from core.admission import AdmissionController
+
+
+def make_controller(**overrides) -> AdmissionController:
+    options = dict(
+        global_rate=0.001,
+        global_burst=10,
+        user_rate=0.001,
+        user_burst=2,
+        max_users=100,
+        route_concurrency=100,
+        pool_wait_threshold=1.0,
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def reject_status(controller: AdmissionController, user) -> int:
+    with pytest.raises(HTTPException) as exc:
+        controller.enter("route", user)
+    return exc.value.status_code
+
+
+def test_user_over_limit_does_not_drain_global_bucket():
+    controller = make_controller()
+    noisy, idle = uuid4(), uuid4()
+    for _ in range(2):
+        controller.enter("route", noisy)
+        controller.leave("route")
+    for _ in range(50):
+        assert reject_status(controller, noisy) == 429
+
+    # 8 global tokens are still left for everyone else
+    for _ in range(2):
+        controller.enter("route", idle)
+        controller.leave("route")
+    assert controller._global.tokens == pytest.approx(6, abs=0.01)
+
+
+def test_global_rejection_refunds_user_token():
+    controller = make_controller(global_burst=1)
+    first, second = uuid4(), uuid4()
+    controller.enter("route", first)
+    controller.leave("route")
+
+    assert reject_status(controller, second) == 429
+    assert controller._users._buckets[second].tokens == pytest.approx(2, abs=0.01)
+
+
+def test_concurrency_rejection_takes_no_tokens():
+    controller = make_controller(route_concurrency=1)
+    user = uuid4()
+    controller.enter("route", user)
+    assert reject_status(controller, uuid4()) == 503
+    assert controller._global.tokens == pytest.approx(9, abs=0.01)
+
+
+def test_pool_wait_rejection_takes_no_tokens(monkeypatch):
+    controller = make_controller()
+    monkeypatch.setattr(admission.pool_wait, "current_wait", lambda: 5.0)
+    user = uuid4()
+    assert reject_status(controller, user) == 503
+    assert controller._global.tokens == pytest.approx(10, abs=0.01)
+    assert user not in controller._users._buckets
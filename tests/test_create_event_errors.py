@@ -0,0 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import asyncpg
+import pytest
+
+from db import db_utils
+
+
+def _create_with_error(monkeypatch, error: Exception):
+    class FailingConnection:
+        async def fetchrow(self, *args):
+            raise error
+
+    @asynccontextmanager
+    async def acquire(*args, **kwargs):
+        yield FailingConnection()
+
+    monkeypatch.setattr(db_utils, "acquire", acquire)
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    return asyncio.run(
+        db_utils.create_event(uuid4(), "羽球", uuid4(), start, start + timedelta(hours=1), 4)
+    )
+
+
+@pytest.mark.parametrize("error, message", [
+    (asyncpg.DataError("invalid input for query argument $5: 3000000000 (value out of int32 range)"),
+     "Capacity must be between 2 and 100"),
+    (asyncpg.DataError("invalid input for query argument $3: datetime.datetime(1, 1, 1) (date out of range)"),
+     "Invalid start or end time"),
+    (asyncpg.DataError("invalid input for query argument $2: 'x' (invalid UUID)"),
+     "Invalid place ID"),
+    (asyncpg.NumericValueOutOfRangeError("integer out of range"), "Capacity must be between 2 and 100"),
+    (asyncpg.DatetimeFieldOverflowError("date/time field value out of range"), "Invalid start or end time"),
+])
+def test_data_errors_map_to_their_field(monkeypatch, error, message):
+    with pytest.raises(ValueError, match=message):
+        _create_with_error(monkeypatch, error)
+
+
+def test_unmapped_data_error_is_not_disguised(monkeypatch):
+    with pytest.raises(asyncpg.DataError):
+        _create_with_error(monkeypatch, asyncpg.DataError("something else"))
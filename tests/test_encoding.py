@@ -0,0 +1,115 @@
+import json
+import zlib
+
+import brotli
+import msgpack
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from core.encoding import CompressionMiddleware, NegotiatedResponse, choose_encoding, wants_msgpack
+
+ROWS = [{"center": "中正", "sport": "羽球", "start_time": f"2026-10-20T{h:02d}:00:00+00:00"} for h in range(24)] * 10
+
+
+@pytest.fixture
+def client():
+    router = APIRouter(default_response_class=NegotiatedResponse)
+
+    @router.get("/rows")
+    async def rows():
+        return ROWS
+
+    @router.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @router.get("/export")
+    async def export():
+        async def lines():
+            for row in ROWS:
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+    app.include_router(router, prefix="/api")
+
+    @app.get("/outside")
+    async def outside():
+        return ROWS
+
+    return TestClient(app)
+
+
+def _get(client, path, accept="application/json", accept_encoding="identity"):
+    # read the raw bytes so httpx does not decompress them
+    with client.stream("GET", path, headers={"Accept": accept, "Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("br, gzip", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+    ("br;q=0, gzip;q=0", None),
+    ("", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("application/msgpack", True),
+    ("application/x-msgpack, application/json;q=0.5", True),
+    ("application/json, application/msgpack;q=0.5", False),
+    ("*/*", False),
+    ("", False),
+])
+def test_wants_msgpack(header, expected):
+    assert wants_msgpack(header) is expected
+
+
+def test_json_by_default(client):
+    response, raw = _get(client, "/api/rows")
+    assert response.headers["content-type"].startswith("application/json")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == ROWS
+
+
+def test_msgpack_when_preferred(client):
+    response, raw = _get(client, "/api/rows", accept="application/msgpack")
+    assert response.headers["content-type"] == "application/msgpack"
+    assert "Accept" in response.headers["vary"]
+    assert msgpack.unpackb(raw) == ROWS
+
+
+@pytest.mark.parametrize("encoding, decompress", [
+    ("br", brotli.decompress),
+    ("gzip", lambda raw: zlib.decompress(raw, 16 + zlib.MAX_WBITS)),
+])
+def test_large_bodies_are_compressed(client, encoding, decompress):
+    response, raw = _get(client, "/api/rows", accept_encoding=encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) == len(raw)
+    assert json.loads(decompress(raw)) == ROWS
+
+
+def test_small_bodies_and_other_paths_are_not_compressed(client):
+    response, raw = _get(client, "/api/small", accept_encoding="gzip")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == {"ok": True}
+
+    response, _ = _get(client, "/outside", accept_encoding="gzip")
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed_per_chunk(client):
+    response, raw = _get(client, "/api/export", accept_encoding="gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = zlib.decompress(raw, 16 + zlib.MAX_WBITS).decode().splitlines()
+    assert [json.loads(line) for line in lines] == ROWS
@@ -0,0 +1,46 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from uuid import uuid4
+
+from msg import msg_log_server
+
+
+def test_cancelled_event_is_dropped_from_history_cache(memory_storage, create_event):
+    # the fixture's engine is created after msg_log_server registered its listener
+    memory_storage.on_channel_removed(msg_log_server.history_cache.discard)
+    organizer = uuid4()
+
+    async def scenario():
+        channel_id = await create_event(organizer=organizer)
+        message = SimpleNamespace(
+            topic=f"TownPass/{channel_id}",
+            payload=json.dumps({"sender": str(organizer), "text": "hi"}).encode(),
+        )
+        await msg_log_server.handle_message(message)
+        cached = await msg_log_server.get_message_history(str(channel_id), limit=5)
+        # second read is served from the cache
+        assert await msg_log_server.get_message_history(str(channel_id), limit=5) == cached
+
+        assert await memory_storage.cancel_event(channel_id, organizer_uid=organizer)
+        return cached, await msg_log_server.get_message_history(str(channel_id), limit=5)
+
+    hits_before = msg_log_server.history_cache.hits
+    cached, after_cancel = asyncio.run(scenario())
+    assert [entry["text"] for entry in cached] == ["hi"]
+    assert msg_log_server.history_cache.hits == hits_before + 1
+    assert after_cancel == []
+
+
+def test_channel_registry_notifies_removed_channels():
+    from db.channels import ChannelRegistry
+
+    registry = ChannelRegistry()
+    registry.loaded = True
+    removed = []
+    registry.add_remove_listener(removed.append)
+    channel_id = uuid4()
+    registry.apply({"op": "create", "event": {"uid": channel_id}})
+    registry.apply({"op": "remove", "event_uid": str(channel_id)})
+    assert removed == [channel_id]
+    assert channel_id not in registry
@@ -0,0 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from db import db_utils
+
+
+class RecordingConnection:
+    """Pretends every table exists; records statements and whether the upgrades were applied."""
+
+    def __init__(self, applied: bool, applied_after_lock: bool = False):
+        self.applied = applied
+        self.applied_after_lock = applied_after_lock
+        self.statements = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *args):
+        self.statements.append(query)
+        if "pg_advisory_xact_lock" in query and self.applied_after_lock:
+            self.applied = True
+
+    async def fetchval(self, query, *args):
+        if "schema_upgrades WHERE checksum" in query:
+            return self.applied
+        return True
+
+    async def fetchrow(self, query, *args):
+        return {"exists": True}
+
+
+def _init_db(monkeypatch, conn):
+    @asynccontextmanager
+    async def acquire(*args, **kwargs):
+        yield conn
+
+    monkeypatch.setattr(db_utils, "acquire", acquire)
+    asyncio.run(db_utils.init_db())
+    return conn.statements
+
+
+def test_applied_upgrades_run_no_ddl(monkeypatch):
+    assert _init_db(monkeypatch, RecordingConnection(applied=True)) == []
+
+
+def test_upgrades_run_behind_advisory_lock(monkeypatch):
+    statements = _init_db(monkeypatch, RecordingConnection(applied=False))
+    assert "pg_advisory_xact_lock" in statements[0]
+    assert db_utils._SCHEMA_UPGRADES in statements
+    assert "INSERT INTO schema_upgrades" in statements[-1]
+
+
+def test_upgrades_skipped_when_another_instance_finished_first(monkeypatch):
+    statements = _init_db(monkeypatch, RecordingConnection(applied=False, applied_after_lock=True))
+    assert len(statements) == 1 and "pg_advisory_xact_lock" in statements[0]
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+
+import main
+from core.readiness import readiness
+
+
+def test_shutdown_cancels_and_awaits_background_tasks(memory_storage):
+    async def scenario():
+        async with main.lifespan(main.app):
+            for _ in range(200):
+                if readiness.ready:
+                    break
+                await asyncio.sleep(0.01)
+            tasks = dict(main.background_tasks)
+        return tasks
+
+    tasks = asyncio.run(scenario())
+    assert {"watchdog", "startup", "mqtt", "scheduler"} <= set(tasks)
+    assert all(task.done() for task in tasks.values())
+    assert main.background_tasks == {}
+
+
+def test_failed_background_task_is_logged_and_marks_not_ready(caplog):
+    async def crash():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        readiness.expect("crashing", required=False)
+        readiness.mark_ready("crashing")
+        task = main.spawn("crashing", crash())
+        await asyncio.gather(task, return_exceptions=True)
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(scenario())
+    main.background_tasks.pop("crashing")
+    assert readiness.snapshot()["components"]["crashing"] is False
+    assert any(record.exc_info and "boom" in str(record.exc_info[1]) for record in caplog.records)
+
+
+def test_scheduler_ready_only_after_deadlines_load(monkeypatch):
+    from db import db_utils
+
+    loaded = asyncio.Event()
+
+    async def load_event_deadlines():
+        await loaded.wait()
+
+    async def run(handler):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(db_utils, "_load_event_deadlines", load_event_deadlines)
+    monkeypatch.setattr(db_utils._event_deadlines, "run", run)
+
+    async def scenario():
+        readiness.expect("scheduler")
+        readiness.mark_not_ready("scheduler")
+        task = asyncio.create_task(db_utils.run_event_scheduler())
+        await asyncio.sleep(0.01)
+        before = readiness.snapshot()["components"]["scheduler"]
+        loaded.set()
+        await asyncio.sleep(0.01)
+        after = readiness.snapshot()["components"]["scheduler"]
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return before, after
+
+    assert asyncio.run(scenario()) == (False, True)
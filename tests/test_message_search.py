@@ -0,0 +1,31 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from db.db_utils import SHORT_CJK_QUERY_ERROR
+
+
+def test_short_cjk_query_needs_a_channel(memory_storage):
+    with pytest.raises(ValueError, match=SHORT_CJK_QUERY_ERROR):
+        asyncio.run(memory_storage.find_messages("羽球", user_id=uuid4()))
+
+
+def test_short_cjk_query_within_channel(memory_storage, create_event):
+    user = uuid4()
+
+    async def scenario():
+        channel_id = await create_event(organizer=user)
+        await memory_storage.insert_message(channel_id, user, "明天羽球見")
+        await memory_storage.insert_message(channel_id, user, "see you")
+        by_channel = await memory_storage.find_messages("羽球", channel_id=channel_id)
+        long_by_user = await memory_storage.find_messages("明天羽球", user_id=user)
+        return by_channel, long_by_user
+
+    by_channel, long_by_user = asyncio.run(scenario())
+    assert len(by_channel) == 1
+    assert len(long_by_user) == 1
+
+
+def test_short_non_cjk_query_is_not_restricted(memory_storage):
+    assert asyncio.run(memory_storage.find_messages("ok", user_id=uuid4())) == []
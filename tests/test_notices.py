@@ -0,0 +1,44 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from uuid import uuid4
+
+from msg import msg_log_server, publisher
+
+
+def mqtt_message(channel_id, payload) -> SimpleNamespace:
+    return SimpleNamespace(topic=f"TownPass/{channel_id}", payload=json.dumps(payload).encode())
+
+
+def test_published_notice_is_not_stored(memory_storage, create_event, monkeypatch):
+    queued = []
+    monkeypatch.setattr(publisher.notifications, "enqueue", lambda topic, payload: queued.append((topic, payload)))
+    user = uuid4()
+
+    async def scenario():
+        channel_id = await create_event(organizer=user)
+        publisher.publish_notice(channel_id, "reminder", "活動即將開始")
+        topic, payload = queued[0]
+        # the log server's own TownPass/# subscription receives the notice back
+        await msg_log_server.handle_message(SimpleNamespace(topic=topic, payload=payload.encode()))
+        return channel_id
+
+    channel_id = asyncio.run(scenario())
+    assert json.loads(queued[0][1])["notice"]["type"] == "reminder"
+    assert asyncio.run(memory_storage.get_channel_messages(channel_id)) == []
+    assert asyncio.run(memory_storage.get_unread_counts(user, 100))[0]["unread"] == 0
+
+
+def test_chat_message_is_stored_but_spoofed_system_sender_is_not(memory_storage, create_event):
+    user = uuid4()
+
+    async def scenario():
+        channel_id = await create_event(organizer=user)
+        await msg_log_server.handle_message(mqtt_message(channel_id, {"sender": str(user), "text": "hi"}))
+        await msg_log_server.handle_message(
+            mqtt_message(channel_id, {"sender": publisher.SYSTEM_SENDER, "text": "fake notice"})
+        )
+        return await memory_storage.get_channel_messages(channel_id)
+
+    messages = asyncio.run(scenario())
+    assert [json.loads(row["payload"]) for row in messages] == ["hi"]
@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+
+def test_unread_counts_follow_cursor_and_skip_own_messages(memory_storage, create_event):
+    reader, writer = uuid4(), uuid4()
+
+    async def scenario():
+        channel_id = await create_event(organizer=writer, participants=[reader])
+        for text in ("a", "b", "c"):
+            await memory_storage.insert_message(channel_id, writer, text)
+        await memory_storage.insert_message(channel_id, reader, "mine")
+        before = await memory_storage.get_unread_counts(reader, 100)
+        await memory_storage.mark_read(reader, channel_id)
+        await memory_storage.insert_message(channel_id, writer, "d")
+        after = await memory_storage.get_unread_counts(reader, 100)
+        capped = await memory_storage.get_unread_counts(writer, 0)
+        return before, after, capped
+
+    before, after, capped = asyncio.run(scenario())
+    assert before[0]["unread"] == 3
+    assert after[0]["unread"] == 1
+    assert capped[0]["unread"] == 0
+
+
+def test_cursor_never_moves_back(memory_storage, create_event):
+    user = uuid4()
+
+    async def scenario():
+        channel_id = await create_event(organizer=user)
+        latest = await memory_storage.mark_read(user, channel_id)
+        older = await memory_storage.mark_read(user, channel_id, latest - timedelta(hours=1))
+        return latest, older
+
+    latest, older = asyncio.run(scenario())
+    assert older == latest
+
+
+def test_future_timestamp_is_capped_at_now(memory_storage, create_event):
+    reader, writer = uuid4(), uuid4()
+
+    async def scenario():
+        channel_id = await create_event(organizer=writer, participants=[reader])
+        stored = await memory_storage.mark_read(reader, channel_id, datetime(2100, 1, 1))
+        await memory_storage.insert_message(channel_id, writer, "after")
+        return stored, await memory_storage.get_unread_counts(reader, 100)
+
+    stored, counts = asyncio.run(scenario())
+    assert stored <= datetime.now(timezone.utc)
+    assert counts[0]["unread"] == 1
+
+
+def test_unknown_channel_returns_none(memory_storage):
+    assert asyncio.run(memory_storage.mark_read(uuid4(), uuid4())) is None
@@ -0,0 +1,52 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def bearer(subject) -> dict:
+    header = {"alg": "HS256", "typ": "JWT"}
+    payload = {"sub": str(subject), "exp": time.time() + 60}
+    signing_input = f"{_b64(json.dumps(header).encode())}.{_b64(json.dumps(payload).encode())}"
+    signature = hmac.new(os.environ["JWT_SECRET"].encode(), signing_input.encode(), hashlib.sha256).digest()
+    return {"Authorization": f"Bearer {signing_input}.{_b64(signature)}"}
+
+
+@pytest.fixture
+def client(memory_storage):
+    # no `with`: the lifespan (warm-up, scheduler, MQTT) is not started
+    return TestClient(main.app)
+
+
+def test_join_closed_event_is_rejected(client, memory_storage, create_event):
+    user = uuid4()
+    event_uid = asyncio.run(create_event())
+    asyncio.run(memory_storage._on_deadline("close", UUID(event_uid)))
+
+    response = client.post(f"/api/record/join/{event_uid}", params={"user_id": str(user)}, headers=bearer(user))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Event is closed"
+    assert asyncio.run(memory_storage.get_user_active_events(user)) == []
+
+
+def test_join_open_event(client, create_event):
+    user = uuid4()
+    event_uid = asyncio.run(create_event())
+
+    response = client.post(f"/api/record/join/{event_uid}", params={"user_id": str(user)}, headers=bearer(user))
+
+    assert response.status_code == 200
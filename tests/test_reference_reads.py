@@ -0,0 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from db import db_utils
+
+
+def test_concurrent_reference_reads_share_one_query(monkeypatch):
+    fetches = []
+
+    class SlowConnection:
+        async def fetch(self, query):
+            fetches.append(query)
+            await asyncio.sleep(0.01)
+            return [{"sport": "羽球"}]
+
+    @asynccontextmanager
+    async def acquire(*args, **kwargs):
+        yield SlowConnection()
+
+    monkeypatch.setattr(db_utils, "acquire", acquire)
+    db_utils.invalidate_reference_cache()
+
+    async def scenario():
+        return await asyncio.gather(*(db_utils.get_sports() for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    db_utils.invalidate_reference_cache()
+    assert results == [["羽球"]] * 5
+    assert len(fetches) == 1
+    # coalesced once, in _fetch_reference; the public getter is not wrapped again
+    assert not hasattr(db_utils.get_sports, "__wrapped__")
@@ -0,0 +1,84 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from uuid import uuid4
+
+import pytest
+
+from core.security import InvalidToken, KeyRing, TokenVerifier, VerifiedTokenCache
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def make_token(payload, secret=b"default", header=None) -> str:
+    header = header or {"alg": "HS256", "typ": "JWT"}
+    signing_input = f"{_b64(json.dumps(header).encode())}.{_b64(json.dumps(payload).encode())}"
+    signature = hmac.new(secret, signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64(signature)}"
+
+
+def make_verifier(keys_file: str = "") -> TokenVerifier:
+    return TokenVerifier(
+        keys=KeyRing("default", keys_file, reload_interval=0),
+        cache=VerifiedTokenCache(max_size=100, ttl=60),
+        leeway=0,
+    )
+
+
+def test_valid_token_returns_subject():
+    subject = uuid4()
+    token = make_token({"sub": str(subject), "exp": time.time() + 60})
+    assert make_verifier().verify(token) == subject
+
+
+@pytest.mark.parametrize("claims", [
+    {"exp": "soon"},
+    {"exp": [1]},
+    {"exp": float("nan")},
+    {"exp": True},
+    {"nbf": "later"},
+    {"nbf": {"t": 1}},
+])
+def test_malformed_time_claims_are_invalid_tokens(claims):
+    token = make_token({"sub": str(uuid4()), **claims})
+    with pytest.raises(InvalidToken):
+        make_verifier().verify(token)
+
+
+def test_expired_token_is_rejected():
+    token = make_token({"sub": str(uuid4()), "exp": time.time() - 10})
+    with pytest.raises(InvalidToken, match="expired"):
+        make_verifier().verify(token)
+
+
+def test_non_string_kid_is_rejected():
+    token = make_token({"sub": str(uuid4())}, header={"alg": "HS256", "kid": ["a"]})
+    with pytest.raises(InvalidToken):
+        make_verifier().verify(token)
+
+
+def test_broken_keys_file_keeps_previous_keys(tmp_path):
+    keys_file = tmp_path / "keys.json"
+    keys_file.write_text(json.dumps({"k1": "first"}))
+    verifier = make_verifier(str(keys_file))
+    subject = uuid4()
+    token = make_token({"sub": str(subject)}, secret=b"first", header={"alg": "HS256", "kid": "k1"})
+    assert verifier.verify(token) == subject
+
+    # half-written file with a new mtime
+    keys_file.write_text('{"k1": "sec')
+    stat = keys_file.stat()
+    os.utime(keys_file, (stat.st_atime, stat.st_mtime + 5))
+    verifier._cache.clear()
+    assert verifier.verify(token) == subject
+
+    # once the file is valid again, rotation takes effect
+    keys_file.write_text(json.dumps({"k2": "second"}))
+    os.utime(keys_file, (stat.st_atime, stat.st_mtime + 10))
+    with pytest.raises(InvalidToken, match="Unknown signing key"):
+        verifier.verify(token)